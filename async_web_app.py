@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+
+"""
+YouTube Audio Player Async Web App
+An ASGI variant of the web application for serving many concurrent searches.
+
+The upstream-bound routes (/api/search and /api/play) run on the event loop
+with timeouts and give up on upstream work when the client disconnects. The
+event stream (/api/events) runs there too, so idle listeners don't hold a
+thread each, and so do batches (/api/batch), whose operations are
+dispatched through this app so batched searches and plays get the same
+treatment. Every other route, the templates and the static frontend are
+served by the regular Flask app mounted underneath, so both variants expose
+the same API and share the same YouTube client, playlist manager and
+playback state.
+
+Run with:
+    uvicorn async_web_app:app --host 0.0.0.0 --port 5000
+"""
+
+import os
+import json
+import time
+import asyncio
+from urllib.parse import unquote
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import web_app
+from web_app import (
+    youtube_client, playlist_manager, play_calls, search_calls, search_key, event_hub, SESSION_COOKIE,
+    resolve_stream, playable_track, stream_prefetcher, PREFETCH_TOP_RESULTS, admission, rate_limiter,
+    TRUSTED_PROXIES, warm_up, record_playback_position
+)
+from modules.admission import Overloaded
+from modules.batch import parse_operations, plan_stages, skipped_result
+from modules.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, record_error
+
+# Seconds an upstream YouTube call may take before the request fails with 504
+UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 15))
+
+# Upstream calls in flight at once; the YouTube client is synchronous, so each
+# one occupies a pool thread while waiting on the network
+UPSTREAM_WORKERS = int(os.environ.get('UPSTREAM_WORKERS', 64))
+
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before the upstream call finished"""
+
+async def _wait_for_disconnect(request: Request):
+    """
+    Wait until the client closes the connection
+    
+    Args:
+        request: Request whose body has already been read
+    """
+    while True:
+        message = await request.receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+async def _await_upstream(request: Request, work: asyncio.Future, abandon):
+    """
+    Wait for an upstream call, giving up on timeout or client disconnect
+    
+    Args:
+        request: Request the call is made for
+        work: Future of the call
+        abandon: Called without arguments when giving up on the call
+        
+    Returns:
+        Result of the call
+        
+    Raises:
+        asyncio.TimeoutError: If the call took longer than UPSTREAM_TIMEOUT
+        ClientDisconnected: If the client disconnected first
+    """
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    
+    try:
+        done, _ = await asyncio.wait(
+            {work, disconnect},
+            timeout=UPSTREAM_TIMEOUT,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        disconnect.cancel()
+    
+    if work in done:
+        return work.result()
+    
+    abandon()
+    
+    if disconnect in done:
+        raise ClientDisconnected()
+    
+    raise asyncio.TimeoutError()
+
+async def run_upstream(request: Request, func, *args):
+    """
+    Run a blocking upstream call without holding up the event loop
+    
+    Args:
+        request: Request the call is made for
+        func: Blocking function to call
+        *args: Arguments for the function
+        
+    Returns:
+        Return value of the function
+        
+    Raises:
+        asyncio.TimeoutError: If the call took longer than UPSTREAM_TIMEOUT
+        ClientDisconnected: If the client disconnected first
+    """
+    loop = asyncio.get_running_loop()
+    work = loop.run_in_executor(upstream_executor, func, *args)
+    
+    # Giving up drops the call if it is still queued; a call already running
+    # can't be interrupted, but its result is discarded
+    return await _await_upstream(request, work, work.cancel)
+
+async def run_coalesced(request: Request, coalescer, key, func, *args):
+    """
+    Run a blocking upstream call, or join the identical call in flight
+    
+    The result is shared with the other requests that joined the call and
+    must not be modified.
+    
+    Args:
+        request: Request the call is made for
+        coalescer: RequestCoalescer for this kind of call
+        key: Identifies calls that produce the same result
+        func: Blocking function to call
+        *args: Arguments for the function
+        
+    Returns:
+        Return value of the function
+        
+    Raises:
+        asyncio.TimeoutError: If the call took longer than UPSTREAM_TIMEOUT
+        ClientDisconnected: If the client disconnected first
+    """
+    shared = coalescer.submit(key, upstream_executor, func, *args)
+    
+    # The call is only dropped once every request waiting on it gave up
+    return await _await_upstream(request, asyncio.wrap_future(shared), lambda: coalescer.leave(key, shared))
+
+class MetricsMiddleware:
+    """
+    Records the same request metrics for the async routes that the Flask app
+    records for its own
+    """
+    
+    def __init__(self, app):
+        """
+        Wrap an ASGI app
+        
+        Args:
+            app: ASGI application
+        """
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            record_error('async_web_app', e)
+            raise
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            
+            # Only the fixed async routes get here, so the path is the route
+            HTTP_REQUEST_DURATION.labels(scope['method'], scope['path']).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(scope['method'], scope['path'], str(status)).inc()
+
+async def _read_json(request: Request):
+    """
+    Parse the JSON body of a request
+    
+    Args:
+        request: Incoming request
+        
+    Returns:
+        Parsed body, or None if it isn't a JSON object
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    
+    return data if isinstance(data, dict) else None
+
+def _client(request: Request) -> str:
+    """
+    Identify the client of a request for rate limiting
+    
+    Args:
+        request: Incoming request
+        
+    Returns:
+        Client address, as the trusted proxies report it if there are any
+    """
+    # The same address ProxyFix gives the Flask routes: the one the
+    # outermost trusted proxy saw the request come from
+    forwarded = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',')]
+    if TRUSTED_PROXIES > 0 and len(forwarded) >= TRUSTED_PROXIES and forwarded[-TRUSTED_PROXIES]:
+        return forwarded[-TRUSTED_PROXIES]
+    
+    return request.client.host if request.client else ''
+
+def _rejected(e: Overloaded) -> JSONResponse:
+    """
+    Turn an upstream-bound request away quickly, telling the client when to retry
+    
+    Args:
+        e: Why the request was turned away
+        
+    Returns:
+        503 or 429 response with a Retry-After header
+    """
+    return JSONResponse({'error': str(e)}, status_code=e.status, headers={'Retry-After': str(e.retry_after)})
+
+def _with_session_cookie(response: Response, request: Request, session) -> Response:
+    """
+    Set the session cookie on a response if the client doesn't have it yet
+    
+    Args:
+        response: Outgoing response
+        request: Incoming request
+        session: Session the request was handled for
+        
+    Returns:
+        The same response
+    """
+    if request.cookies.get(SESSION_COOKIE) != session.id:
+        response.set_cookie(SESSION_COOKIE, session.id, httponly=True, samesite='lax')
+    return response
+
+async def search(request: Request):
+    """Search YouTube, or the saved library with mode "library", for videos"""
+    data = await _read_json(request)
+    
+    if data is None:
+        return JSONResponse({'error': 'Invalid JSON body'}, status_code=400)
+    
+    query = data.get('query', '')
+    max_results = data.get('max_results', 10)
+    mode = data.get('mode', 'youtube')
+    
+    if not query:
+        return JSONResponse({'error': 'No search query provided'}, status_code=400)
+    
+    try:
+        if mode == 'library':
+            # Search saved tracks locally, no upstream call
+            results = await run_upstream(request, playlist_manager.search_library, query, max_results)
+        else:
+            # Search YouTube, sharing the call with identical searches in flight
+            rate_limiter.check(_client(request), 'search')
+            async with admission['search'].aslot():
+                results = await run_coalesced(
+                    request, search_calls, search_key(query, max_results),
+                    youtube_client.search, query, max_results
+                )
+            results = [dict(result) for result in results]
+    except Overloaded as e:
+        return _rejected(e)
+    except asyncio.TimeoutError:
+        return JSONResponse({'error': 'Search timed out'}, status_code=504)
+    except ClientDisconnected:
+        return Response(status_code=499)
+    
+    # Mark results that are already saved, straight from the track index
+    for result in results:
+        result['saved_in'] = sorted(playlist_manager.find_track(result['id']))
+    
+    response = JSONResponse({'results': results})
+    
+    # The top results are the likely clicks, resolve them ahead of time
+    if stream_prefetcher is not None:
+        session = event_hub.get_session(request.cookies.get(SESSION_COOKIE))
+        stream_prefetcher.prefetch(session.id, [result['id'] for result in results[:PREFETCH_TOP_RESULTS]])
+        _with_session_cookie(response, request, session)
+    
+    return response
+
+async def play(request: Request):
+    """Play a YouTube video's audio"""
+    data = await _read_json(request)
+    
+    if data is None:
+        return JSONResponse({'error': 'Invalid JSON body'}, status_code=400)
+    
+    video_id = data.get('video_id', '')
+    
+    if not video_id:
+        return JSONResponse({'error': 'No video ID provided'}, status_code=400)
+    
+    # A click on a search result may find its stream resolved, or being
+    # resolved, in the background already
+    speculative = stream_prefetcher.take(video_id) if stream_prefetcher is not None else None
+    
+    # Get direct streaming URL from YouTube
+    try:
+        if speculative is not None and speculative.done():
+            # Nothing left to ask YouTube, so no slot or rate limit token is used
+            streaming_url, video_info = speculative.result()
+        else:
+            rate_limiter.check(_client(request), 'play')
+            async with admission['play'].aslot():
+                if speculative is not None:
+                    # A running resolution can't be interrupted, giving up only stops waiting
+                    streaming_url, video_info = await _await_upstream(
+                        request, asyncio.wrap_future(speculative), lambda: None
+                    )
+                else:
+                    streaming_url, video_info = await run_coalesced(
+                        request, play_calls, video_id, resolve_stream, video_id
+                    )
+    except Overloaded as e:
+        return _rejected(e)
+    except asyncio.TimeoutError:
+        return JSONResponse({'error': 'Timed out getting audio stream'}, status_code=504)
+    except ClientDisconnected:
+        return Response(status_code=499)
+    
+    if not streaming_url or not video_info:
+        return JSONResponse({'error': 'Failed to get audio stream'}, status_code=500)
+    
+    video_info = playable_track(video_id, streaming_url, video_info)
+    record_playback_position(data)
+    
+    # Sessions are shared with the Flask routes, /api/status reports it
+    session = event_hub.get_session(request.cookies.get(SESSION_COOKIE))
+    event_hub.update_state(session, 'now_playing', current_track=video_info)
+    
+    response = JSONResponse({
+        'track_info': video_info
+    })
+    return _with_session_cookie(response, request, session)
+
+async def events(request: Request):
+    """Stream now-playing, playlist and import updates as Server-Sent Events"""
+    # Idle listeners cost a suspended generator each, not a thread
+    session = event_hub.get_session(request.cookies.get(SESSION_COOKIE))
+    response = StreamingResponse(
+        event_hub.astream(session),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    return _with_session_cookie(response, request, session)
+
+async def _run_operation(request: Request, operation: dict, session, disconnected: asyncio.Event) -> dict:
+    """
+    Run a batched operation through the app like a request of its own
+    
+    Args:
+        request: Batch request the operation belongs to
+        operation: Operation from parse_operations()
+        session: Session the batch is made for
+        disconnected: Set when the batch's client goes away
+        
+    Returns:
+        Dictionary with the response 'status' and JSON 'body'
+    """
+    body = b'' if operation['body'] is None else json.dumps(operation['body']).encode()
+    
+    # Every operation acts for the batch's session, even one started just now
+    headers = [(b'cookie', f"{SESSION_COOKIE}={session.id}".encode())]
+    if operation['body'] is not None:
+        headers += [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': operation['method'],
+        'scheme': request.url.scheme,
+        'path': unquote(operation['path']),
+        'raw_path': operation['path'].encode(),
+        'root_path': '',
+        'query_string': operation['query'].encode(),
+        'headers': headers,
+        'client': request.scope.get('client'),
+        'server': request.scope.get('server'),
+    }
+    
+    body_sent = False
+    
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        
+        # Upstream calls are abandoned when the batch's client disconnects
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+    
+    status = 500
+    chunks = []
+    
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+    
+    try:
+        await app(scope, receive, send)
+        result = json.loads(b''.join(chunks))
+    except ValueError:
+        result = None
+    except Exception as e:
+        record_error('async_web_app', e)
+        return {'status': 500, 'body': {'error': 'Internal server error'}}
+    
+    return {'status': status, 'body': result}
+
+async def batch(request: Request):
+    """Run several API operations in one round trip, independent ones concurrently"""
+    try:
+        operations = parse_operations(await _read_json(request))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    
+    session = event_hub.get_session(request.cookies.get(SESSION_COOKIE))
+    results = [None] * len(operations)
+    
+    disconnected = asyncio.Event()
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    watcher.add_done_callback(lambda _: disconnected.set())
+    
+    try:
+        # Each stage waits for the one before, whose results it may depend on
+        for stage in plan_stages(operations):
+            runnable = []
+            for index in stage:
+                results[index] = skipped_result(operations[index], results)
+                if results[index] is None:
+                    runnable.append(index)
+            
+            stage_results = await asyncio.gather(*[
+                _run_operation(request, operations[index], session, disconnected) for index in runnable
+            ])
+            for index, result in zip(runnable, stage_results):
+                results[index] = result
+    finally:
+        watcher.cancel()
+    
+    if disconnected.is_set():
+        return Response(status_code=499)
+    
+    response = JSONResponse({'responses': results})
+    return _with_session_cookie(response, request, session)
+
+# The async routes get the same permissive CORS policy Flask-CORS gives the
+# rest, compression like the Flask responses, and the same request metrics
+async_routes = Starlette(
+    routes=[
+        Route('/api/search', search, methods=['POST']),
+        Route('/api/play', play, methods=['POST']),
+        Route('/api/batch', batch, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(GZipMiddleware, minimum_size=500),
+    ]
+)
+
+# Event streams stay open indefinitely, so they are kept out of the request
+# metrics, and uncompressed so every event is sent as soon as it happens
+event_routes = Starlette(
+    routes=[
+        Route('/api/events', events, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    ]
+)
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Warm up before the server accepts connections"""
+    # uvicorn starts listening once startup is complete; /ready flips then too
+    await asyncio.get_running_loop().run_in_executor(upstream_executor, warm_up)
+    yield
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route('/api/search', async_routes),
+    Route('/api/play', async_routes),
+    Route('/api/batch', async_routes),
+    Route('/api/events', event_routes),
+    # Everything else is answered by the Flask app
+    Mount('/', app=WSGIMiddleware(web_app.app)),
+])
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    # Run the ASGI app
+    uvicorn.run(app, host='0.0.0.0', port=5000)
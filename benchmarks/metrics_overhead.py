@@ -0,0 +1,137 @@
+"""
+Metrics overhead benchmark
+Measures what recording metrics adds to each request
+
+Run from the repository root:
+    python -m benchmarks.metrics_overhead [--requests 20000]
+"""
+
+import time
+import argparse
+from typing import Dict
+
+from flask import Flask, jsonify
+
+from modules.metrics import (
+    MetricsRegistry, Counter, Histogram, HTTP_REQUESTS, HTTP_REQUEST_DURATION, REGISTRY
+)
+
+def per_call_us(func, count: int) -> float:
+    """
+    Time repeated calls
+    
+    Args:
+        func: Function to call without arguments
+        count: Number of calls
+        
+    Returns:
+        Average time per call in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+def make_app(instrumented: bool) -> Flask:
+    """
+    Build a minimal JSON app, optionally with the web app's metrics hooks
+    
+    Args:
+        instrumented: Whether to record request metrics
+        
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    
+    @app.route('/api/ping')
+    def ping():
+        return jsonify({'ok': True})
+    
+    if instrumented:
+        # Installs the same hooks the web app uses
+        import web_app
+        app.before_request(web_app.start_request_timer)
+        app.after_request(web_app.record_request_metrics)
+        app.teardown_request(web_app.finish_request)
+    
+    return app
+
+def benchmark_primitives(count: int) -> Dict[str, float]:
+    """
+    Measure the metric operations on their own
+    
+    Args:
+        count: Number of operations
+        
+    Returns:
+        Dictionary of measurements in microseconds
+    """
+    registry = MetricsRegistry()
+    counter = Counter("bench_total", "Benchmark counter", ("route",), registry=registry)
+    histogram = Histogram("bench_seconds", "Benchmark histogram", ("route",), registry=registry)
+    
+    return {
+        'counter_inc_us': per_call_us(lambda: counter.labels('/api/ping').inc(), count),
+        'histogram_observe_us': per_call_us(lambda: histogram.labels('/api/ping').observe(0.042), count),
+    }
+
+def benchmark_requests(count: int) -> Dict[str, float]:
+    """
+    Measure a request through Flask with and without metrics
+    
+    Args:
+        count: Number of requests
+        
+    Returns:
+        Dictionary of measurements in microseconds
+    """
+    results = {}
+    
+    for label, instrumented in (('plain', False), ('instrumented', True)):
+        client = make_app(instrumented).test_client()
+        
+        # Warm up routing and the metric label sets
+        for _ in range(100):
+            client.get('/api/ping')
+        
+        results[f'request_{label}_us'] = per_call_us(lambda: client.get('/api/ping'), count)
+    
+    results['request_overhead_us'] = results['request_instrumented_us'] - results['request_plain_us']
+    
+    # The hooks on their own, without the noise of the rest of the request
+    import web_app
+    app = make_app(False)
+    response = app.response_class()
+    
+    def hooks():
+        web_app.start_request_timer()
+        web_app.record_request_metrics(response)
+        web_app.finish_request()
+    
+    with app.test_request_context('/api/ping'):
+        results['hooks_us'] = per_call_us(hooks, count)
+    
+    return results
+
+def main():
+    """Run the benchmark and print the results"""
+    parser = argparse.ArgumentParser(description="Measure the cost of recording metrics")
+    parser.add_argument('--requests', type=int, default=20000, help="Number of requests and operations to time")
+    args = parser.parse_args()
+    
+    results = benchmark_primitives(args.requests * 10)
+    results.update(benchmark_requests(args.requests))
+    
+    # Rendering cost with the label sets a busy server accumulates
+    for route in range(20):
+        for status in (200, 304, 404, 500):
+            HTTP_REQUESTS.labels('GET', f"/bench/{route}", status).inc()
+        HTTP_REQUEST_DURATION.labels('GET', f"/bench/{route}").observe(0.01)
+    results['render_us'] = per_call_us(REGISTRY.render, 1000)
+    
+    for key, value in results.items():
+        print(f"{key:24}{value:10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Playlist format benchmark
+Compares the JSON and JSON Lines playlist formats on a large playlist
+
+Run from the repository root:
+    python -m benchmarks.playlist_formats [--tracks 100000]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from typing import List, Dict, Any
+
+from modules.playlist_manager import PlaylistManager
+from modules.jsonl_playlist_manager import JSONLinesPlaylistManager
+
+PLAYLIST_NAME = "benchmark"
+
+def make_tracks(count: int) -> List[Dict[str, Any]]:
+    """
+    Generate track dictionaries shaped like search results
+    
+    Args:
+        count: Number of tracks to generate
+        
+    Returns:
+        List of track dictionaries
+    """
+    tracks = []
+    
+    for i in range(count):
+        video_id = f"vid{i:08d}"
+        tracks.append({
+            'id': video_id,
+            'title': f"Benchmark track number {i} (official audio)",
+            'channel': f"Channel {i % 997}",
+            'duration': f"{i % 10}:{i % 60:02d}",
+            'views': f"{i * 37} views",
+            'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            'url': f"https://www.youtube.com/watch?v={video_id}"
+        })
+    
+    return tracks
+
+def timed(func) -> float:
+    """
+    Time a single call
+    
+    Args:
+        func: Function to call without arguments
+        
+    Returns:
+        Elapsed time in milliseconds
+    """
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def benchmark(manager_class, tracks: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Measure one playlist format
+    
+    Every read is done by a freshly started manager so nothing is served
+    from a warm cache.
+    
+    Args:
+        manager_class: Playlist manager class using the format
+        tracks: Tracks to store
+        
+    Returns:
+        Dictionary of measurements
+    """
+    playlists_dir = tempfile.mkdtemp(prefix="playlist-bench-")
+    results = {}
+    
+    try:
+        manager = manager_class(playlists_dir)
+        results['write_ms'] = timed(lambda: manager.save_playlist(PLAYLIST_NAME, tracks))
+        manager.close()
+        
+        path = os.path.join(playlists_dir, f"{PLAYLIST_NAME}{manager_class.PLAYLIST_EXTENSION}")
+        results['size_mb'] = os.path.getsize(path) / (1024 * 1024)
+        
+        manager = manager_class(playlists_dir)
+        results['count_ms'] = timed(manager.get_playlist_counts)
+        manager.close()
+        
+        # Resume playback halfway through the playlist and skip a few tracks
+        manager = manager_class(playlists_dir)
+        manager.current_playlist = PLAYLIST_NAME
+        manager.current_index = len(tracks) // 2
+        results['current_track_ms'] = timed(manager.get_current_track)
+        results['next_track_x100_ms'] = timed(lambda: [manager.next_track() for _ in range(100)])
+        manager.close()
+        
+        manager = manager_class(playlists_dir)
+        results['first_page_ms'] = timed(lambda: manager.get_playlist_page(PLAYLIST_NAME, 0, 100))
+        manager.close()
+        
+        manager = manager_class(playlists_dir)
+        results['full_load_ms'] = timed(lambda: manager.load_playlist(PLAYLIST_NAME))
+        manager.close()
+    finally:
+        shutil.rmtree(playlists_dir, ignore_errors=True)
+    
+    return results
+
+def main():
+    """Run the benchmark and print a comparison table"""
+    parser = argparse.ArgumentParser(description="Compare the JSON and JSON Lines playlist formats")
+    parser.add_argument('--tracks', type=int, default=100000, help="Number of tracks in the playlist")
+    args = parser.parse_args()
+    
+    tracks = make_tracks(args.tracks)
+    formats = [
+        ("JSON", PlaylistManager),
+        ("JSON Lines", JSONLinesPlaylistManager),
+    ]
+    results = [(label, benchmark(manager_class, tracks)) for label, manager_class in formats]
+    
+    print(f"Playlist of {args.tracks} tracks")
+    print(f"{'':22}" + "".join(f"{label:>14}" for label, _ in results))
+    for key in results[0][1]:
+        print(f"{key:22}" + "".join(f"{measurements[key]:14.2f}" for _, measurements in results))
+
+if __name__ == "__main__":
+    main()
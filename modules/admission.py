@@ -0,0 +1,282 @@
+"""
+Admission module
+Bounded concurrency and per-client rate limits for upstream-bound requests
+"""
+
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Callable, Optional
+
+from modules.metrics import ADMISSION_REJECTED, ADMISSION_ACTIVE, ADMISSION_WAITING
+from modules.state_store import StateStore, MemoryStateStore
+
+class Overloaded(Exception):
+    """Raised when a request is turned away because its route class is saturated"""
+    
+    status = 503
+    
+    def __init__(self, message: str, retry_after: float):
+        """
+        Initialize exception
+        
+        Args:
+            message: Error message for the client
+            retry_after: Seconds the client should wait before retrying
+        """
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class RateLimited(Overloaded):
+    """Raised when a client makes upstream-bound requests faster than allowed"""
+    
+    status = 429
+
+class _Waiter:
+    """
+    A request queued for a slot
+    """
+    
+    def __init__(self, notify: Callable[[], None]):
+        """
+        Initialize waiter
+        
+        Args:
+            notify: Called, from any thread, when the waiter is given a slot
+        """
+        self.notify = notify
+        self.admitted = False
+
+class AdmissionController:
+    """
+    Limits how many requests of one route class are handled at once
+    
+    Requests beyond the limit wait in a bounded queue, first come first
+    served, for at most a deadline. A request that finds the queue full, or
+    whose deadline passes, is turned away straight away with Overloaded
+    instead of tying up a server thread. Slots can be waited for from
+    threads (slot) or from an event loop (aslot).
+    """
+    
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        """
+        Initialize admission controller
+        
+        Args:
+            name: Route class, as reported in the metrics
+            limit: Requests handled at once
+            queue_size: Requests that may wait for a slot
+            timeout: Seconds a request may wait before it is turned away
+        """
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        
+        self._active_gauge = ADMISSION_ACTIVE.labels(name)
+        self._waiting_gauge = ADMISSION_WAITING.labels(name)
+    
+    def _reject(self, reason: str):
+        """
+        Turn a request away
+        
+        Args:
+            reason: Why, as reported in the metrics
+            
+        Raises:
+            Overloaded: Always
+        """
+        ADMISSION_REJECTED.labels(self.name, reason).inc()
+        raise Overloaded("Server is busy, please try again shortly", self.timeout)
+    
+    def _join(self, notify: Callable[[], None]) -> Optional[_Waiter]:
+        """
+        Take a free slot or queue for one
+        
+        Args:
+            notify: Called when a queued request is given a slot
+            
+        Returns:
+            None if a slot was taken, otherwise the queued waiter
+            
+        Raises:
+            Overloaded: If the queue is full
+        """
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                self._active_gauge.inc()
+                return None
+            
+            if len(self._waiters) >= self.queue_size:
+                waiter = None
+            else:
+                waiter = _Waiter(notify)
+                self._waiters.append(waiter)
+                self._waiting_gauge.inc()
+        
+        if waiter is None:
+            self._reject('queue_full')
+        
+        return waiter
+    
+    def _leave(self, waiter: _Waiter) -> bool:
+        """
+        Stop waiting for a slot
+        
+        Args:
+            waiter: Queued waiter
+            
+        Returns:
+            Whether the waiter was given a slot after all, which it now holds
+        """
+        with self._lock:
+            if not waiter.admitted:
+                self._waiters.remove(waiter)
+                self._waiting_gauge.dec()
+        
+        return waiter.admitted
+    
+    def release(self):
+        """Free a slot, handing it to the longest waiting request if there is one"""
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                self._active_gauge.dec()
+                return
+            
+            waiter = self._waiters.popleft()
+            waiter.admitted = True
+            self._waiting_gauge.dec()
+        
+        waiter.notify()
+    
+    def acquire(self):
+        """
+        Wait for a slot in the current thread
+        
+        Raises:
+            Overloaded: If the queue is full or the deadline passed
+        """
+        admitted = threading.Event()
+        waiter = self._join(admitted.set)
+        
+        # The slot may arrive just as the deadline passes
+        if waiter is not None and not admitted.wait(self.timeout) and not self._leave(waiter):
+            self._reject('timeout')
+    
+    async def aacquire(self):
+        """
+        Wait for a slot on the running event loop
+        
+        Raises:
+            Overloaded: If the queue is full or the deadline passed
+        """
+        loop = asyncio.get_running_loop()
+        admitted = asyncio.Event()
+        waiter = self._join(lambda: loop.call_soon_threadsafe(admitted.set))
+        
+        if waiter is None:
+            return
+        
+        try:
+            await asyncio.wait_for(admitted.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            if not self._leave(waiter):
+                self._reject('timeout')
+        except asyncio.CancelledError:
+            # A slot handed over meanwhile goes to the next request
+            if self._leave(waiter):
+                self.release()
+            raise
+    
+    @contextmanager
+    def slot(self):
+        """
+        Hold a slot for the duration of a with block, waiting in the current thread
+        
+        Raises:
+            Overloaded: If no slot could be had
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+    
+    @asynccontextmanager
+    async def aslot(self):
+        """
+        Hold a slot for the duration of an async with block
+        
+        Raises:
+            Overloaded: If no slot could be had
+        """
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+class RateLimiter:
+    """
+    Token bucket per client
+    
+    Each client may make `burst` requests at once and `rate` requests per
+    second after that, so one client can't take every slot from the rest.
+    The buckets are kept in a state store; with a shared one the limit holds
+    across all worker processes instead of for each.
+    """
+    
+    def __init__(self, rate: float, burst: int, store: Optional[StateStore] = None):
+        """
+        Initialize rate limiter
+        
+        Args:
+            rate: Requests per second each client is allowed on average
+            burst: Requests a client may make in a burst
+            store: State store keeping the buckets, in-process if None
+        """
+        self.rate = rate
+        self.burst = burst
+        self.store = store or MemoryStateStore()
+    
+    def check(self, client: str, route_class: str = 'upstream'):
+        """
+        Take a token for a request from a client
+        
+        Args:
+            client: Client identifier, such as its address
+            route_class: Route class of the request, as reported in the metrics
+            
+        Raises:
+            RateLimited: If the client has no tokens left
+        """
+        now = time.time()
+        rejected = []
+        
+        def take(bucket):
+            tokens, last = bucket or (self.burst, now)
+            tokens = min(self.burst, tokens + max(now - last, 0) * self.rate)
+            
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                rejected.append((1 - tokens) / self.rate)
+            
+            return [tokens, now]
+        
+        # A bucket left alone until it refilled is no different from a new
+        # one, so it expires then
+        self.store.update('rate_limits', client, take, ttl=self.burst / self.rate)
+        
+        if rejected:
+            ADMISSION_REJECTED.labels(route_class, 'rate_limited').inc()
+            raise RateLimited("Too many requests, please slow down", rejected[0])
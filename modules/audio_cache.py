@@ -0,0 +1,670 @@
+"""
+Audio Cache module
+Streams audio through the server and keeps a copy of it on disk
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Iterator
+from urllib.parse import urlparse, parse_qs
+import requests
+
+from modules.youtube_client import YouTubeClient
+from modules.metrics import CACHE_REQUESTS
+from modules.state_store import StateStore, MemoryStateStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Bytes of audio kept on disk; the least recently played tracks are evicted first
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Stream URLs carry an "expire" timestamp; stop using them this many seconds early
+URL_EXPIRY_MARGIN = 300
+
+# Assumed lifetime of a stream URL without an "expire" parameter
+DEFAULT_URL_TTL = 3600
+
+# Seconds to wait for the upstream server to respond or send more data
+UPSTREAM_TIMEOUT = 15
+
+# YouTube video IDs, which also name the cache files
+VIDEO_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{11}")
+
+class AudioCache:
+    """
+    Proxies audio streams from YouTube and caches them on disk
+    
+    Every track is cached as a file that grows from its first byte. A request
+    starting inside the cached prefix is answered from disk up to the end of
+    the prefix and from upstream after that, with the upstream bytes appended
+    to the cache as they are sent on, so the cache fills up even when the
+    player seeks around and aborts requests. Once the file is complete it is
+    served from disk alone. Only one request fills a track at a time, others
+    are proxied without caching; where file locks are available this holds
+    across worker processes too. Once the cached audio outgrows its size
+    limit, the least recently played tracks are deleted.
+    
+    Stream URLs are resolved once and reused until they expire; an URL
+    rejected by upstream is resolved again.
+    """
+    
+    def __init__(self, youtube_client: YouTubeClient, cache_dir: str = "audio_cache",
+                 chunk_size: int = 64 * 1024, state_store: Optional[StateStore] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize audio cache
+        
+        Args:
+            youtube_client: YouTube client instance used to resolve stream URLs
+            cache_dir: Directory to store cached audio in
+            chunk_size: Number of bytes read and sent at a time
+            state_store: Store for resolved stream URLs, in-process if None
+            max_bytes: Bytes of audio to keep, complete and partial tracks together
+        """
+        self.youtube_client = youtube_client
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        
+        # Resolved stream URLs with the time they stop being usable
+        self.state_store = state_store or MemoryStateStore()
+        
+        # Size and content type of each track, mirrored in <video_id>.json
+        self._info: Dict[str, Dict[str, Any]] = {}
+        
+        # Held by the request currently appending to a track's cache file
+        self._fill_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        
+        # Bytes on disk of each cached track, least recently played first
+        self._entries: OrderedDict = OrderedDict()
+        self._total = 0
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+    
+    def _scan(self):
+        """Index the audio already on disk, least recently played first"""
+        files: Dict[str, Tuple[float, int]] = {}
+        
+        for entry in os.scandir(self.cache_dir):
+            # Lock files left by earlier versions or crashed fills
+            if entry.name.endswith('.lock'):
+                video_id = entry.name[:-len('.lock')]
+                if VIDEO_ID_PATTERN.fullmatch(video_id):
+                    lock_file = self._lock_file(video_id)
+                    if lock_file is not None:
+                        self._unlock_file(video_id, lock_file)
+                continue
+            
+            video_id = entry.name[:-len('.part')] if entry.name.endswith('.part') else entry.name
+            if not VIDEO_ID_PATTERN.fullmatch(video_id) or not entry.is_file():
+                continue
+            
+            stat = entry.stat()
+            atime, size = files.get(video_id, (0.0, 0))
+            files[video_id] = (max(atime, stat.st_atime), size + stat.st_size)
+        
+        with self._lock:
+            for video_id, (_, size) in sorted(files.items(), key=lambda item: item[1][0]):
+                self._entries[video_id] = size
+                self._total += size
+            
+            self._evict()
+    
+    def _evict(self):
+        """Delete the least recently played tracks until the cache fits, with the lock held"""
+        for video_id in list(self._entries):
+            # The most recent one stays even if it alone is over the limit
+            if self._total <= self.max_bytes or len(self._entries) <= 1:
+                return
+            
+            # A track being filled is in use; it is evicted once it is done
+            fill_lock = self._fill_locks.get(video_id)
+            if fill_lock is not None and fill_lock.locked():
+                continue
+            
+            self._total -= self._entries.pop(video_id)
+            self._info.pop(video_id, None)
+            self._fill_locks.pop(video_id, None)
+            
+            for path in self._paths(video_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    
+    def _account(self, video_id: str):
+        """
+        Record the bytes a track takes on disk and mark it as recently played
+        
+        Args:
+            video_id: YouTube video ID
+        """
+        data_path, part_path, _ = self._paths(video_id)
+        size = 0
+        for path in (data_path, part_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        
+        with self._lock:
+            self._total += size - self._entries.pop(video_id, 0)
+            if size:
+                self._entries[video_id] = size
+            self._evict()
+    
+    def _paths(self, video_id: str) -> Tuple[str, str, str]:
+        """
+        Get the cache file paths of a track
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Tuple of (complete file, partial file, info file) paths
+        """
+        base = os.path.join(self.cache_dir, video_id)
+        return base, f"{base}.part", f"{base}.json"
+    
+    def _fill_lock(self, video_id: str) -> threading.Lock:
+        """
+        Get the lock guarding the cache file of a track
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Lock for the track
+        """
+        with self._lock:
+            return self._fill_locks.setdefault(video_id, threading.Lock())
+    
+    def _lock_file(self, video_id: str):
+        """
+        Take the lock that keeps other processes from filling a track's cache file
+        
+        The lock file only exists while a track is being filled.
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Open lock file to pass to _unlock_file when done, True if file
+            locks aren't available, or None if another process holds the lock
+        """
+        if fcntl is None:
+            return True
+        
+        path = os.path.join(self.cache_dir, f"{video_id}.lock")
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            
+            # The holder may have deleted the file between our open and flock,
+            # leaving us a lock nobody else can see
+            if os.fstat(lock_file.fileno()).st_ino != os.stat(path).st_ino:
+                raise FileNotFoundError(path)
+        except OSError:
+            lock_file.close()
+            return None
+        
+        return lock_file
+    
+    def _unlock_file(self, video_id: str, lock_file):
+        """
+        Release a lock taken by _lock_file and delete its file
+        
+        Args:
+            video_id: YouTube video ID
+            lock_file: What _lock_file returned
+        """
+        if lock_file is True:
+            return
+        
+        # Deleted while still held, so nobody can lock the file on its way out
+        try:
+            os.remove(os.path.join(self.cache_dir, f"{video_id}.lock"))
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+    
+    def get_stream_url(self, video_id: str, refresh: bool = False) -> Optional[str]:
+        """
+        Get a usable upstream URL for a track's audio
+        
+        Args:
+            video_id: YouTube video ID
+            refresh: Resolve a new URL even if the known one hasn't expired
+            
+        Returns:
+            Stream URL or None if it couldn't be resolved
+        """
+        known = self.state_store.get('stream_urls', video_id)
+        if known and not refresh and known['usable_until'] > time.time():
+            CACHE_REQUESTS.labels('stream_url', 'hit').inc()
+            return known['url']
+        
+        CACHE_REQUESTS.labels('stream_url', 'miss').inc()
+        
+        url, video_info = self.youtube_client.get_audio_stream(video_id)
+        
+        if not url:
+            return None
+        
+        self.remember_stream_url(video_id, url, video_info)
+        return url
+    
+    def remember_stream_url(self, video_id: str, url: str, video_info: Dict[str, Any]):
+        """
+        Keep a stream URL resolved elsewhere, so streaming the track doesn't resolve it again
+        
+        Args:
+            video_id: YouTube video ID
+            url: Stream URL returned by the YouTube client
+            video_info: Video information returned with it
+        """
+        expire = parse_qs(urlparse(url).query).get('expire')
+        try:
+            usable_until = int(expire[0]) - URL_EXPIRY_MARGIN
+        except (TypeError, ValueError):
+            usable_until = time.time() + DEFAULT_URL_TTL
+        
+        self.state_store.set(
+            'stream_urls', video_id,
+            {'url': url, 'usable_until': usable_until},
+            ttl=max(0, usable_until - time.time())
+        )
+        
+        with self._lock:
+            # Remember the content type until the size is known too
+            info = self._info.setdefault(video_id, {})
+            info.setdefault('content_type', video_info.get('content_type', 'audio/mp4'))
+    
+    def _request_upstream(self, video_id: str, start: int, end: int) -> Optional[requests.Response]:
+        """
+        Request a byte range of a track from upstream
+        
+        Args:
+            video_id: YouTube video ID
+            start: First byte to request
+            end: Last byte to request
+            
+        Returns:
+            Streaming response or None if the request failed
+        """
+        for attempt in range(2):
+            url = self.get_stream_url(video_id, refresh=attempt > 0)
+            if not url:
+                return None
+            
+            try:
+                response = requests.get(
+                    url,
+                    headers={'Range': f"bytes={start}-{end}"},
+                    stream=True,
+                    timeout=UPSTREAM_TIMEOUT
+                )
+            except requests.RequestException as e:
+                print(f"Error requesting audio stream: {str(e)}")
+                return None
+            
+            if response.status_code in (200, 206):
+                return response
+            
+            response.close()
+            
+            # Expired or revoked URLs are refused, try again with a fresh one
+            if response.status_code not in (403, 404, 410):
+                print(f"Audio stream request failed with status {response.status_code}")
+                return None
+        
+        return None
+    
+    def _load_info(self, video_id: str) -> Dict[str, Any]:
+        """
+        Get what is known about a track's audio
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Dictionary with 'size' and 'content_type' when known
+        """
+        with self._lock:
+            info = self._info.get(video_id)
+            if info and 'size' in info:
+                return info
+        
+        try:
+            with open(self._paths(video_id)[2], 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return info or {}
+        
+        with self._lock:
+            info = self._info.setdefault(video_id, {})
+            info.update(stored)
+            return info
+    
+    def load_info(self) -> int:
+        """
+        Read what is known about every cached track into memory
+        
+        Returns:
+            Number of tracks whose size is known
+        """
+        try:
+            filenames = [filename for filename in os.listdir(self.cache_dir) if filename.endswith('.json')]
+        except OSError as e:
+            print(f"Error listing audio cache: {str(e)}")
+            return 0
+        
+        loaded = 0
+        for filename in filenames:
+            video_id = filename[:-len('.json')]
+            if VIDEO_ID_PATTERN.fullmatch(video_id) and 'size' in self._load_info(video_id):
+                loaded += 1
+        
+        return loaded
+    
+    def _save_info(self, video_id: str, size: int, content_type: str):
+        """
+        Record the size and content type of a track's audio
+        
+        Args:
+            video_id: YouTube video ID
+            size: Size of the audio in bytes
+            content_type: MIME type of the audio
+        """
+        with self._lock:
+            self._info[video_id] = {'size': size, 'content_type': content_type}
+        
+        info_path = self._paths(video_id)[2]
+        tmp_path = f"{info_path}.tmp"
+        
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': size, 'content_type': content_type}, f)
+        os.replace(tmp_path, info_path)
+    
+    def _response_size(self, response: requests.Response) -> Optional[int]:
+        """
+        Get the full size of the audio from an upstream response
+        
+        Args:
+            response: Upstream response
+            
+        Returns:
+            Size in bytes or None if the response doesn't say
+        """
+        content_range = response.headers.get('Content-Range', '')
+        
+        if response.status_code == 206 and '/' in content_range:
+            size = content_range.rsplit('/', 1)[1]
+        else:
+            size = response.headers.get('Content-Length', '')
+        
+        return int(size) if size.isdigit() else None
+    
+    def get_info(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the size and content type of a track's audio, asking upstream if unknown
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Dictionary with 'size' and 'content_type' or None if the track is unavailable
+        """
+        info = self._load_info(video_id)
+        if 'size' in info:
+            return info
+        
+        # A one byte range request reveals the full size in Content-Range
+        response = self._request_upstream(video_id, 0, 0)
+        if response is None:
+            return None
+        
+        with response:
+            size = self._response_size(response)
+        
+        if size is None:
+            print(f"Audio stream for {video_id} has no known size")
+            return None
+        
+        content_type = self._load_info(video_id).get('content_type', 'audio/mp4')
+        self._save_info(video_id, size, content_type)
+        
+        return self._load_info(video_id)
+    
+    def etag(self, video_id: str) -> Optional[str]:
+        """
+        Get the entity tag of a track's audio
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Entity tag or None if the size isn't known yet
+        """
+        size = self._load_info(video_id).get('size')
+        return None if size is None else f"{video_id}-{size:x}"
+    
+    def cached_path(self, video_id: str) -> Optional[str]:
+        """
+        Get the path of a fully cached track
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Absolute path to the cached audio or None if the track isn't completely cached
+        """
+        path = os.path.abspath(self._paths(video_id)[0])
+        
+        try:
+            # The access time keeps the recency order across restarts
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            CACHE_REQUESTS.labels('audio', 'miss').inc()
+            return None
+        
+        CACHE_REQUESTS.labels('audio', 'hit').inc()
+        
+        with self._lock:
+            known = video_id in self._entries
+            if known:
+                self._entries.move_to_end(video_id)
+        
+        # Filled by another worker process sharing the directory
+        if not known:
+            self._account(video_id)
+        
+        return path
+    
+    def _commit(self, video_id: str):
+        """
+        Turn a completely filled partial file into the cached track
+        
+        Args:
+            video_id: YouTube video ID
+        """
+        data_path, part_path, _ = self._paths(video_id)
+        size = self._load_info(video_id).get('size')
+        
+        if size is not None and os.path.exists(part_path) and os.path.getsize(part_path) == size:
+            os.replace(part_path, data_path)
+    
+    def _discard(self, video_id: str):
+        """
+        Drop everything cached for a track
+        
+        Args:
+            video_id: YouTube video ID
+        """
+        with self._lock:
+            self._info.pop(video_id, None)
+            self._fill_locks.pop(video_id, None)
+            self._total -= self._entries.pop(video_id, 0)
+        
+        for path in self._paths(video_id):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _read_file(self, path: str, start: int, stop: int) -> Iterator[bytes]:
+        """
+        Read a byte range of a file in chunks
+        
+        Args:
+            path: Path to the file
+            start: First byte to read
+            stop: Byte to stop before
+            
+        Yields:
+            Chunks of bytes
+        """
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+    
+    def _iter_upstream(self, response: requests.Response, start: int, end: int) -> Iterator[bytes]:
+        """
+        Read exactly the requested byte range from an upstream response
+        
+        Args:
+            response: Upstream response to a range request
+            start: First byte that was requested
+            end: Last byte that was requested
+            
+        Yields:
+            Chunks of bytes
+        """
+        # A server that ignored the Range header sends the whole file
+        skip = start if response.status_code == 200 else 0
+        remaining = end - start + 1
+        
+        for chunk in response.iter_content(self.chunk_size):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            
+            chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+            
+            if remaining <= 0:
+                return
+    
+    def _stream(self, video_id: str, start: int, end: int) -> Iterator[bytes]:
+        """
+        Generate a byte range of a track, filling the cache where possible
+        
+        An empty chunk is yielded once the upstream request has succeeded,
+        before any audio.
+        
+        Args:
+            video_id: YouTube video ID
+            start: First byte to send
+            end: Last byte to send
+            
+        Yields:
+            Chunks of bytes
+        """
+        _, part_path, _ = self._paths(video_id)
+        fill_lock = self._fill_lock(video_id)
+        filling = fill_lock.acquire(blocking=False)
+        
+        lock_file = self._lock_file(video_id) if filling else None
+        if filling and lock_file is None:
+            fill_lock.release()
+            filling = False
+        
+        fill = False
+        
+        try:
+            cached = os.path.getsize(part_path) if filling and os.path.exists(part_path) else 0
+            
+            # The cache can only grow if this request picks up where it ends
+            fill = filling and start <= cached
+            upstream_start = cached if fill else start
+            
+            upstream = None
+            if upstream_start <= end:
+                upstream = self._request_upstream(video_id, upstream_start, end)
+                if upstream is None:
+                    return
+                
+                # A fresh URL may point at a different format than the cached bytes
+                if fill and self._response_size(upstream) != self._load_info(video_id).get('size'):
+                    upstream.close()
+                    self._discard(video_id)
+                    return
+            
+            yield b''
+            
+            if fill and start < cached:
+                CACHE_REQUESTS.labels('audio', 'partial_hit').inc()
+                yield from self._read_file(part_path, start, min(cached, end + 1))
+            
+            if upstream is not None:
+                with upstream:
+                    if fill:
+                        with open(part_path, 'ab') as f:
+                            for chunk in self._iter_upstream(upstream, upstream_start, end):
+                                f.write(chunk)
+                                yield chunk
+                    else:
+                        yield from self._iter_upstream(upstream, upstream_start, end)
+            
+            if fill:
+                self._commit(video_id)
+        
+        finally:
+            # Count what the request added, even if the client went away mid-track
+            if fill:
+                self._account(video_id)
+            
+            if filling:
+                self._unlock_file(video_id, lock_file)
+                fill_lock.release()
+    
+    def open(self, video_id: str, start: int, end: int) -> Optional[Iterator[bytes]]:
+        """
+        Open a byte range of a track that isn't completely cached
+        
+        The upstream request is made before returning, so a failure can still
+        be reported to the client.
+        
+        Args:
+            video_id: YouTube video ID
+            start: First byte to send
+            end: Last byte to send
+            
+        Returns:
+            Iterator over chunks of bytes, or None if the audio is unavailable
+        """
+        chunks = self._stream(video_id, start, end)
+        
+        # Runs up to the point where the upstream request succeeded
+        if next(chunks, None) is None:
+            return None
+        
+        return chunks
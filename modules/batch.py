@@ -0,0 +1,120 @@
+"""
+Batch module
+Validation and scheduling of the sub-operations of a /api/batch request
+"""
+
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Optional
+
+# Most operations a single batch may contain
+MAX_BATCH_OPERATIONS = 20
+
+# Methods a batched operation may use
+BATCH_METHODS = ('GET', 'POST', 'DELETE')
+
+# Routes that can't be batched: streams never finish, images aren't JSON and
+# batches don't nest
+EXCLUDED_PREFIXES = ('/api/batch', '/api/events', '/api/stream/', '/api/thumb/')
+
+# Status of an operation skipped because the one it runs after failed
+FAILED_DEPENDENCY = 424
+
+def parse_operations(data: Any) -> List[Dict[str, Any]]:
+    """
+    Validate the body of a batch request
+    
+    Each operation is an object with a "method", a "path" under /api/
+    (optionally with a query string), an optional JSON "body" and an
+    optional "after": the index of an earlier operation it has to wait for.
+    
+    Args:
+        data: Parsed JSON body, expected to hold an "operations" list
+        
+    Returns:
+        List of operations with 'method', 'path', 'query', 'body' and 'after'
+        
+    Raises:
+        ValueError: If the batch or one of its operations is invalid
+    """
+    operations = data.get('operations') if isinstance(data, dict) else None
+    
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("No operations provided")
+    
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f"A batch can hold at most {MAX_BATCH_OPERATIONS} operations")
+    
+    parsed = []
+    
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {index} is not an object")
+        
+        method = str(operation.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            raise ValueError(f"Operation {index} uses unsupported method {method}")
+        
+        url = urlsplit(str(operation.get('path', '')))
+        if url.scheme or url.netloc or not url.path.startswith('/api/') or url.path.startswith(EXCLUDED_PREFIXES):
+            raise ValueError(f"Operation {index} has a path that can't be batched")
+        
+        after = operation.get('after')
+        if after is not None and (not isinstance(after, int) or isinstance(after, bool) or not 0 <= after < index):
+            raise ValueError(f"Operation {index} must run after an earlier operation")
+        
+        parsed.append({
+            'method': method,
+            'path': url.path,
+            'query': url.query,
+            'body': operation.get('body'),
+            'after': after
+        })
+    
+    return parsed
+
+def plan_stages(operations: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Group operations into stages that can each run concurrently
+    
+    An operation goes into the stage after the one holding the operation it
+    runs after; operations without "after" all go into the first stage.
+    
+    Args:
+        operations: Operations from parse_operations()
+        
+    Returns:
+        List of stages, each a list of operation indexes
+    """
+    depths = []
+    stages: List[List[int]] = []
+    
+    for index, operation in enumerate(operations):
+        depth = 0 if operation['after'] is None else depths[operation['after']] + 1
+        depths.append(depth)
+        
+        if depth == len(stages):
+            stages.append([])
+        stages[depth].append(index)
+    
+    return stages
+
+def skipped_result(operation: Dict[str, Any], results: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Get the result of an operation that can't run because its dependency failed
+    
+    Args:
+        operation: Operation about to run
+        results: Results of the operations so far, by index
+        
+    Returns:
+        Result to report instead of running the operation, or None if it can run
+    """
+    after = operation['after']
+    
+    if after is None or results[after]['status'] < 400:
+        return None
+    
+    return {
+        'status': FAILED_DEPENDENCY,
+        'body': {'error': f"Skipped because operation {after} failed"}
+    }
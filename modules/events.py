@@ -0,0 +1,436 @@
+"""
+Events module
+Per-session playback state and Server-Sent Events pushed to listening clients
+"""
+
+import json
+import time
+import asyncio
+import secrets
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator, Set
+
+from modules.metrics import Gauge
+from modules.state_store import StateStore, MemoryStateStore
+
+# Events held for a listener that isn't keeping up; older ones are dropped
+EVENT_BUFFER_SIZE = 100
+
+# Seconds between heartbeats on an idle stream, which keep proxies from
+# closing it and reveal clients that went away
+HEARTBEAT_INTERVAL = 15
+
+# Sessions without listeners are forgotten after this many idle seconds
+SESSION_IDLE_TIMEOUT = 3600
+
+# Seconds between sweeps for idle sessions
+SWEEP_INTERVAL = 60
+
+# Seconds between checks for events published by other worker processes
+EVENT_POLL_INTERVAL = 0.25
+
+# State of a session that hasn't played anything yet
+DEFAULT_SESSION_STATE = {'current_track': None}
+
+# Comment line sent when there is nothing else to send
+HEARTBEAT = ": heartbeat\n\n"
+
+EVENT_LISTENERS = Gauge(
+    "event_listeners", "Clients connected to the event stream"
+)
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """
+    Format a message in the Server-Sent Events wire format
+    
+    Args:
+        event: Event type
+        data: JSON-serializable payload
+        event_id: Sequence number of the event
+        
+    Returns:
+        Message text
+    """
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n{message}"
+    return message
+
+class Listener:
+    """
+    One connected event stream with its own bounded buffer
+    """
+    
+    def __init__(self, notify: Callable[[], None]):
+        """
+        Initialize listener
+        
+        Args:
+            notify: Called, from any thread, when messages are waiting
+        """
+        self.notify = notify
+        self._buffer = deque(maxlen=EVENT_BUFFER_SIZE)
+        self._overflowed = False
+        self._lock = threading.Lock()
+    
+    def push(self, message: str):
+        """
+        Queue a message for the listener
+        
+        Args:
+            message: Formatted event
+        """
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._overflowed = True
+            self._buffer.append(message)
+        
+        self.notify()
+    
+    def drain(self) -> Optional[str]:
+        """
+        Take all queued messages
+        
+        Returns:
+            Queued messages joined together, or None if there are none
+        """
+        with self._lock:
+            if not self._buffer:
+                return None
+            
+            messages = ''.join(self._buffer)
+            self._buffer.clear()
+            
+            # Dropped events can't be replayed, the client has to refetch everything
+            if self._overflowed:
+                self._overflowed = False
+                messages = format_event('resync', {}) + messages
+        
+        return messages
+
+class Session:
+    """
+    Connection of one browser, shared by its tabs
+    
+    The session's state lives in the hub's state store; this only tracks the
+    event streams this process has open for it.
+    """
+    
+    def __init__(self, session_id: str):
+        """
+        Initialize session
+        
+        Args:
+            session_id: Unguessable session identifier
+        """
+        self.id = session_id
+        self.listeners: Set[Listener] = set()
+        self.last_seen = time.monotonic()
+        
+        # When the session's expiry in the state store was last pushed back
+        self.last_renewed = 0.0
+
+class EventHub:
+    """
+    Keeps sessions and delivers events to their listeners
+    
+    Events are either sent to the listeners of one session, like a change of
+    the track it is playing, or broadcast to every listener, like playlist
+    changes. Publishing never blocks: each listener has a bounded buffer,
+    and a listener that falls behind loses its oldest events and is told to
+    resynchronize instead.
+    
+    Session state is kept in a state store. With a shared store every worker
+    process sees the same sessions, and events are relayed through the store
+    so listeners connected to one worker hear about changes made in another.
+    
+    Listeners can be served by a thread per stream (stream) or by an event
+    loop (astream); the latter holds many idle streams cheaply.
+    """
+    
+    def __init__(self, store: Optional[StateStore] = None):
+        """
+        Initialize event hub
+        
+        Args:
+            store: State store for session state and events, in-process if None
+        """
+        self.store = store or MemoryStateStore()
+        
+        # Sessions with streams in this process, or recently used from it
+        self._sessions: Dict[str, Session] = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        
+        # Relays events from a shared store, started with the first listener
+        self._relay_thread = None
+    
+    def get_session(self, session_id: Optional[str]) -> Session:
+        """
+        Get a session, creating a new one if it doesn't exist
+        
+        Args:
+            session_id: Session identifier sent by the client, if any
+            
+        Returns:
+            The session; its id differs from session_id if it was created
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            if now - self._last_sweep > SWEEP_INTERVAL:
+                self._sweep(now)
+            
+            session = self._sessions.get(session_id) if session_id else None
+        
+        if session is None:
+            # Sessions started by another worker are only known to the store
+            if not session_id or self.store.get('sessions', session_id) is None:
+                session_id = secrets.token_urlsafe(16)
+                self.store.set('sessions', session_id, dict(DEFAULT_SESSION_STATE), ttl=SESSION_IDLE_TIMEOUT)
+            
+            with self._lock:
+                session = self._sessions.setdefault(session_id, Session(session_id))
+                session.last_renewed = now
+        
+        self._renew(session, now)
+        return session
+    
+    def _renew(self, session: Session, now: float):
+        """
+        Mark a session as in use, pushing back its expiry in the store now and then
+        
+        Args:
+            session: Session in use
+            now: Current monotonic time
+        """
+        session.last_seen = now
+        
+        if now - session.last_renewed > SWEEP_INTERVAL:
+            session.last_renewed = now
+            self.store.update(
+                'sessions', session.id,
+                lambda state: state or dict(DEFAULT_SESSION_STATE),
+                ttl=SESSION_IDLE_TIMEOUT
+            )
+    
+    def _sweep(self, now: float):
+        """
+        Forget sessions that have been idle for too long
+        
+        Their state expires from the store by itself.
+        
+        Args:
+            now: Current monotonic time
+        """
+        self._last_sweep = now
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if not session.listeners and now - session.last_seen > SESSION_IDLE_TIMEOUT
+        ]
+        for session_id in idle:
+            del self._sessions[session_id]
+    
+    def session_count(self) -> int:
+        """
+        Get the number of sessions known to this process
+        
+        Returns:
+            Number of sessions
+        """
+        with self._lock:
+            return len(self._sessions)
+    
+    def get_state(self, session: Session) -> Dict[str, Any]:
+        """
+        Get a session's state
+        
+        Args:
+            session: Session to look up
+            
+        Returns:
+            State dictionary
+        """
+        return self.store.get('sessions', session.id) or dict(DEFAULT_SESSION_STATE)
+    
+    def _deliver(self, event_id: int, message: Dict[str, Any]):
+        """
+        Queue an event for the listeners in this process it is meant for
+        
+        Args:
+            event_id: Sequence number of the event
+            message: Event with its 'event' type, 'data' and target 'session'
+        """
+        with self._lock:
+            if message['session'] is None:
+                listeners = [listener for s in self._sessions.values() for listener in s.listeners]
+            else:
+                session = self._sessions.get(message['session'])
+                listeners = list(session.listeners) if session else []
+        
+        if not listeners:
+            return
+        
+        formatted = format_event(message['event'], message['data'], event_id)
+        for listener in listeners:
+            listener.push(formatted)
+    
+    def publish(self, event: str, data: Any, session: Optional[Session] = None):
+        """
+        Send an event to one session's listeners or to everyone
+        
+        Args:
+            event: Event type
+            data: JSON-serializable payload
+            session: Session to send to, or None to broadcast
+        """
+        message = {'event': event, 'data': data, 'session': session.id if session else None}
+        event_id = self.store.append_event(message)
+        
+        # Events in a shared store reach this process's listeners through the relay
+        if not self.store.shared:
+            self._deliver(event_id, message)
+    
+    def _start_relay(self):
+        """Start relaying events from a shared store if it isn't running yet"""
+        with self._lock:
+            if not self.store.shared or self._relay_thread is not None:
+                return
+            
+            self._relay_thread = threading.Thread(target=self._relay_loop, args=(self.store.last_event_id(),))
+            self._relay_thread.daemon = True
+            self._relay_thread.start()
+    
+    def _relay_loop(self, last_event_id: int):
+        """
+        Deliver events published by any process to this process's listeners
+        
+        Args:
+            last_event_id: Sequence number of the last event already handled
+        """
+        while True:
+            time.sleep(EVENT_POLL_INTERVAL)
+            
+            try:
+                events = self.store.events_since(last_event_id)
+            except Exception as e:
+                print(f"Error reading events: {str(e)}")
+                continue
+            
+            for event_id, message in events:
+                self._deliver(event_id, message)
+                last_event_id = event_id
+    
+    def update_state(self, session: Session, event: str, **changes):
+        """
+        Change a session's state and tell its listeners
+        
+        Args:
+            session: Session to update
+            event: Event type announcing the change
+            **changes: State keys and their new values, also sent as the payload
+        """
+        self.store.update(
+            'sessions', session.id,
+            lambda state: dict(state or DEFAULT_SESSION_STATE, **changes),
+            ttl=SESSION_IDLE_TIMEOUT
+        )
+        
+        self.publish(event, changes, session)
+    
+    def _add_listener(self, session: Session, notify: Callable[[], None]) -> Listener:
+        """
+        Connect a listener to a session and queue the session's state for it
+        
+        Args:
+            session: Session to listen to
+            notify: Called when messages are waiting
+            
+        Returns:
+            The new listener
+        """
+        listener = Listener(notify)
+        
+        with self._lock:
+            session.listeners.add(listener)
+        
+        self._start_relay()
+        
+        # Every stream starts from the full state, so reconnecting clients catch up
+        listener.push(format_event('state', self.get_state(session)))
+        EVENT_LISTENERS.inc()
+        return listener
+    
+    def _remove_listener(self, session: Session, listener: Listener):
+        """
+        Disconnect a listener from a session
+        
+        Args:
+            session: Session the listener was connected to
+            listener: Listener to remove
+        """
+        with self._lock:
+            session.listeners.discard(listener)
+            session.last_seen = time.monotonic()
+        
+        EVENT_LISTENERS.dec()
+    
+    def stream(self, session: Session) -> Iterator[str]:
+        """
+        Generate a session's event stream, blocking the calling thread
+        
+        Args:
+            session: Session to listen to
+            
+        Yields:
+            Formatted events and heartbeats
+        """
+        wakeup = threading.Event()
+        listener = self._add_listener(session, wakeup.set)
+        
+        try:
+            while True:
+                woken = wakeup.wait(HEARTBEAT_INTERVAL)
+                wakeup.clear()
+                
+                messages = listener.drain()
+                if messages:
+                    yield messages
+                elif not woken:
+                    self._renew(session, time.monotonic())
+                    yield HEARTBEAT
+        finally:
+            self._remove_listener(session, listener)
+    
+    async def astream(self, session: Session) -> AsyncIterator[str]:
+        """
+        Generate a session's event stream on the running event loop
+        
+        Args:
+            session: Session to listen to
+            
+        Yields:
+            Formatted events and heartbeats
+        """
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        listener = self._add_listener(session, lambda: loop.call_soon_threadsafe(wakeup.set))
+        
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), HEARTBEAT_INTERVAL)
+                    woken = True
+                except asyncio.TimeoutError:
+                    woken = False
+                wakeup.clear()
+                
+                messages = listener.drain()
+                if messages:
+                    yield messages
+                elif not woken:
+                    self._renew(session, time.monotonic())
+                    yield HEARTBEAT
+        finally:
+            self._remove_listener(session, listener)
@@ -0,0 +1,125 @@
+"""
+Frame Budget module
+Decides when a live terminal screen redraws and measures what redraws cost
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Hashable
+
+# Most redraws per second of a live screen
+DEFAULT_MAX_FPS = 4.0
+
+# Share of a core that redraws may use; slower redraws are made less often
+DEFAULT_RENDER_BUDGET = 0.02
+
+class FrameBudget:
+    """
+    Redraws a screen only when what it shows changed, within a CPU budget
+    
+    The caller describes what a frame would show with a hashable value,
+    such as the status and the number of filled progress bar cells. A frame
+    is due when that value differs from the one last drawn and enough time
+    has passed since the last frame: at least 1 / max_fps seconds, and long
+    enough that the time spent drawing stays within `budget` of the time
+    between frames. Frames drawn in answer to a keypress skip the wait.
+    """
+    
+    def __init__(self, max_fps: float = DEFAULT_MAX_FPS, budget: float = DEFAULT_RENDER_BUDGET):
+        """
+        Initialize frame budget
+        
+        Args:
+            max_fps: Most frames per second
+            budget: Share of a core, between 0 and 1, that drawing may use
+            
+        Raises:
+            ValueError: If max_fps isn't positive or budget isn't between 0 and 1
+        """
+        if not max_fps > 0:
+            raise ValueError("max_fps must be positive")
+        if not 0 < budget <= 1:
+            raise ValueError("budget must be greater than 0 and at most 1")
+        
+        self.min_interval = 1 / max_fps
+        self.budget = budget
+        
+        # What the last frame showed and when the next may be drawn
+        self._drawn: Any = None
+        self._next_frame = 0.0
+        
+        self.frames = 0
+        self.render_seconds = 0.0
+        self.max_render_seconds = 0.0
+        self._started = time.monotonic()
+    
+    def due(self, state: Hashable, urgent: bool = False) -> bool:
+        """
+        Check whether a frame showing a state should be drawn now
+        
+        Args:
+            state: What the frame would show
+            urgent: Skip the wait between frames, for feedback to a keypress
+            
+        Returns:
+            True if the state changed and a frame may be drawn
+        """
+        if self.frames and state == self._drawn:
+            return False
+        
+        return urgent or time.monotonic() >= self._next_frame
+    
+    def wait(self, until_change: float) -> float:
+        """
+        Get how long to sleep before checking for a frame again
+        
+        Args:
+            until_change: Seconds until what the screen shows is expected to change
+            
+        Returns:
+            Seconds to sleep
+        """
+        return max(until_change, self._next_frame - time.monotonic(), 0)
+    
+    @contextmanager
+    def frame(self, state: Hashable):
+        """
+        Time the drawing of a frame in a with block
+        
+        Args:
+            state: What the frame shows
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            
+            self._drawn = state
+            self.frames += 1
+            self.render_seconds += elapsed
+            self.max_render_seconds = max(self.max_render_seconds, elapsed)
+            
+            # A frame costing more than the budget allows delays the next one
+            self._next_frame = start + max(self.min_interval, elapsed / self.budget)
+    
+    def cpu_share(self) -> float:
+        """
+        Get the share of a core spent drawing since the budget was created
+        
+        Returns:
+            Seconds spent drawing per second elapsed
+        """
+        elapsed = time.monotonic() - self._started
+        return self.render_seconds / elapsed if elapsed > 0 else 0.0
+    
+    def summary(self) -> str:
+        """
+        Describe what drawing has cost so far
+        
+        Returns:
+            One line with the frame count, time per frame and share of a core
+        """
+        average = self.render_seconds / self.frames if self.frames else 0.0
+        return (f"{self.frames} frames, {average * 1000:.1f} ms average, "
+                f"{self.max_render_seconds * 1000:.1f} ms max, {self.cpu_share():.2%} of a core")
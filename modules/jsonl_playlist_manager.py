@@ -0,0 +1,498 @@
+"""
+JSON Lines Playlist Manager module
+Stores playlists as JSON Lines files that can be read one track at a time
+"""
+
+import os
+import json
+import argparse
+from array import array
+from typing import List, Dict, Any, Optional, Tuple
+
+from modules.playlist_manager import PlaylistManager
+from modules.state_store import StateStore
+
+# Written as the first line of every playlist file, the tracks follow one per line
+FORMAT_NAME = "playlist-jsonl"
+FORMAT_VERSION = 1
+
+# Created in the playlists directory once JSON playlists were converted, so
+# deleting every JSON Lines playlist doesn't bring the old JSON ones back
+IMPORT_MARKER = ".jsonl_imported"
+
+def write_jsonl(tracks: List[Dict[str, Any]], f):
+    """
+    Write tracks in the JSON Lines playlist format
+    
+    Args:
+        tracks: List of track dictionaries
+        f: File opened for writing in text mode
+    """
+    header = {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'count': len(tracks)}
+    f.write(json.dumps(header) + "\n")
+    
+    for track in tracks:
+        # json.dumps escapes newlines inside strings, so every track stays on one line
+        f.write(json.dumps(track, separators=(',', ':')) + "\n")
+
+def read_header(f) -> Dict[str, Any]:
+    """
+    Read the header line of a JSON Lines playlist
+    
+    Args:
+        f: Playlist file positioned at its start, in text or binary mode
+        
+    Returns:
+        Header dictionary including the track 'count'
+    """
+    header = json.loads(f.readline())
+    
+    if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+        raise ValueError("Not a JSON Lines playlist")
+    
+    return header
+
+def read_jsonl(f) -> List[Dict[str, Any]]:
+    """
+    Read all tracks of a JSON Lines playlist
+    
+    Args:
+        f: Playlist file positioned at its start
+        
+    Returns:
+        List of track dictionaries
+    """
+    read_header(f)
+    
+    # Parsing the body as one array is much faster than a json.loads per line
+    lines = [line for line in f.read().splitlines() if line.strip()]
+    return json.loads("[" + ",".join(lines) + "]")
+
+def convert_json_to_jsonl(json_path: str, jsonl_path: str) -> int:
+    """
+    Convert a JSON playlist file to the JSON Lines format
+    
+    Args:
+        json_path: Path of the JSON playlist to read
+        jsonl_path: Path of the JSON Lines playlist to write
+        
+    Returns:
+        Number of tracks converted
+    """
+    with open(json_path, 'r') as f:
+        tracks = json.load(f)
+    
+    tmp_path = f"{jsonl_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        write_jsonl(tracks, f)
+    os.replace(tmp_path, jsonl_path)
+    
+    return len(tracks)
+
+def convert_jsonl_to_json(jsonl_path: str, json_path: str) -> int:
+    """
+    Convert a JSON Lines playlist file to the JSON format
+    
+    Args:
+        jsonl_path: Path of the JSON Lines playlist to read
+        json_path: Path of the JSON playlist to write
+        
+    Returns:
+        Number of tracks converted
+    """
+    with open(jsonl_path, 'r') as f:
+        tracks = read_jsonl(f)
+    
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(tracks, f, indent=2)
+    os.replace(tmp_path, json_path)
+    
+    return len(tracks)
+
+class JSONLinesPlaylistManager(PlaylistManager):
+    """
+    Playlist manager storing playlists as JSON Lines files
+    
+    A playlist file starts with a header line holding the number of tracks,
+    followed by one compact JSON object per track. Counting tracks only reads
+    the header and a single track is read by seeking to its line. Line offsets
+    are found by scanning for newlines, without parsing any JSON, only as far
+    as the requested track, and are kept until the file changes. Edits go
+    through the base class and still rewrite the whole file atomically.
+    """
+    
+    PLAYLIST_EXTENSION = ".jsonl"
+    
+    def __init__(self, playlists_dir: str = "playlists",
+                 write_behind: bool = False,
+                 flush_delay: float = 0.5,
+                 state_store: Optional[StateStore] = None):
+        """
+        Initialize JSON Lines playlist manager
+        
+        Args:
+            playlists_dir: Directory to store playlist files
+            write_behind: Buffer saves in memory and write them from a background thread
+            flush_delay: Seconds a changed playlist waits before being written in write-behind mode
+            state_store: Store for the playback position, in-process if None
+        """
+        # Directories with JSON Lines playlists from before the marker existed
+        # were converted already
+        marker_path = os.path.join(playlists_dir, IMPORT_MARKER)
+        is_new = not os.path.exists(marker_path) and (not os.path.isdir(playlists_dir) or not any(
+            filename.endswith(self.PLAYLIST_EXTENSION) for filename in os.listdir(playlists_dir)
+        ))
+        
+        # Track count and line offsets found so far for each playlist file,
+        # tagged with the signature of the file they were read from
+        self._offsets: Dict[str, Tuple[Tuple[int, int], int, array]] = {}
+        
+        super().__init__(playlists_dir, write_behind, flush_delay, state_store)
+        
+        # Bring existing JSON playlists over the first time this format is used
+        if is_new:
+            imported = self.import_json_playlists()
+            if imported:
+                print(f"Converted {imported} JSON playlists to JSON Lines")
+        
+        if not os.path.exists(marker_path):
+            try:
+                open(marker_path, 'a').close()
+            except OSError as e:
+                print(f"Error marking JSON playlists as converted: {str(e)}")
+    
+    def _parse_tracks(self, f) -> List[Dict[str, Any]]:
+        """
+        Parse the tracks of an open playlist file
+        
+        Args:
+            f: Playlist file opened for reading
+            
+        Returns:
+            List of track dictionaries
+        """
+        return read_jsonl(f)
+    
+    def _dump_tracks(self, tracks: List[Dict[str, Any]], f):
+        """
+        Serialize tracks to an open playlist file
+        
+        Args:
+            tracks: List of track dictionaries
+            f: Playlist file opened for writing
+        """
+        write_jsonl(tracks, f)
+    
+    def _open_for_lazy_read(self, name: str) -> Optional[Tuple[Any, Tuple[int, int]]]:
+        """
+        Open a playlist file for reading single tracks
+        
+        Playlists with unflushed changes or an already parsed copy in the cache
+        are better served from memory, and a file changed behind our back has
+        to be read in full once so the track index catches up.
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Tuple of (binary file, signature), or None if the playlist should be read through the cache
+        """
+        with self._lock:
+            if name in self._dirty:
+                return None
+            
+            try:
+                f = open(self._playlist_path(name), 'rb')
+            except OSError:
+                return None
+            
+            stat = os.fstat(f.fileno())
+            signature = (stat.st_mtime_ns, stat.st_size)
+            
+            cached = self._cache.get(name)
+            if (cached and cached[0] == signature) or self.track_index.signature(name) != signature:
+                f.close()
+                return None
+            
+            return f, signature
+    
+    def _find_line(self, name: str, f, signature: Tuple[int, int], index: int) -> Tuple[int, Optional[int]]:
+        """
+        Find where a track's line starts, scanning no further than needed
+        
+        Args:
+            name: Name of the playlist
+            f: Playlist file opened in binary mode at its start
+            signature: Signature of the open file
+            index: Zero-based position of the track
+            
+        Returns:
+            Tuple of (number of tracks, byte offset of the track's line or None if out of range)
+        """
+        with self._lock:
+            cached = self._offsets.get(name)
+            
+            if cached is None or cached[0] != signature:
+                count = read_header(f)['count']
+                cached = self._offsets[name] = (signature, count, array('q', [f.tell()]))
+            
+            _, count, offsets = cached
+            
+            if not 0 <= index < count:
+                return count, None
+            
+            # offsets[-1] is where the first line not scanned yet starts
+            position = offsets[-1]
+            f.seek(position)
+            while len(offsets) <= index:
+                line = f.readline()
+                if not line:
+                    return count, None
+                position += len(line)
+                offsets.append(position)
+            
+            return count, offsets[index]
+    
+    def _track_count(self, name: str) -> int:
+        """
+        Get the number of tracks in a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Number of tracks, 0 if the playlist does not exist
+        """
+        opened = self._open_for_lazy_read(name)
+        
+        if opened is None:
+            return super()._track_count(name)
+        
+        f, _ = opened
+        with f:
+            try:
+                return read_header(f)['count']
+            except (ValueError, KeyError) as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                return 0
+    
+    def _known_track_count(self, name: str) -> Optional[int]:
+        """
+        Get the number of tracks in a playlist, read from the file's header line
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Number of tracks, 0 if the playlist does not exist
+        """
+        return self._track_count(name)
+    
+    def _track_at(self, name: str, index: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the track at a position in a playlist
+        
+        Args:
+            name: Name of the playlist
+            index: Zero-based position of the track
+            
+        Returns:
+            Track dictionary or None if the position is out of range
+        """
+        opened = self._open_for_lazy_read(name)
+        
+        if opened is None:
+            return super()._track_at(name, index)
+        
+        f, signature = opened
+        with f:
+            try:
+                _, offset = self._find_line(name, f, signature, index)
+                if offset is None:
+                    return None
+                
+                f.seek(offset)
+                return json.loads(f.readline())
+            except (ValueError, KeyError) as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                return None
+    
+    def get_playlist_version(self, name: str) -> Optional[str]:
+        """
+        Get an opaque version string that changes whenever a playlist changes
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Version string or None if the playlist does not exist
+        """
+        with self._lock:
+            if name in self._dirty:
+                return super().get_playlist_version(name)
+            
+            signature = self._file_signature(self._playlist_path(name))
+        
+        if signature is None:
+            return None
+        
+        mtime, size = signature
+        return f"{mtime:x}-{size:x}"
+    
+    def get_playlist_page(self, name: str, offset: int = 0,
+                          limit: Optional[int] = None) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Get a slice of a playlist without changing the current playlist
+        
+        Args:
+            name: Name of the playlist
+            offset: Index of the first track to return
+            limit: Maximum number of tracks to return, None for all remaining tracks
+            
+        Returns:
+            Tuple of (tracks, total number of tracks) or None if the playlist does not exist
+        """
+        opened = None if offset < 0 else self._open_for_lazy_read(name)
+        
+        if opened is None:
+            return super().get_playlist_page(name, offset, limit)
+        
+        f, signature = opened
+        with f:
+            try:
+                count, start = self._find_line(name, f, signature, offset)
+                if start is None:
+                    return [], count
+                
+                end = count if limit is None else min(count, offset + limit)
+                
+                f.seek(start)
+                tracks = []
+                for _ in range(end - offset):
+                    line = f.readline()
+                    if not line:
+                        break
+                    tracks.append(json.loads(line))
+                
+                return tracks, count
+            except (ValueError, KeyError) as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                return None
+    
+    def import_json_playlists(self, json_dir: Optional[str] = None) -> int:
+        """
+        Convert JSON playlist files into JSON Lines playlists
+        
+        Playlists that already exist in the JSON Lines format are left untouched.
+        
+        Args:
+            json_dir: Directory containing the JSON playlists (defaults to playlists_dir)
+            
+        Returns:
+            Number of playlists imported
+        """
+        json_dir = json_dir or self.playlists_dir
+        existing = set(self.get_playlists())
+        imported = 0
+        
+        try:
+            filenames = sorted(os.listdir(json_dir))
+        except Exception as e:
+            print(f"Error listing JSON playlists: {str(e)}")
+            return 0
+        
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            
+            name = filename[:-5]
+            if name in existing:
+                continue
+            
+            try:
+                with open(os.path.join(json_dir, filename), 'r') as f:
+                    tracks = json.load(f)
+            except Exception as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                continue
+            
+            # Saving through the manager keeps the track index up to date
+            if self.save_playlist(name, tracks):
+                imported += 1
+        
+        return imported
+    
+    def export_json_playlists(self, json_dir: Optional[str] = None) -> int:
+        """
+        Write every playlist out as a JSON playlist file
+        
+        Existing JSON files of the same name are replaced.
+        
+        Args:
+            json_dir: Directory to write the JSON playlists to (defaults to playlists_dir)
+            
+        Returns:
+            Number of playlists exported
+        """
+        json_dir = json_dir or self.playlists_dir
+        exported = 0
+        
+        os.makedirs(json_dir, exist_ok=True)
+        
+        # Buffered changes have to be on disk before the files are converted
+        self.flush()
+        
+        for name in self.get_playlists():
+            try:
+                convert_jsonl_to_json(self._playlist_path(name), os.path.join(json_dir, f"{name}.json"))
+                exported += 1
+            except Exception as e:
+                print(f"Error exporting playlist '{name}': {str(e)}")
+        
+        return exported
+
+def convert_playlists(playlists_dir: str, to_jsonl: bool) -> int:
+    """
+    Convert every playlist in a directory between the JSON and JSON Lines formats
+    
+    Args:
+        playlists_dir: Directory containing the playlists
+        to_jsonl: Convert JSON to JSON Lines if True, JSON Lines to JSON otherwise
+        
+    Returns:
+        Number of playlists converted
+    """
+    source_extension, target_extension = ('.json', '.jsonl') if to_jsonl else ('.jsonl', '.json')
+    convert = convert_json_to_jsonl if to_jsonl else convert_jsonl_to_json
+    converted = 0
+    
+    for filename in sorted(os.listdir(playlists_dir)):
+        if not filename.endswith(source_extension):
+            continue
+        
+        name = filename[:-len(source_extension)]
+        
+        try:
+            convert(
+                os.path.join(playlists_dir, filename),
+                os.path.join(playlists_dir, f"{name}{target_extension}")
+            )
+            converted += 1
+        except Exception as e:
+            print(f"Error converting playlist '{name}': {str(e)}")
+    
+    return converted
+
+def main():
+    """Convert playlists between formats from the command line"""
+    parser = argparse.ArgumentParser(description="Convert playlists between JSON and JSON Lines")
+    parser.add_argument('direction', choices=['to-jsonl', 'to-json'], help="Format to convert to")
+    parser.add_argument('playlists_dir', nargs='?', default="playlists", help="Directory containing the playlists")
+    args = parser.parse_args()
+    
+    converted = convert_playlists(args.playlists_dir, args.direction == 'to-jsonl')
+    print(f"Converted {converted} playlists")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Keyboard module
+Reads single keypresses without waiting for Enter, for screens that keep updating
+"""
+
+import os
+import sys
+import time
+import select
+from typing import Optional
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Names of the escape sequences sent by special keys on POSIX terminals
+ESCAPE_SEQUENCES = {
+    '\x1b[A': 'up',
+    '\x1b[B': 'down',
+    '\x1b[C': 'right',
+    '\x1b[D': 'left',
+    '\x1b[H': 'home',
+    '\x1b[F': 'end',
+    '\x1b[1~': 'home',
+    '\x1b[4~': 'end',
+    '\x1b[5~': 'page_up',
+    '\x1b[6~': 'page_down',
+    '\x1bOA': 'up',
+    '\x1bOB': 'down',
+    '\x1bOH': 'home',
+    '\x1bOF': 'end',
+}
+
+# Names of the scan codes that follow a 0x00 or 0xE0 prefix on Windows
+WINDOWS_KEYS = {
+    'H': 'up',
+    'P': 'down',
+    'M': 'right',
+    'K': 'left',
+    'G': 'home',
+    'O': 'end',
+    'I': 'page_up',
+    'Q': 'page_down',
+}
+
+# Names of control characters
+CONTROL_KEYS = {
+    '\r': 'enter',
+    '\n': 'enter',
+    '\x7f': 'backspace',
+    '\x08': 'backspace',
+    '\x1b': 'escape',
+    '\t': 'tab',
+}
+
+class KeyReader:
+    """
+    Reads keypresses from the terminal without blocking
+    
+    Used as a context manager: inside it the terminal is in cbreak mode, so
+    keys arrive one at a time without Enter and aren't echoed. Printable
+    keys are returned as they are; special keys by name, such as "up",
+    "page_down", "enter" or "escape". Where stdin isn't a terminal, no keys
+    are ever read.
+    """
+    
+    def __init__(self):
+        """Initialize key reader"""
+        self._fd = None
+        self._saved = None
+    
+    def __enter__(self) -> 'KeyReader':
+        if termios is not None and sys.stdin.isatty():
+            self._fd = sys.stdin.fileno()
+            self._saved = termios.tcgetattr(self._fd)
+            tty.setcbreak(self._fd)
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._saved is not None:
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved)
+            self._fd = None
+            self._saved = None
+    
+    def _wait(self, timeout: float) -> bool:
+        """
+        Wait for input on stdin
+        
+        Args:
+            timeout: Seconds to wait at most
+            
+        Returns:
+            True if input is ready
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(ready)
+    
+    def _read_char(self) -> str:
+        """
+        Read one character from stdin, which may be several bytes
+        
+        Returns:
+            The character, or an empty string if stdin was closed
+        """
+        data = os.read(self._fd, 1)
+        if not data:
+            return ''
+        
+        # The lead byte of a UTF-8 sequence tells how many bytes follow
+        lead = data[0]
+        length = 4 if lead >= 0xF0 else 3 if lead >= 0xE0 else 2 if lead >= 0xC0 else 1
+        while len(data) < length and self._wait(0.01):
+            data += os.read(self._fd, 1)
+        
+        return data.decode('utf-8', errors='ignore')
+    
+    def _read_posix(self, timeout: float) -> Optional[str]:
+        """
+        Read a key from a POSIX terminal
+        
+        Args:
+            timeout: Seconds to wait at most
+            
+        Returns:
+            The key or None if none was pressed in time
+        """
+        if not self._wait(timeout):
+            return None
+        
+        char = self._read_char()
+        if char != '\x1b':
+            return CONTROL_KEYS.get(char, char) or None
+        
+        # The rest of an escape sequence arrives right away; a lone escape
+        # is the Escape key
+        sequence = char
+        while self._wait(0.01):
+            sequence += self._read_char()
+            if sequence in ESCAPE_SEQUENCES or (len(sequence) > 2 and (sequence[-1].isalpha() or sequence[-1] == '~')):
+                break
+        
+        if sequence == '\x1b':
+            return 'escape'
+        
+        return ESCAPE_SEQUENCES.get(sequence)
+    
+    def _read_windows(self, timeout: float) -> Optional[str]:
+        """
+        Read a key from the Windows console
+        
+        Args:
+            timeout: Seconds to wait at most
+            
+        Returns:
+            The key or None if none was pressed in time
+        """
+        deadline = time.monotonic() + timeout
+        
+        while not msvcrt.kbhit():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(0.02, remaining))
+        
+        char = msvcrt.getwch()
+        if char in ('\x00', '\xe0'):
+            return WINDOWS_KEYS.get(msvcrt.getwch())
+        
+        return CONTROL_KEYS.get(char, char)
+    
+    def read(self, timeout: float = 0) -> Optional[str]:
+        """
+        Read a keypress, waiting for one for a while
+        
+        Args:
+            timeout: Seconds to wait at most, 0 to only check
+            
+        Returns:
+            The key, or None if none was pressed in time
+        """
+        if msvcrt is not None:
+            return self._read_windows(timeout)
+        
+        if self._saved is None:
+            # Not a terminal: nothing to read, but keep the caller's pace
+            time.sleep(timeout)
+            return None
+        
+        return self._read_posix(timeout)
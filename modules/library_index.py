@@ -0,0 +1,171 @@
+"""
+Library Index module
+Full-text search over the titles and channels of saved tracks
+"""
+
+import re
+import math
+import bisect
+import heapq
+import threading
+from typing import List, Dict, Any, Set
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Matches in the title count for more than matches in the channel name
+FIELD_WEIGHTS = {
+    'title': 2.0,
+    'channel': 1.0,
+}
+
+# How much a prefix match counts compared to matching the whole word
+PREFIX_MATCH_FACTOR = 0.5
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search tokens
+    
+    Args:
+        text: Text to tokenize
+        
+    Returns:
+        List of tokens
+    """
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class LibraryIndex:
+    """
+    Inverted index over track titles and channels with prefix matching
+    
+    Terms are kept in a sorted list so every term starting with a query
+    token can be found with a binary search. Every query token has to match
+    (exactly or as a prefix) for a track to be returned, and results are
+    ranked by field weight and how rare the matched terms are.
+    """
+    
+    def __init__(self):
+        """Initialize an empty library index"""
+        self._tracks: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._terms: List[str] = []
+        self._track_terms: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+    
+    def __len__(self) -> int:
+        """Number of indexed tracks"""
+        return len(self._tracks)
+    
+    def add(self, track: Dict[str, Any]):
+        """
+        Index a track, replacing any previous entry for the same video
+        
+        Args:
+            track: Track dictionary
+        """
+        video_id = track.get('id')
+        if not video_id:
+            return
+        
+        # Keep the best field weight each term appears with
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(track.get(field) or '')):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        
+        with self._lock:
+            self.remove(video_id)
+            
+            self._tracks[video_id] = track
+            self._track_terms[video_id] = set(weights)
+            
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                postings[video_id] = weight
+    
+    def remove(self, video_id: str):
+        """
+        Remove a track from the index
+        
+        Args:
+            video_id: Video ID of the track
+        """
+        with self._lock:
+            self._tracks.pop(video_id, None)
+            
+            for term in self._track_terms.pop(video_id, ()):
+                postings = self._postings[term]
+                postings.pop(video_id, None)
+                
+                if not postings:
+                    del self._postings[term]
+                    del self._terms[bisect.bisect_left(self._terms, term)]
+    
+    def _expand(self, token: str) -> List[str]:
+        """
+        Find all indexed terms starting with a token
+        
+        Args:
+            token: Query token
+            
+        Returns:
+            List of matching terms
+        """
+        terms = []
+        i = bisect.bisect_left(self._terms, token)
+        
+        while i < len(self._terms) and self._terms[i].startswith(token):
+            terms.append(self._terms[i])
+            i += 1
+        
+        return terms
+    
+    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search the index
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            
+        Returns:
+            List of track dictionaries, best match first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        
+        with self._lock:
+            total = len(self._tracks)
+            scores = None
+            
+            for token in tokens:
+                token_scores: Dict[str, float] = {}
+                
+                for term in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1.0 if term == token else PREFIX_MATCH_FACTOR
+                    
+                    for video_id, weight in postings.items():
+                        score = weight * factor * idf
+                        if score > token_scores.get(video_id, 0.0):
+                            token_scores[video_id] = score
+                
+                # Every token has to match
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        video_id: scores[video_id] + score
+                        for video_id, score in token_scores.items()
+                        if video_id in scores
+                    }
+                
+                if not scores:
+                    return []
+            
+            best = heapq.nlargest(max_results, scores.items(), key=lambda item: item[1])
+            return [dict(self._tracks[video_id]) for video_id, _ in best]
@@ -0,0 +1,438 @@
+"""
+Metrics module
+Counters, gauges and histograms exposed in the Prometheus text format
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Iterator, Sequence
+
+# Upper bounds in seconds of the default latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value for the exposition format
+    
+    Args:
+        value: Sample value
+        
+    Returns:
+        Formatted value
+    """
+    if value == float('inf'):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    """
+    Escape a label value for the exposition format
+    
+    Args:
+        value: Label value
+        
+    Returns:
+        Escaped label value
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """
+    Format a label set for the exposition format
+    
+    Args:
+        names: Label names
+        values: Label values
+        
+    Returns:
+        Label set in braces, or an empty string if there are no labels
+    """
+    if not names:
+        return ""
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together
+    """
+    
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics: List["Metric"] = []
+        self._lock = threading.Lock()
+    
+    def register(self, metric: "Metric"):
+        """
+        Add a metric to the registry
+        
+        Args:
+            metric: Metric to add
+        """
+        with self._lock:
+            self._metrics.append(metric)
+    
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            
+            for suffix, names, values, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        
+        return '\n'.join(lines) + '\n'
+
+# Registry the metrics below and the /metrics endpoint use
+REGISTRY = MetricsRegistry()
+
+class _CounterChild:
+    """Value of a counter for one label set"""
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0):
+        """
+        Increase the counter
+        
+        Args:
+            amount: Amount to add
+        """
+        with self._lock:
+            self.value += amount
+
+class _GaugeChild(_CounterChild):
+    """Value of a gauge for one label set"""
+    
+    def dec(self, amount: float = 1.0):
+        """
+        Decrease the gauge
+        
+        Args:
+            amount: Amount to subtract
+        """
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float):
+        """
+        Set the gauge
+        
+        Args:
+            value: New value
+        """
+        with self._lock:
+            self.value = value
+    
+    @contextmanager
+    def track_inprogress(self):
+        """Raise the gauge for the duration of a block"""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+class _HistogramChild:
+    """Observations of a histogram for one label set"""
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """
+        Record an observation
+        
+        Args:
+            value: Observed value
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+    
+    @contextmanager
+    def time(self):
+        """Observe the duration of a block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+class Metric:
+    """
+    Base class for metrics with an optional set of labels
+    """
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: MetricsRegistry = REGISTRY):
+        """
+        Initialize and register a metric
+        
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the metric's labels
+            registry: Registry to add the metric to
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        
+        # Metrics without labels are reported from the start
+        if not self.labelnames:
+            self.labels()
+        
+        registry.register(self)
+    
+    def _new_child(self):
+        """Create the value holder for a new label set"""
+        raise NotImplementedError
+    
+    def labels(self, *values):
+        """
+        Get the metric for a set of label values
+        
+        Args:
+            *values: One value per label name
+            
+        Returns:
+            Child metric for the label values
+        """
+        # Label values are usually strings already, which needs no conversion
+        child = self._children.get(values)
+        if child is not None:
+            return child
+        
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        
+        return child
+    
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """
+        Get a snapshot of all label sets and their children
+        
+        Returns:
+            List of (label values, child) pairs
+        """
+        with self._lock:
+            return sorted(self._children.items())
+    
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """
+        Generate the metric's samples
+        
+        Yields:
+            Tuples of (name suffix, label names, label values, value)
+        """
+        for values, child in self._items():
+            yield "", self.labelnames, values, child.value
+
+class Counter(Metric):
+    """
+    Monotonically increasing count
+    """
+    
+    type = "counter"
+    
+    def _new_child(self) -> _CounterChild:
+        """Create the value holder for a new label set"""
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0):
+        """
+        Increase an unlabelled counter
+        
+        Args:
+            amount: Amount to add
+        """
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    """
+    Value that can go up and down
+    """
+    
+    type = "gauge"
+    
+    def _new_child(self) -> _GaugeChild:
+        """Create the value holder for a new label set"""
+        return _GaugeChild()
+    
+    def inc(self, amount: float = 1.0):
+        """
+        Increase an unlabelled gauge
+        
+        Args:
+            amount: Amount to add
+        """
+        self.labels().inc(amount)
+    
+    def dec(self, amount: float = 1.0):
+        """
+        Decrease an unlabelled gauge
+        
+        Args:
+            amount: Amount to subtract
+        """
+        self.labels().dec(amount)
+    
+    def set(self, value: float):
+        """
+        Set an unlabelled gauge
+        
+        Args:
+            value: New value
+        """
+        self.labels().set(value)
+
+class Histogram(Metric):
+    """
+    Distribution of observations over fixed buckets
+    """
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: MetricsRegistry = REGISTRY):
+        """
+        Initialize and register a histogram
+        
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the metric's labels
+            buckets: Upper bounds of the buckets, ascending
+            registry: Registry to add the metric to
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def _new_child(self) -> _HistogramChild:
+        """Create the value holder for a new label set"""
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value: float):
+        """
+        Record an observation in an unlabelled histogram
+        
+        Args:
+            value: Observed value
+        """
+        self.labels().observe(value)
+    
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """
+        Generate cumulative bucket counts, the sum and the count
+        
+        Yields:
+            Tuples of (name suffix, label names, label values, value)
+        """
+        bucket_names = self.labelnames + ('le',)
+        
+        for values, child in self._items():
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, values + (_format_value(bound),), cumulative
+            
+            yield "_sum", self.labelnames, values, total
+            yield "_count", self.labelnames, values, cumulative
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled, by route and status",
+    ("method", "route", "status")
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests",
+    ("method", "route")
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+)
+
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Time spent in calls to YouTube, by call",
+    ("call",)
+)
+
+ERRORS = Counter(
+    "errors_total", "Errors caught, by component and exception type",
+    ("component", "type")
+)
+
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total", "Requests that joined an identical upstream call already in flight",
+    ("call",)
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups, by cache and result",
+    ("cache", "result")
+)
+
+SPECULATIVE_RESOLUTIONS = Counter(
+    "speculative_resolutions_total", "Stream URLs resolved ahead of a click, by outcome",
+    ("outcome",)
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "admission_active", "Upstream-bound requests being handled, by route class",
+    ("route_class",)
+)
+
+ADMISSION_WAITING = Gauge(
+    "admission_waiting", "Upstream-bound requests queued for a slot, by route class",
+    ("route_class",)
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Upstream-bound requests turned away, by route class and reason",
+    ("route_class", "reason")
+)
+
+def record_error(component: str, error: BaseException):
+    """
+    Count a caught exception
+    
+    Args:
+        component: Part of the application the error happened in
+        error: The exception
+    """
+    ERRORS.labels(component, type(error).__name__).inc()
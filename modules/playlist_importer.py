@@ -0,0 +1,158 @@
+"""
+Playlist Importer module
+Imports YouTube playlists into local playlists page by page
+"""
+
+import os
+import json
+from typing import Dict, Any, Optional, Callable
+
+from modules.youtube_client import YouTubeClient
+from modules.playlist_manager import PlaylistManager
+
+class PlaylistImporter:
+    """
+    Streams a YouTube playlist into a local playlist
+    
+    Every fetched page is written with a single add_many call, so memory use
+    is bounded by the page size rather than the playlist size. After each page
+    the continuation token is recorded in a state file; an interrupted import
+    of the same source into the same playlist picks up from there.
+    """
+    
+    def __init__(self, youtube_client: YouTubeClient, playlist_manager: PlaylistManager):
+        """
+        Initialize playlist importer
+        
+        Args:
+            youtube_client: YouTube client instance
+            playlist_manager: Playlist manager instance
+        """
+        self.youtube_client = youtube_client
+        self.playlist_manager = playlist_manager
+        self.state_dir = os.path.join(playlist_manager.playlists_dir, ".imports")
+        
+        os.makedirs(self.state_dir, exist_ok=True)
+    
+    def _state_path(self, name: str) -> str:
+        """
+        Get the path of the import state file for a playlist
+        
+        Args:
+            name: Name of the local playlist
+            
+        Returns:
+            Path to the state file
+        """
+        return os.path.join(self.state_dir, f"{name}.json")
+    
+    def load_state(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the saved progress of an unfinished import
+        
+        Args:
+            name: Name of the local playlist
+            
+        Returns:
+            State dictionary or None if there is no unfinished import
+        """
+        try:
+            with open(self._state_path(name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading import state: {str(e)}")
+            return None
+    
+    def _save_state(self, name: str, state: Dict[str, Any]):
+        """
+        Atomically record the progress of an import
+        
+        Args:
+            name: Name of the local playlist
+            state: State dictionary
+        """
+        path = self._state_path(name)
+        tmp_path = f"{path}.tmp"
+        
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    
+    def _clear_state(self, name: str):
+        """
+        Forget the progress of an import
+        
+        Args:
+            name: Name of the local playlist
+        """
+        try:
+            os.remove(self._state_path(name))
+        except FileNotFoundError:
+            pass
+    
+    def import_playlist(self, source: str, name: str,
+                        on_progress: Optional[Callable[[int, int], None]] = None,
+                        resume: bool = True) -> Dict[str, Any]:
+        """
+        Import a YouTube playlist or channel's uploads into a local playlist
+        
+        Args:
+            source: Playlist URL, playlist ID, channel URL or channel ID
+            name: Name of the local playlist to import into
+            on_progress: Called with (tracks added, tracks fetched) after every page
+            resume: Continue an unfinished import of the same source if there is one
+            
+        Returns:
+            Dictionary with the number of tracks 'added' and 'fetched', and
+            whether the import is 'complete'
+        """
+        playlist_id = self.youtube_client.parse_playlist_source(source)
+        result = {'added': 0, 'fetched': 0, 'complete': False}
+        
+        if not playlist_id:
+            print(f"Not a playlist or channel: {source}")
+            return result
+        
+        # Resume state is kept under the name the playlist is saved as
+        name = self.playlist_manager.sanitize_name(name)
+        state = self.load_state(name) if resume else None
+        
+        if state and state.get('playlist_id') == playlist_id:
+            continuation = state.get('continuation')
+            result['added'] = state.get('added', 0)
+            result['fetched'] = state.get('fetched', 0)
+        else:
+            continuation = None
+            if name not in self.playlist_manager.get_playlists():
+                self.playlist_manager.create_playlist(name)
+        
+        for tracks, next_continuation in self.youtube_client.iter_playlist_pages(playlist_id, continuation):
+            added = self.playlist_manager.add_many(name, tracks)
+            
+            # Stop at the last page that was saved, so a resume picks up from there
+            if added is None:
+                print(f"Import into '{name}' stopped: playlist couldn't be saved")
+                return result
+            
+            result['added'] += added
+            result['fetched'] += len(tracks)
+            
+            if next_continuation:
+                # The page must be on disk before the state says it was imported
+                self.playlist_manager.flush()
+                self._save_state(name, {
+                    'playlist_id': playlist_id,
+                    'continuation': next_continuation,
+                    'added': result['added'],
+                    'fetched': result['fetched'],
+                })
+            else:
+                result['complete'] = True
+                self._clear_state(name)
+            
+            if on_progress:
+                on_progress(result['added'], result['fetched'])
+        
+        return result
@@ -5,26 +5,535 @@ Handles creating and managing playlists
 
 import os
 import json
-from typing import List, Dict, Any, Optional
+import time
+import uuid
+import atexit
+import itertools
+import tempfile
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from modules.track_index import TrackIndex, copy_mode
+from modules.library_index import LibraryIndex
+from modules.metrics import CACHE_REQUESTS
+from modules.state_store import StateStore, MemoryStateStore
+
+# Playback position before any playlist is loaded
+NO_POSITION = {'playlist': None, 'index': -1}
 
 class PlaylistManager:
     """
     Manages playlists for the YouTube Audio Player
     """
     
-    def __init__(self, playlists_dir: str = "playlists"):
+    # File extension of playlist files in playlists_dir
+    PLAYLIST_EXTENSION = ".json"
+    
+    def __init__(self, playlists_dir: str = "playlists",
+                 write_behind: bool = False,
+                 flush_delay: float = 0.5,
+                 state_store: Optional[StateStore] = None):
         """
         Initialize playlist manager
         
         Args:
             playlists_dir: Directory to store playlist files
+            write_behind: Buffer saves in memory and write them from a background thread
+            flush_delay: Seconds a changed playlist waits before being written in write-behind mode
+            state_store: Store for the playback position, in-process if None
         """
         self.playlists_dir = playlists_dir
-        self.current_playlist = None
-        self.current_index = -1
+        
+        # The current playlist and index live in the state store, so worker
+        # processes sharing a store share the playback position
+        self.state_store = state_store or MemoryStateStore()
+        
+        # Parsed playlists keyed by name, each tagged with the (mtime, size)
+        # of the file it was read from so external edits are picked up
+        self._cache: Dict[str, Tuple[Optional[Tuple[int, int]], List[Dict[str, Any]]]] = {}
+        self._lock = threading.RLock()
+        
+        # Serializes file writes and deletes so a flush can't resurrect a deleted playlist
+        self._io_lock = threading.Lock()
+        
+        # Write-behind state: playlists changed in memory but not yet on disk,
+        # mapped to the time they first became dirty
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self._dirty: Dict[str, float] = {}
+        
+        # Versions of unflushed playlists; files on disk are versioned by signature
+        self._instance_id = uuid.uuid4().hex[:8]
+        self._change_counter = itertools.count(1)
+        self._versions: Dict[str, int] = {}
+        self._flush_cond = threading.Condition(self._lock)
+        self._closing = False
+        self._flush_thread = None
+        
+        # Global index of which playlists contain which tracks, persisted
+        # next to the playlists so it doesn't need rebuilding on every start
+        self.track_index = TrackIndex()
+        self.index_path = os.path.join(self.playlists_dir, ".track_index")
+        
+        # Full-text index of saved tracks, built on the first library search
+        self._library: Optional[LibraryIndex] = None
+        
+        # Library version the track and library indexes were last brought up
+        # to; other workers sharing the playlists bump it when they change one
+        self._library_version_seen: Optional[int] = None
         
         # Create playlists directory if it doesn't exist
         os.makedirs(self.playlists_dir, exist_ok=True)
+        
+        self._load_index()
+        
+        if self.write_behind:
+            self._flush_thread = threading.Thread(target=self._flush_loop)
+            self._flush_thread.daemon = True
+            self._flush_thread.start()
+        
+        # Make sure buffered changes and the index reach the disk on interpreter exit
+        atexit.register(self.close)
+    
+    def _position(self) -> Dict[str, Any]:
+        """
+        Get the playback position
+        
+        Returns:
+            Dictionary with the current 'playlist' and 'index'
+        """
+        return self.state_store.get('playback', 'position') or dict(NO_POSITION)
+    
+    def _update_position(self, func) -> Dict[str, Any]:
+        """
+        Atomically change the playback position
+        
+        Args:
+            func: Called with the current position and returns the new one
+            
+        Returns:
+            The new position
+        """
+        return self.state_store.update('playback', 'position', lambda position: func(position or dict(NO_POSITION)))
+    
+    @property
+    def current_playlist(self) -> Optional[str]:
+        """Name of the playlist being played"""
+        return self._position()['playlist']
+    
+    @current_playlist.setter
+    def current_playlist(self, name: Optional[str]):
+        self._update_position(lambda position: dict(position, playlist=name))
+    
+    @property
+    def current_index(self) -> int:
+        """Index of the current track in the current playlist, -1 if there is none"""
+        return self._position()['index']
+    
+    @current_index.setter
+    def current_index(self, index: int):
+        self._update_position(lambda position: dict(position, index=index))
+    
+    def set_position(self, name: str, index: int) -> bool:
+        """
+        Move the playback position to a track of a playlist
+        
+        Playlist and index change in one update, so other workers never see
+        one without the other.
+        
+        Args:
+            name: Name of the playlist
+            index: Index of the track
+            
+        Returns:
+            True if the position was set, False if the playlist doesn't exist
+            or has no track at that index
+        """
+        if not 0 <= index < self._track_count(name):
+            return False
+        
+        self._update_position(lambda position: {'playlist': name, 'index': index})
+        return True
+    
+    def _playlist_removed(self, name: str):
+        """
+        Clear the playback position if it is in a deleted playlist
+        
+        Args:
+            name: Name of the deleted playlist
+        """
+        self._update_position(lambda position: dict(NO_POSITION) if position['playlist'] == name else position)
+    
+    def _track_removed(self, name: str, index: int):
+        """
+        Keep the playback position on the same track after a track is removed
+        
+        Args:
+            name: Name of the playlist
+            index: Index the removed track had
+        """
+        def shift(position):
+            if position['playlist'] == name and position['index'] >= index:
+                return dict(position, index=max(0, position['index'] - 1))
+            return position
+        
+        self._update_position(shift)
+    
+    def sanitize_name(self, name: str) -> str:
+        """
+        Strip characters that aren't allowed in playlist names
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Sanitized playlist name
+        """
+        return ''.join(c for c in name if c.isalnum() or c in ' _-')
+    
+    def _load_index(self):
+        """
+        Load the persisted track index and re-index playlists changed since it was saved
+        """
+        self.track_index.load(self.index_path)
+        
+        extension = self.PLAYLIST_EXTENSION
+        names = {
+            filename[:-len(extension)]
+            for filename in os.listdir(self.playlists_dir)
+            if filename.endswith(extension)
+        }
+        
+        self._sync_index(names)
+    
+    def _sync_index(self, names: Optional[set] = None):
+        """
+        Re-index playlists whose files changed or disappeared since they were indexed
+        
+        Args:
+            names: Names of the playlists on disk, listed again if None
+        """
+        if names is None:
+            names = set(self.get_playlists())
+        
+        for name in self.track_index.playlists():
+            if name not in names and name not in self._dirty:
+                self.track_index.drop_playlist(name)
+        
+        # Reading a playlist whose file doesn't match the index re-indexes it
+        for name in names:
+            if name in self._dirty:
+                continue
+            if self._file_signature(self._playlist_path(name)) != self.track_index.signature(name):
+                self._read_playlist(name)
+    
+    def _save_index(self):
+        """Persist the track index"""
+        self.track_index.save(self.index_path)
+    
+    def _library_version(self) -> int:
+        """
+        Get the version of the saved tracks, shared by all workers
+        
+        Returns:
+            Number of playlist changes made through any worker
+        """
+        return self.state_store.get('library', 'version', 0)
+    
+    def _bump_library_version(self) -> int:
+        """
+        Tell other workers that a playlist changed
+        
+        Returns:
+            The new library version
+        """
+        return self.state_store.update('library', 'version', lambda version: (version or 0) + 1)
+    
+    def _refresh_library(self):
+        """Catch the track and library indexes up with changes made by other workers, with the lock held"""
+        version = self._library_version()
+        
+        if version != self._library_version_seen:
+            self._library = None
+            self._sync_index()
+            self._library_version_seen = version
+    
+    def _iter_library_tracks(self):
+        """
+        Iterate over every saved track, once per playlist containing it
+        
+        Yields:
+            Track dictionaries
+        """
+        for name in self.get_playlists():
+            yield from self._read_playlist(name) or []
+    
+    def _update_library(self, added: List[Dict[str, Any]], removed_ids: List[str], shared: bool = True):
+        """
+        Keep the library index in step with a playlist change, with the lock held
+        
+        Args:
+            added: Tracks added to a playlist
+            removed_ids: IDs of tracks removed from a playlist
+            shared: Whether the change was made here, so other workers need to hear of it
+        """
+        if shared:
+            version = self._bump_library_version()
+            
+            # Changes other workers made since the last check aren't in the
+            # indexes, so they are caught up instead of updated
+            if version - 1 != self._library_version_seen:
+                self._library = None
+                self._sync_index()
+            self._library_version_seen = version
+        
+        if self._library is None:
+            return
+        
+        for track in added:
+            self._library.add(track)
+        
+        # A track stays searchable as long as any playlist still has it
+        for track_id in removed_ids:
+            if not self.find_track(track_id):
+                self._library.remove(track_id)
+    
+    def _playlist_path(self, name: str) -> str:
+        """
+        Get the file path for a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Path to the playlist file
+        """
+        return os.path.join(self.playlists_dir, f"{name}{self.PLAYLIST_EXTENSION}")
+    
+    def _file_signature(self, path: str) -> Optional[Tuple[int, int]]:
+        """
+        Get the (mtime, size) signature of a playlist file
+        
+        Args:
+            path: Path to the playlist file
+            
+        Returns:
+            Tuple of (mtime in nanoseconds, size in bytes) or None if missing
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _parse_tracks(self, f) -> List[Dict[str, Any]]:
+        """
+        Parse the tracks of an open playlist file
+        
+        Args:
+            f: Playlist file opened for reading
+            
+        Returns:
+            List of track dictionaries
+        """
+        return json.load(f)
+    
+    def _dump_tracks(self, tracks: List[Dict[str, Any]], f):
+        """
+        Serialize tracks to an open playlist file
+        
+        Args:
+            tracks: List of track dictionaries
+            f: Playlist file opened for writing
+        """
+        json.dump(tracks, f, indent=2)
+    
+    def _read_playlist(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the parsed tracks of a playlist, re-reading the file only if it
+        changed on disk since it was last parsed
+        
+        The returned list is shared with the cache and must not be modified.
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            List of track dictionaries or None if the playlist does not exist
+        """
+        path = self._playlist_path(name)
+        
+        with self._lock:
+            # Unflushed changes are newer than whatever is on disk
+            if name in self._dirty:
+                CACHE_REQUESTS.labels('playlist', 'hit').inc()
+                return self._cache[name][1]
+            
+            signature = self._file_signature(path)
+            
+            if signature is None:
+                self._cache.pop(name, None)
+                return None
+            
+            cached = self._cache.get(name)
+            if cached and cached[0] == signature:
+                CACHE_REQUESTS.labels('playlist', 'hit').inc()
+                return cached[1]
+            
+            CACHE_REQUESTS.labels('playlist', 'miss').inc()
+            
+            try:
+                with open(path, 'r') as f:
+                    tracks = self._parse_tracks(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                return None
+            
+            self._cache[name] = (signature, tracks)
+            
+            if self.track_index.signature(name) != signature:
+                old_ids = self.track_index.playlist_ids(name)
+                self.track_index.index_playlist(name, [track.get('id') for track in tracks], signature)
+                
+                # Reading a changed file only catches up with a change made elsewhere
+                self._update_library(tracks, old_ids, shared=False)
+            
+            return tracks
+    
+    def _write_playlist_file(self, name: str, tracks: List[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+        """
+        Atomically write a playlist file
+        
+        The tracks are written to a temporary file in the playlists directory
+        which then replaces the playlist file, so a crash mid-write leaves the
+        previous version intact.
+        
+        Args:
+            name: Name of the playlist
+            tracks: List of track dictionaries
+            
+        Returns:
+            Signature of the written file
+        """
+        path = self._playlist_path(name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.playlists_dir, prefix=f".{name}.", suffix=".tmp")
+        
+        try:
+            with os.fdopen(fd, 'w') as f:
+                self._dump_tracks(tracks, f)
+                f.flush()
+                os.fsync(f.fileno())
+                copy_mode(f.fileno(), path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        return self._file_signature(path)
+    
+    def _flush_loop(self):
+        """
+        Background thread writing dirty playlists once they have waited flush_delay
+        """
+        while True:
+            with self._flush_cond:
+                while not self._dirty and not self._closing:
+                    self._flush_cond.wait()
+                
+                if self._closing:
+                    return
+                
+                # Let further changes to the same playlists coalesce
+                due = min(self._dirty.values()) + self.flush_delay
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._flush_cond.wait(remaining)
+                    continue
+            
+            self.flush()
+    
+    def flush(self) -> bool:
+        """
+        Write all playlists with pending changes to disk
+        
+        Returns:
+            True if every pending playlist was written, False otherwise
+        """
+        success = True
+        
+        with self._io_lock:
+            with self._lock:
+                pending = [(name, self._cache[name][1]) for name in self._dirty]
+            
+            for name, tracks in pending:
+                try:
+                    signature = self._write_playlist_file(name, tracks)
+                except Exception as e:
+                    print(f"Error saving playlist: {str(e)}")
+                    success = False
+                    
+                    # Retry after another flush_delay instead of right away, so
+                    # a full disk doesn't keep the flusher spinning
+                    with self._lock:
+                        if name in self._dirty:
+                            self._dirty[name] = time.monotonic()
+                    continue
+                
+                with self._lock:
+                    # Only mark clean if nothing changed while we were writing
+                    if self._cache.get(name, (None, None))[1] is tracks:
+                        self._cache[name] = (signature, tracks)
+                        self._dirty.pop(name, None)
+                        self.track_index.set_signature(name, signature)
+        
+        return success
+    
+    def close(self):
+        """Stop the background flusher and write any pending changes"""
+        # Nothing is left to do at exit once closed explicitly
+        atexit.unregister(self.close)
+        
+        with self._flush_cond:
+            self._closing = True
+            self._flush_cond.notify_all()
+        
+        if self._flush_thread and self._flush_thread.is_alive():
+            self._flush_thread.join()
+        
+        self.flush()
+        self._save_index()
+    
+    def _track_count(self, name: str) -> int:
+        """
+        Get the number of tracks in a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Number of tracks, 0 if the playlist does not exist
+        """
+        playlist = self._read_playlist(name)
+        return len(playlist) if playlist else 0
+    
+    def _track_at(self, name: str, index: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the track at a position in a playlist
+        
+        Args:
+            name: Name of the playlist
+            index: Zero-based position of the track
+            
+        Returns:
+            Track dictionary or None if the position is out of range
+        """
+        playlist = self._read_playlist(name)
+        
+        if not playlist or not 0 <= index < len(playlist):
+            return None
+        
+        return playlist[index]
     
     def get_playlists(self) -> List[str]:
         """
@@ -34,15 +543,62 @@ class PlaylistManager:
             List of playlist names
         """
         try:
+            extension = self.PLAYLIST_EXTENSION
             playlists = []
             for filename in os.listdir(self.playlists_dir):
-                if filename.endswith('.json'):
-                    playlists.append(filename[:-5])  # Remove .json extension
+                if filename.endswith(extension):
+                    playlists.append(filename[:-len(extension)])  # Remove extension
+            
+            # Include playlists that only exist in memory so far
+            with self._lock:
+                playlists.extend(name for name in self._dirty if name not in playlists)
+            
             return playlists
         except Exception as e:
             print(f"Error getting playlists: {str(e)}")
             return []
     
+    def _known_track_count(self, name: str) -> Optional[int]:
+        """
+        Get the number of tracks in a playlist if it is known without parsing the file
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Number of tracks from the cached copy or the track index, whichever
+            matches the file, or None if neither does
+        """
+        with self._lock:
+            cached = self._cache.get(name)
+            
+            if name in self._dirty:
+                return len(cached[1])
+            
+            signature = self._file_signature(self._playlist_path(name))
+            if signature is None:
+                return None
+            
+            if cached and cached[0] == signature:
+                return len(cached[1])
+            
+            if self.track_index.signature(name) == signature:
+                return len(self.track_index.playlist_ids(name))
+        
+        return None
+    
+    def get_playlist_counts(self) -> Dict[str, Optional[int]]:
+        """
+        Get the number of tracks in every playlist
+        
+        Listing playlists never parses them: a playlist whose count isn't
+        known without reading the file is counted as None.
+        
+        Returns:
+            Dictionary mapping playlist names to their number of tracks or None
+        """
+        return {name: self._known_track_count(name) for name in self.get_playlists()}
+    
     def create_playlist(self, name: str) -> bool:
         """
         Create a new empty playlist
@@ -55,21 +611,18 @@ class PlaylistManager:
         """
         try:
             # Sanitize playlist name
-            safe_name = ''.join(c for c in name if c.isalnum() or c in ' _-')
+            safe_name = self.sanitize_name(name)
             
             # Create playlist file
-            playlist_path = os.path.join(self.playlists_dir, f"{safe_name}.json")
+            playlist_path = self._playlist_path(safe_name)
             
             # Check if playlist already exists
-            if os.path.exists(playlist_path):
+            if os.path.exists(playlist_path) or safe_name in self._dirty:
                 print(f"Playlist '{name}' already exists")
                 return False
             
             # Create empty playlist
-            with open(playlist_path, 'w') as f:
-                json.dump([], f)
-            
-            return True
+            return self.save_playlist(safe_name, [])
         
         except Exception as e:
             print(f"Error creating playlist: {str(e)}")
@@ -86,24 +639,53 @@ class PlaylistManager:
             List of track dictionaries
         """
         try:
-            playlist_path = os.path.join(self.playlists_dir, f"{name}.json")
+            playlist = self._read_playlist(name)
             
-            if not os.path.exists(playlist_path):
+            if playlist is None:
                 print(f"Playlist '{name}' not found")
                 return []
             
-            with open(playlist_path, 'r') as f:
-                playlist = json.load(f)
-            
-            self.current_playlist = name
-            self.current_index = 0 if playlist else -1
+            self._update_position(lambda position: {'playlist': name, 'index': 0 if playlist else -1})
             
-            return playlist
+            # Hand out a copy so callers can't modify the cached list
+            return list(playlist)
         
         except Exception as e:
             print(f"Error loading playlist: {str(e)}")
             return []
     
+    def _store_playlist(self, name: str, tracks: List[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+        """
+        Store new contents for a playlist, on disk or in the write-behind buffer
+        
+        Args:
+            name: Sanitized name of the playlist
+            tracks: List of track dictionaries
+            
+        Returns:
+            Signature of the written file, or None if the write was deferred
+        """
+        tracks = list(tracks)
+        
+        if self.write_behind:
+            # Update the in-memory copy and leave the write to the flusher
+            with self._flush_cond:
+                self._cache[name] = (None, tracks)
+                self._dirty.setdefault(name, time.monotonic())
+                self._versions[name] = next(self._change_counter)
+                self._flush_cond.notify()
+            return None
+        
+        with self._io_lock:
+            signature = self._write_playlist_file(name, tracks)
+            
+            # Keep the cache in step with what we just wrote
+            with self._lock:
+                self._cache[name] = (signature, tracks)
+                self._dirty.pop(name, None)
+        
+        return signature
+    
     def save_playlist(self, name: str, tracks: List[Dict[str, Any]]) -> bool:
         """
         Save a playlist to file
@@ -117,12 +699,14 @@ class PlaylistManager:
         """
         try:
             # Sanitize playlist name
-            safe_name = ''.join(c for c in name if c.isalnum() or c in ' _-')
-            
-            playlist_path = os.path.join(self.playlists_dir, f"{safe_name}.json")
+            safe_name = self.sanitize_name(name)
             
-            with open(playlist_path, 'w') as f:
-                json.dump(tracks, f, indent=2)
+            with self._lock:
+                signature = self._store_playlist(safe_name, tracks)
+                
+                old_ids = self.track_index.playlist_ids(safe_name)
+                self.track_index.index_playlist(safe_name, [track.get('id') for track in tracks], signature)
+                self._update_library(tracks, old_ids)
             
             return True
         
@@ -141,17 +725,24 @@ class PlaylistManager:
             True if playlist was deleted successfully, False otherwise
         """
         try:
-            playlist_path = os.path.join(self.playlists_dir, f"{name}.json")
-            
-            if not os.path.exists(playlist_path):
-                print(f"Playlist '{name}' not found")
-                return False
+            playlist_path = self._playlist_path(name)
             
-            os.remove(playlist_path)
+            with self._io_lock, self._lock:
+                pending = self._dirty.pop(name, None) is not None
+                
+                if not os.path.exists(playlist_path) and not pending:
+                    print(f"Playlist '{name}' not found")
+                    return False
+                
+                if os.path.exists(playlist_path):
+                    os.remove(playlist_path)
+                self._cache.pop(name, None)
+                
+                old_ids = self.track_index.playlist_ids(name)
+                self.track_index.drop_playlist(name)
+                self._update_library([], old_ids)
             
-            if self.current_playlist == name:
-                self.current_playlist = None
-                self.current_index = -1
+            self._playlist_removed(name)
             
             return True
         
@@ -171,24 +762,76 @@ class PlaylistManager:
             True if track was added successfully, False otherwise
         """
         try:
-            playlist = self.load_playlist(name)
-            
-            # Check if track is already in playlist
-            for existing_track in playlist:
-                if existing_track.get('id') == track.get('id'):
-                    print(f"Track already exists in playlist '{name}'")
-                    return False
+            name = self.sanitize_name(name)
             
-            # Add track to playlist
-            playlist.append(track)
-            
-            # Save updated playlist
-            return self.save_playlist(name, playlist)
+            with self._lock:
+                playlist = self._read_playlist(name) or []
+                
+                # Check if track is already in playlist
+                for existing_track in playlist:
+                    if existing_track.get('id') == track.get('id'):
+                        print(f"Track already exists in playlist '{name}'")
+                        return False
+                
+                # Save updated playlist
+                signature = self._store_playlist(name, playlist + [track])
+                
+                self.track_index.add(name, track.get('id'))
+                self.track_index.set_signature(name, signature)
+                self._update_library([track], [])
+                
+                return True
         
         except Exception as e:
             print(f"Error adding track to playlist: {str(e)}")
             return False
     
+    def add_many(self, name: str, tracks: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Add several tracks to a playlist with a single write
+        
+        Tracks already in the playlist, repeated in the input or without an ID
+        are skipped.
+        
+        Args:
+            name: Name of the playlist
+            tracks: List of track dictionaries
+            
+        Returns:
+            Number of tracks added, or None if the playlist couldn't be written
+        """
+        try:
+            name = self.sanitize_name(name)
+            
+            with self._lock:
+                playlist = self._read_playlist(name) or []
+                
+                # De-duplicate against the playlist and the input in one pass
+                seen = {track.get('id') for track in playlist}
+                new_tracks = []
+                for track in tracks:
+                    track_id = track.get('id')
+                    if not track_id or track_id in seen:
+                        continue
+                    seen.add(track_id)
+                    new_tracks.append(track)
+                
+                if not new_tracks:
+                    return 0
+                
+                signature = self._store_playlist(name, playlist + new_tracks)
+                
+                for track in new_tracks:
+                    self.track_index.add(name, track['id'])
+                self.track_index.set_signature(name, signature)
+                self._update_library(new_tracks, [])
+                
+                return len(new_tracks)
+        
+        except Exception as e:
+            print(f"Error adding tracks to playlist: {str(e)}")
+            return None
+    
     def remove_from_playlist(self, name: str, track_id: str) -> bool:
         """
         Remove a track from a playlist
@@ -201,20 +844,28 @@ class PlaylistManager:
             True if track was removed successfully, False otherwise
         """
         try:
-            playlist = self.load_playlist(name)
+            name = self.sanitize_name(name)
             
-            # Find track index
-            for i, track in enumerate(playlist):
-                if track.get('id') == track_id:
-                    # Remove track
-                    del playlist[i]
-                    
-                    # Update current index if necessary
-                    if self.current_playlist == name and self.current_index >= i:
-                        self.current_index = max(0, self.current_index - 1)
-                    
-                    # Save updated playlist
-                    return self.save_playlist(name, playlist)
+            with self._lock:
+                playlist = list(self._read_playlist(name) or [])
+                
+                # Find track index
+                for i, track in enumerate(playlist):
+                    if track.get('id') == track_id:
+                        # Remove track
+                        del playlist[i]
+                        
+                        # Update current index if necessary
+                        self._track_removed(name, i)
+                        
+                        # Save updated playlist
+                        signature = self._store_playlist(name, playlist)
+                        
+                        self.track_index.remove(name, track_id)
+                        self.track_index.set_signature(name, signature)
+                        self._update_library([], [track_id])
+                        
+                        return True
             
             print(f"Track not found in playlist '{name}'")
             return False
@@ -223,6 +874,91 @@ class PlaylistManager:
             print(f"Error removing track from playlist: {str(e)}")
             return False
     
+    def find_track(self, track_id: str) -> Dict[str, int]:
+        """
+        Find the playlists that contain a track
+        
+        Answered from the track index, without reading any playlist files
+        unless other workers changed playlists since the last lookup.
+        
+        Args:
+            track_id: ID of the track
+            
+        Returns:
+            Dictionary mapping playlist names to the track's position in them
+        """
+        with self._lock:
+            self._refresh_library()
+            return self.track_index.lookup(track_id)
+    
+    def get_playlist_version(self, name: str) -> Optional[str]:
+        """
+        Get an opaque version string that changes whenever a playlist changes
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Version string or None if the playlist does not exist
+        """
+        with self._lock:
+            if self._read_playlist(name) is None:
+                return None
+            
+            if name in self._dirty:
+                return f"{self._instance_id}-{self._versions[name]}"
+            
+            mtime, size = self._cache[name][0]
+            return f"{mtime:x}-{size:x}"
+    
+    def get_playlist_page(self, name: str, offset: int = 0,
+                          limit: Optional[int] = None) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Get a slice of a playlist without changing the current playlist
+        
+        Args:
+            name: Name of the playlist
+            offset: Index of the first track to return
+            limit: Maximum number of tracks to return, None for all remaining tracks
+            
+        Returns:
+            Tuple of (tracks, total number of tracks) or None if the playlist does not exist
+        """
+        playlist = self._read_playlist(name)
+        
+        if playlist is None:
+            return None
+        
+        end = None if limit is None else offset + limit
+        return playlist[offset:end], len(playlist)
+    
+    def search_library(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search the titles and channels of all saved tracks
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            
+        Returns:
+            List of track dictionaries, best match first
+        """
+        try:
+            with self._lock:
+                self._refresh_library()
+                
+                if self._library is None:
+                    library = LibraryIndex()
+                    for track in self._iter_library_tracks():
+                        library.add(track)
+                    self._library = library
+            
+            return self._library.search(query, max_results)
+        
+        except Exception as e:
+            print(f"Error searching library: {str(e)}")
+            return []
+    
     def get_current_playlist(self) -> Optional[str]:
         """
         Get the name of the current playlist
@@ -239,35 +975,58 @@ class PlaylistManager:
         Returns:
             Dictionary containing track information or None if no track is current
         """
-        if not self.current_playlist or self.current_index < 0:
-            return None
+        position = self._position()
         
-        playlist = self.load_playlist(self.current_playlist)
+        if not position['playlist'] or position['index'] < 0:
+            return None
         
-        if not playlist or self.current_index >= len(playlist):
+        if position['index'] >= self._track_count(position['playlist']):
             return None
         
-        return playlist[self.current_index]
+        return self._track_at(position['playlist'], position['index'])
     
-    def next_track(self) -> Optional[Dict[str, Any]]:
+    def _step(self, step: int) -> Optional[Dict[str, Any]]:
         """
-        Move to the next track in the playlist
+        Move through the current playlist, wrapping around at either end
         
+        Args:
+            step: Number of tracks to move by
+            
         Returns:
-            Dictionary containing track information or None if no next track
+            Dictionary containing track information or None if there is no track to move to
         """
-        if not self.current_playlist:
+        playlist = self.current_playlist
+        
+        if not playlist:
             return None
         
-        playlist = self.load_playlist(self.current_playlist)
+        count = self._track_count(playlist)
         
-        if not playlist:
+        if not count:
             return None
         
-        # Increment index and wrap around if necessary
-        self.current_index = (self.current_index + 1) % len(playlist)
+        def advance(position):
+            if position['playlist'] != playlist:
+                return position
+            return dict(position, index=(position['index'] + step) % count)
+        
+        # Atomic, so concurrent steps from several workers each count
+        position = self._update_position(advance)
+        
+        if position['playlist'] != playlist:
+            return None
+        
+        return self._track_at(playlist, position['index'])
+    
+    def next_track(self) -> Optional[Dict[str, Any]]:
+        """
+        Move to the next track in the playlist
         
-        return playlist[self.current_index]
+        Returns:
+            Dictionary containing track information or None if no next track
+        """
+        # Increment index and wrap around if necessary
+        return self._step(1)
     
     def previous_track(self) -> Optional[Dict[str, Any]]:
         """
@@ -276,15 +1035,5 @@ class PlaylistManager:
         Returns:
             Dictionary containing track information or None if no previous track
         """
-        if not self.current_playlist:
-            return None
-        
-        playlist = self.load_playlist(self.current_playlist)
-        
-        if not playlist:
-            return None
-        
         # Decrement index and wrap around if necessary
-        self.current_index = (self.current_index - 1) % len(playlist)
-        
-        return playlist[self.current_index]
+        return self._step(-1)
@@ -0,0 +1,225 @@
+"""
+Playlist Window module
+A scrolling, filterable window onto a playlist that only fetches the tracks in view
+"""
+
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Tuple
+
+from modules.playlist_manager import PlaylistManager
+
+class PlaylistWindow:
+    """
+    A window of rows onto a playlist's tracks, with a cursor
+    
+    Without a filter, only the tracks in view are fetched from the playlist
+    manager, a page at a time, so moving around costs the same however long
+    the playlist is. The first filter loads the playlist's titles and
+    channels once; every filter after that which extends the previous one
+    only rechecks the tracks that still matched.
+    """
+    
+    def __init__(self, playlist_manager: PlaylistManager, name: str, height: int = 20):
+        """
+        Initialize playlist window
+        
+        Args:
+            playlist_manager: Playlist manager holding the playlist
+            name: Name of the playlist
+            height: Number of rows in view
+        """
+        self.playlist_manager = playlist_manager
+        self.name = name
+        self.height = max(1, height)
+        
+        # Row under the cursor and first row in view
+        self.cursor = 0
+        self.top = 0
+        
+        self.filter = ''
+        
+        # Positions of the tracks matching the filter, None without a filter
+        self._matches: Optional[List[int]] = None
+        
+        # Every track and its lowercased text, loaded for the first filter
+        self._tracks: Optional[List[Dict[str, Any]]] = None
+        self._texts: Optional[List[str]] = None
+        
+        # Page of tracks last fetched, as (offset, tracks)
+        self._page: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+        
+        self.total = 0
+        self.refresh()
+    
+    def refresh(self) -> bool:
+        """
+        Forget fetched tracks after the playlist changed, keeping the filter
+        
+        Returns:
+            False if the playlist no longer exists
+        """
+        page = self.playlist_manager.get_playlist_page(self.name, 0, 0)
+        self.total = page[1] if page else 0
+        self._page = None
+        self._tracks = None
+        self._texts = None
+        
+        cursor, top = self.cursor, self.top
+        
+        if self.filter:
+            self._matches = None
+            self.set_filter(self.filter)
+        
+        self.cursor, self.top = cursor, top
+        self._clamp()
+        return page is not None
+    
+    @property
+    def rows(self) -> int:
+        """Number of rows in the window: matching tracks, or all of them"""
+        return len(self._matches) if self._matches is not None else self.total
+    
+    def position(self, row: int) -> int:
+        """
+        Get the playlist position of a row
+        
+        Args:
+            row: Row in the window
+            
+        Returns:
+            Zero-based position of the row's track in the playlist
+        """
+        return self._matches[row] if self._matches is not None else row
+    
+    def _clamp(self):
+        """Keep the cursor on a row and in view"""
+        self.cursor = max(0, min(self.cursor, self.rows - 1))
+        
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self.height:
+            self.top = self.cursor - self.height + 1
+        
+        self.top = max(0, min(self.top, self.rows - self.height))
+    
+    def resize(self, height: int):
+        """
+        Change the number of rows in view
+        
+        Args:
+            height: Number of rows
+        """
+        self.height = max(1, height)
+        self._clamp()
+    
+    def move(self, rows: int):
+        """
+        Move the cursor
+        
+        Args:
+            rows: Rows to move by, negative to move up
+        """
+        self.cursor += rows
+        self._clamp()
+    
+    def page(self, pages: int):
+        """
+        Scroll by whole windows, moving the cursor along
+        
+        Args:
+            pages: Windows to scroll by, negative to scroll up
+        """
+        self.top += pages * self.height
+        self.cursor += pages * self.height
+        self._clamp()
+    
+    def jump(self, row: int):
+        """
+        Move the cursor to a row, scrolling it to the top of the window
+        
+        Args:
+            row: Row to move to; past the end moves to the last row
+        """
+        self.cursor = row
+        self.top = row
+        self._clamp()
+    
+    def jump_to(self, position: int):
+        """
+        Move the cursor to a playlist position, or the first match after it
+        
+        Args:
+            position: Zero-based position in the playlist
+        """
+        if self._matches is not None:
+            self.jump(bisect_left(self._matches, position))
+        else:
+            self.jump(position)
+    
+    def _load_texts(self):
+        """Load every track and the text filters are matched against"""
+        tracks, _ = self.playlist_manager.get_playlist_page(self.name) or ([], 0)
+        
+        self._tracks = tracks
+        self._texts = [f"{track.get('title', '')} {track.get('channel', '')}".lower() for track in tracks]
+        self.total = len(tracks)
+    
+    def set_filter(self, text: str):
+        """
+        Show only tracks whose title or channel contains every word of a filter
+        
+        Args:
+            text: Filter, empty to show every track
+        """
+        words = text.lower().split()
+        
+        if not words:
+            self.filter = ''
+            self._matches = None
+            self.jump(0)
+            return
+        
+        if self._texts is None:
+            self._load_texts()
+        
+        # A filter extending the previous one can only match fewer tracks
+        if self._matches is not None and text.startswith(self.filter):
+            candidates = self._matches
+        else:
+            candidates = range(len(self._texts))
+        
+        self.filter = text
+        self._matches = [
+            position for position in candidates
+            if all(word in self._texts[position] for word in words)
+        ]
+        self.jump(0)
+    
+    def visible(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the tracks in view
+        
+        Returns:
+            List of (playlist position, track) tuples, top row first
+        """
+        if self._matches is not None:
+            return [(position, self._tracks[position]) for position in self._matches[self.top:self.top + self.height]]
+        
+        if self._page is None or self._page[0] != self.top or len(self._page[1]) < min(self.height, self.total - self.top):
+            tracks, self.total = self.playlist_manager.get_playlist_page(self.name, self.top, self.height) or ([], 0)
+            self._page = (self.top, tracks)
+        
+        return list(enumerate(self._page[1][:self.height], self.top))
+    
+    def selected(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the track under the cursor
+        
+        Returns:
+            Tuple of (playlist position, track), or None if the window is empty
+        """
+        for position, track in self.visible():
+            if position == self.position(self.cursor):
+                return position, track
+        
+        return None
@@ -0,0 +1,155 @@
+"""
+Request Coalescer module
+Lets concurrent identical calls share a single execution
+"""
+
+import threading
+from concurrent.futures import Future, Executor
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from modules.metrics import COALESCED_REQUESTS
+
+class RequestCoalescer:
+    """
+    Runs at most one call per key at a time
+    
+    A call made while another call with the same key is in flight waits for
+    that call and gets its result instead of running again. Results are
+    shared between everyone who asked, so they must be treated as read-only.
+    Nothing is cached: once a call finishes, the next one runs afresh.
+    """
+    
+    def __init__(self, name: str):
+        """
+        Initialize request coalescer
+        
+        Args:
+            name: Name the coalesced calls are counted under in the metrics
+        """
+        self.name = name
+        
+        # Future of each call in flight and the number of callers waiting on it
+        self._in_flight: Dict[Hashable, List] = {}
+        self._lock = threading.Lock()
+    
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """
+        Get the future of the call in flight for a key, registering a new one if there is none
+        
+        Args:
+            key: Call key
+            
+        Returns:
+            Tuple of (future, whether the caller has to run the call)
+        """
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is not None and not entry[0].cancelled():
+                entry[1] += 1
+                COALESCED_REQUESTS.labels(self.name).inc()
+                return entry[0], False
+            
+            future = Future()
+            self._in_flight[key] = [future, 1]
+            return future, True
+    
+    def _finish(self, key: Hashable, future: Future):
+        """
+        Stop offering a call to new callers
+        
+        Args:
+            key: Call key
+            future: Future of the call
+        """
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._in_flight[key]
+    
+    def _run(self, key: Hashable, future: Future, func: Callable, args: tuple):
+        """
+        Run a call and publish its outcome to everyone waiting on it
+        
+        Args:
+            key: Call key
+            future: Future of the call
+            func: Function to call
+            args: Arguments for the function
+        """
+        if not future.set_running_or_notify_cancel():
+            self._finish(key, future)
+            return
+        
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._finish(key, future)
+            future.set_exception(e)
+        else:
+            # Later calls must start over rather than join a finished one
+            self._finish(key, future)
+            future.set_result(result)
+    
+    def run(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        Call a function in the current thread, or wait for the identical call in flight
+        
+        Args:
+            key: Identifies calls that produce the same result
+            func: Function to call
+            *args: Arguments for the function
+            
+        Returns:
+            Return value of the function
+        """
+        future, owner = self._join(key)
+        
+        if owner:
+            self._run(key, future, func, args)
+        
+        return future.result()
+    
+    def submit(self, key: Hashable, executor: Executor, func: Callable, *args) -> Future:
+        """
+        Schedule a call on an executor, or join the identical call in flight
+        
+        A caller that stops waiting must call leave(), so the call can be
+        dropped once nobody waits for it any more.
+        
+        Args:
+            key: Identifies calls that produce the same result
+            executor: Executor to run the call on
+            func: Function to call
+            *args: Arguments for the function
+            
+        Returns:
+            Future of the call
+        """
+        future, owner = self._join(key)
+        
+        if owner:
+            executor.submit(self._run, key, future, func, args)
+        
+        return future
+    
+    def leave(self, key: Hashable, future: Future):
+        """
+        Stop waiting for a submitted call
+        
+        The call is cancelled if it hasn't started yet and no other caller is
+        waiting for it.
+        
+        Args:
+            key: Call key the future was submitted under
+            future: Future returned by submit()
+        """
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is None or entry[0] is not future:
+                return
+            
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+        
+        future.cancel()
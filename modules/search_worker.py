@@ -0,0 +1,179 @@
+"""
+Search Worker module
+Runs searches in the background, handing results over as they are parsed
+"""
+
+import threading
+from typing import Callable, Dict, Any, List, Iterator, Optional
+
+class SearchJob:
+    """
+    A search running in the background
+    
+    The results found so far can be read at any time; waiting on the job
+    returns as soon as there is a new result or the search ended.
+    """
+    
+    def __init__(self, query: str):
+        """
+        Initialize search job
+        
+        Args:
+            query: Search query
+        """
+        self.query = query
+        self.error: Optional[Exception] = None
+        
+        self._results: List[Dict[str, Any]] = []
+        self._cancelled = threading.Event()
+        self._done = False
+        self._changed = threading.Condition()
+    
+    @property
+    def results(self) -> List[Dict[str, Any]]:
+        """Results found so far"""
+        with self._changed:
+            return list(self._results)
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether the search was cancelled or superseded"""
+        return self._cancelled.is_set()
+    
+    @property
+    def done(self) -> bool:
+        """Whether the search ended, finished or not"""
+        with self._changed:
+            return self._done
+    
+    def cancel(self):
+        """Stop the search; results it finds from now on are dropped"""
+        self._cancelled.set()
+        
+        with self._changed:
+            self._done = True
+            self._changed.notify_all()
+    
+    def wait(self, seen: int, timeout: float) -> int:
+        """
+        Wait for more results than have been seen, or for the search to end
+        
+        Args:
+            seen: Number of results already seen
+            timeout: Seconds to wait at most
+            
+        Returns:
+            Number of results found so far
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self._results) > seen or self._done, timeout)
+            return len(self._results)
+    
+    def _add(self, result: Dict[str, Any]) -> bool:
+        """
+        Hand over a result, unless the search was cancelled
+        
+        Args:
+            result: Search result
+            
+        Returns:
+            False if the search was cancelled and should stop
+        """
+        with self._changed:
+            if self._cancelled.is_set():
+                return False
+            
+            self._results.append(result)
+            self._changed.notify_all()
+            return True
+    
+    def _finish(self, error: Optional[Exception] = None):
+        """
+        Mark the search as ended
+        
+        Args:
+            error: Error that ended it, if any
+        """
+        with self._changed:
+            self.error = error
+            self._done = True
+            self._changed.notify_all()
+
+class SearchWorker:
+    """
+    Runs one search at a time on a background thread
+    
+    Starting a search supersedes the one before: it is cancelled, and
+    whatever it still finds is dropped. A request already sent to YouTube
+    can't be taken back, so its thread finishes in the background, but
+    nothing waits for it.
+    """
+    
+    def __init__(self, search: Callable[[str, int], Iterator[Dict[str, Any]]]):
+        """
+        Initialize search worker
+        
+        Args:
+            search: Yields the results of a query, up to a maximum number
+        """
+        self.search = search
+        
+        self._current: Optional[SearchJob] = None
+        self._lock = threading.Lock()
+    
+    def _run(self, job: SearchJob, max_results: int):
+        """
+        Run a search on the worker thread
+        
+        Args:
+            job: Job to report results to
+            max_results: Maximum number of results
+        """
+        results = None
+        
+        try:
+            results = self.search(job.query, max_results)
+            for result in results:
+                if not job._add(result):
+                    break
+        except Exception as e:
+            job._finish(e)
+            return
+        finally:
+            # Stop the search's parsing, if it is a generator
+            close = getattr(results, 'close', None)
+            if close is not None:
+                close()
+        
+        job._finish()
+    
+    def start(self, query: str, max_results: int = 10) -> SearchJob:
+        """
+        Start a search, cancelling the one running
+        
+        Args:
+            query: Search query
+            max_results: Maximum number of results
+            
+        Returns:
+            Job to follow the search with
+        """
+        job = SearchJob(query)
+        
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+            self._current = job
+        
+        thread = threading.Thread(target=self._run, args=(job, max_results), name="search")
+        thread.daemon = True
+        thread.start()
+        
+        return job
+    
+    def cancel(self):
+        """Cancel the running search, if any"""
+        with self._lock:
+            if self._current is not None:
+                self._current.cancel()
+                self._current = None
@@ -0,0 +1,749 @@
+"""
+SQLite Playlist Manager module
+Stores playlists in a SQLite database instead of one JSON file per playlist
+"""
+
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+from modules.playlist_manager import PlaylistManager
+from modules.state_store import StateStore, enable_wal
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds a statement waits for another worker's write to finish
+BUSY_TIMEOUT = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    video_id TEXT PRIMARY KEY,
+    title TEXT,
+    channel TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    video_id TEXT NOT NULL REFERENCES tracks(video_id),
+    position INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_playlist_tracks_video
+    ON playlist_tracks(playlist_id, video_id);
+
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_position
+    ON playlist_tracks(playlist_id, position);
+
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_video_id
+    ON playlist_tracks(video_id);
+
+CREATE TABLE IF NOT EXISTS library_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO library_version (id, version) VALUES (0, 0);
+"""
+
+class SQLitePlaylistManager(PlaylistManager):
+    """
+    Playlist manager backed by a SQLite database
+    
+    Tracks are stored once in the tracks table and linked to playlists
+    through playlist_tracks, which keeps a unique index on (playlist, video id)
+    and an ordering position. Positions are kept dense, so a track's position
+    is its index in the playlist: adds, membership checks and lookups by
+    index or video ID are index lookups instead of scans over the whole
+    playlist. The price is paid by removes, which renumber every track after
+    the removed one, so a remove costs O(n) row and index updates.
+    """
+    
+    def __init__(self, playlists_dir: str = "playlists", db_file: str = "playlists.db",
+                 state_store: Optional[StateStore] = None):
+        """
+        Initialize SQLite playlist manager
+        
+        Args:
+            playlists_dir: Directory holding the database and any JSON playlists
+            db_file: Name of the database file inside playlists_dir
+            state_store: Store for the playback position, in-process if None
+        """
+        super().__init__(playlists_dir, state_store=state_store)
+        
+        self.db_path = os.path.join(self.playlists_dir, db_file)
+        
+        # Flask serves requests from several threads, access is serialized
+        # through self._lock; other workers' writes are waited for
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        
+        # Workers starting together would race to set up the database, one
+        # does it while the others wait
+        with self._setup_lock():
+            self._setup()
+    
+    @contextmanager
+    def _setup_lock(self):
+        """Hold an exclusive lock on the database's setup across processes"""
+        if fcntl is None:
+            yield
+            return
+        
+        with open(f"{self.db_path}.setup.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _setup(self):
+        """Create or upgrade the schema and import JSON playlists into a new database"""
+        is_new = self.conn.execute("SELECT name FROM sqlite_master WHERE name = 'playlists'").fetchone() is None
+        
+        enable_wal(self.conn)
+        
+        self.conn.executescript(SCHEMA)
+        
+        # Databases created before playlists were versioned lack the column
+        columns = [row['name'] for row in self.conn.execute("PRAGMA table_info(playlists)")]
+        if 'version' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE playlists ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        
+        # Databases written before positions were kept dense may have gaps
+        self._compact_positions()
+        
+        # Bring existing JSON playlists over the first time the database is created
+        if is_new:
+            imported = self.import_json_playlists()
+            if imported:
+                print(f"Imported {imported} JSON playlists into {self.db_path}")
+    
+    def _load_index(self):
+        """The database indexes tracks itself, there is no separate track index to load"""
+    
+    def _save_index(self):
+        """The database indexes tracks itself, there is no separate track index to save"""
+    
+    def _sync_index(self, names: Optional[set] = None):
+        """The database indexes tracks itself, there is no separate track index to sync"""
+    
+    def _library_version(self) -> int:
+        """
+        Get the version of the saved tracks, shared by all workers using the database
+        
+        Returns:
+            Number of playlist changes made through any worker
+        """
+        return self.conn.execute("SELECT version FROM library_version").fetchone()['version']
+    
+    def _bump_library_version(self) -> int:
+        """
+        Tell other workers that a playlist changed, in the transaction making the change
+        
+        Returns:
+            The new library version
+        """
+        self.conn.execute("UPDATE library_version SET version = version + 1")
+        return self._library_version()
+    
+    def _compact_positions(self):
+        """Renumber the tracks of playlists whose positions have gaps or repeats"""
+        with self._lock, self.conn:
+            # One sorted pass per playlist instead of a count for every row
+            rows = self.conn.execute(
+                "SELECT rowid, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position) - 1 AS dense "
+                "FROM playlist_tracks WHERE playlist_id IN ("
+                " SELECT playlist_id FROM playlist_tracks GROUP BY playlist_id"
+                " HAVING MAX(position) + 1 != COUNT(*) OR COUNT(DISTINCT position) != COUNT(*)"
+                ")"
+            ).fetchall()
+            
+            self.conn.executemany(
+                "UPDATE playlist_tracks SET position = ? WHERE rowid = ?",
+                [(row['dense'], row['rowid']) for row in rows]
+            )
+    
+    def _playlist_id(self, name: str) -> Optional[int]:
+        """
+        Get the database ID of a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Playlist ID or None if the playlist does not exist
+        """
+        row = self.conn.execute("SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+        return row['id'] if row else None
+    
+    def _bump_version(self, playlist_id: int):
+        """
+        Mark a playlist as changed
+        
+        Args:
+            playlist_id: Playlist ID
+        """
+        self.conn.execute("UPDATE playlists SET version = version + 1 WHERE id = ?", (playlist_id,))
+    
+    def _playlist_video_ids(self, playlist_id: int) -> List[str]:
+        """
+        Get the video IDs of all tracks in a playlist
+        
+        Args:
+            playlist_id: Playlist ID
+            
+        Returns:
+            List of video IDs
+        """
+        rows = self.conn.execute(
+            "SELECT video_id FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+        ).fetchall()
+        return [row['video_id'] for row in rows]
+    
+    def _iter_library_tracks(self):
+        """
+        Iterate over every track that is in at least one playlist
+        
+        Yields:
+            Track dictionaries
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT data FROM tracks WHERE video_id IN (SELECT video_id FROM playlist_tracks)"
+            ).fetchall()
+        
+        for row in rows:
+            yield json.loads(row['data'])
+    
+    def _store_track(self, track: Dict[str, Any]):
+        """
+        Insert or refresh the metadata of a track
+        
+        Args:
+            track: Track dictionary
+        """
+        self.conn.execute(
+            "INSERT INTO tracks (video_id, title, channel, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(video_id) DO UPDATE SET "
+            "title = excluded.title, channel = excluded.channel, data = excluded.data",
+            (track['id'], track.get('title'), track.get('channel'), json.dumps(track))
+        )
+    
+    def _next_position(self, playlist_id: int) -> int:
+        """
+        Get the position after the last track of a playlist
+        
+        Args:
+            playlist_id: Playlist ID
+            
+        Returns:
+            Position for a newly appended track
+        """
+        row = self.conn.execute(
+            "SELECT MAX(position) AS last FROM playlist_tracks WHERE playlist_id = ?",
+            (playlist_id,)
+        ).fetchone()
+        return 0 if row['last'] is None else row['last'] + 1
+    
+    def _track_count(self, name: str) -> int:
+        """
+        Get the number of tracks in a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Number of tracks, 0 if the playlist does not exist
+        """
+        with self._lock:
+            playlist_id = self._playlist_id(name)
+            return 0 if playlist_id is None else self._next_position(playlist_id)
+    
+    def _track_at(self, name: str, index: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the track at a position in a playlist
+        
+        Args:
+            name: Name of the playlist
+            index: Zero-based position of the track
+            
+        Returns:
+            Track dictionary or None if the position is out of range
+        """
+        if index < 0:
+            return None
+        
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT t.data FROM playlist_tracks pt "
+                "JOIN playlists p ON p.id = pt.playlist_id "
+                "JOIN tracks t ON t.video_id = pt.video_id "
+                "WHERE p.name = ? AND pt.position = ?",
+                (name, index)
+            ).fetchone()
+            return json.loads(row['data']) if row else None
+    
+    def get_playlists(self) -> List[str]:
+        """
+        Get a list of available playlists
+        
+        Returns:
+            List of playlist names
+        """
+        try:
+            with self._lock:
+                rows = self.conn.execute("SELECT name FROM playlists ORDER BY name").fetchall()
+            return [row['name'] for row in rows]
+        except Exception as e:
+            print(f"Error getting playlists: {str(e)}")
+            return []
+    
+    def get_playlist_counts(self) -> Dict[str, int]:
+        """
+        Get the number of tracks in every playlist
+        
+        Returns:
+            Dictionary mapping playlist names to their number of tracks
+        """
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT p.name, COUNT(pt.video_id) AS count FROM playlists p "
+                    "LEFT JOIN playlist_tracks pt ON pt.playlist_id = p.id "
+                    "GROUP BY p.id ORDER BY p.name"
+                ).fetchall()
+            return {row['name']: row['count'] for row in rows}
+        except Exception as e:
+            print(f"Error counting playlist tracks: {str(e)}")
+            return {}
+    
+    def create_playlist(self, name: str) -> bool:
+        """
+        Create a new empty playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            True if playlist was created successfully, False otherwise
+        """
+        try:
+            # Sanitize playlist name
+            safe_name = self.sanitize_name(name)
+            
+            with self._lock, self.conn:
+                if self._playlist_id(safe_name) is not None:
+                    print(f"Playlist '{name}' already exists")
+                    return False
+                
+                self.conn.execute("INSERT INTO playlists (name) VALUES (?)", (safe_name,))
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error creating playlist: {str(e)}")
+            return False
+    
+    def load_playlist(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Load a playlist from the database
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            List of track dictionaries
+        """
+        try:
+            with self._lock:
+                playlist_id = self._playlist_id(name)
+                
+                if playlist_id is None:
+                    print(f"Playlist '{name}' not found")
+                    return []
+                
+                rows = self.conn.execute(
+                    "SELECT t.data FROM playlist_tracks pt "
+                    "JOIN tracks t ON t.video_id = pt.video_id "
+                    "WHERE pt.playlist_id = ? ORDER BY pt.position",
+                    (playlist_id,)
+                ).fetchall()
+            
+            playlist = [json.loads(row['data']) for row in rows]
+            
+            self._update_position(lambda position: {'playlist': name, 'index': 0 if playlist else -1})
+            
+            return playlist
+        
+        except Exception as e:
+            print(f"Error loading playlist: {str(e)}")
+            return []
+    
+    def save_playlist(self, name: str, tracks: List[Dict[str, Any]]) -> bool:
+        """
+        Replace the contents of a playlist, creating it if needed
+        
+        Args:
+            name: Name of the playlist
+            tracks: List of track dictionaries
+            
+        Returns:
+            True if playlist was saved successfully, False otherwise
+        """
+        try:
+            # Sanitize playlist name
+            safe_name = self.sanitize_name(name)
+            
+            with self._lock, self.conn:
+                playlist_id = self._playlist_id(safe_name)
+                if playlist_id is None:
+                    playlist_id = self.conn.execute(
+                        "INSERT INTO playlists (name) VALUES (?)", (safe_name,)
+                    ).lastrowid
+                
+                old_ids = self._playlist_video_ids(playlist_id)
+                self.conn.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+                
+                position = 0
+                seen = set()
+                stored = []
+                for track in tracks:
+                    if not track.get('id') or track['id'] in seen:
+                        continue
+                    seen.add(track['id'])
+                    
+                    self._store_track(track)
+                    self.conn.execute(
+                        "INSERT INTO playlist_tracks (playlist_id, video_id, position) VALUES (?, ?, ?)",
+                        (playlist_id, track['id'], position)
+                    )
+                    stored.append(track)
+                    position += 1
+                
+                self._bump_version(playlist_id)
+                self._update_library(stored, old_ids)
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error saving playlist: {str(e)}")
+            return False
+    
+    def delete_playlist(self, name: str) -> bool:
+        """
+        Delete a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            True if playlist was deleted successfully, False otherwise
+        """
+        try:
+            with self._lock, self.conn:
+                playlist_id = self._playlist_id(name)
+                
+                if playlist_id is None:
+                    print(f"Playlist '{name}' not found")
+                    return False
+                
+                old_ids = self._playlist_video_ids(playlist_id)
+                self.conn.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+                self._update_library([], old_ids)
+            
+            self._playlist_removed(name)
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error deleting playlist: {str(e)}")
+            return False
+    
+    def add_to_playlist(self, name: str, track: Dict[str, Any]) -> bool:
+        """
+        Add a track to a playlist, creating the playlist if needed
+        
+        Args:
+            name: Name of the playlist
+            track: Track dictionary
+            
+        Returns:
+            True if track was added successfully, False otherwise
+        """
+        try:
+            if not track.get('id'):
+                print("Track has no ID")
+                return False
+            
+            # Sanitize playlist name
+            safe_name = self.sanitize_name(name)
+            
+            with self._lock, self.conn:
+                playlist_id = self._playlist_id(safe_name)
+                if playlist_id is None:
+                    playlist_id = self.conn.execute(
+                        "INSERT INTO playlists (name) VALUES (?)", (safe_name,)
+                    ).lastrowid
+                
+                # Membership check goes through the unique (playlist, video) index
+                exists = self.conn.execute(
+                    "SELECT 1 FROM playlist_tracks WHERE playlist_id = ? AND video_id = ?",
+                    (playlist_id, track['id'])
+                ).fetchone()
+                
+                if exists:
+                    print(f"Track already exists in playlist '{name}'")
+                    return False
+                
+                self._store_track(track)
+                self.conn.execute(
+                    "INSERT INTO playlist_tracks (playlist_id, video_id, position) VALUES (?, ?, ?)",
+                    (playlist_id, track['id'], self._next_position(playlist_id))
+                )
+                self._bump_version(playlist_id)
+                self._update_library([track], [])
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error adding track to playlist: {str(e)}")
+            return False
+    
+    def add_many(self, name: str, tracks: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Add several tracks to a playlist in a single transaction
+        
+        Tracks already in the playlist, repeated in the input or without an ID
+        are skipped.
+        
+        Args:
+            name: Name of the playlist
+            tracks: List of track dictionaries
+            
+        Returns:
+            Number of tracks added, or None if the playlist couldn't be written
+        """
+        try:
+            # Sanitize playlist name
+            safe_name = self.sanitize_name(name)
+            
+            with self._lock, self.conn:
+                playlist_id = self._playlist_id(safe_name)
+                if playlist_id is None:
+                    playlist_id = self.conn.execute(
+                        "INSERT INTO playlists (name) VALUES (?)", (safe_name,)
+                    ).lastrowid
+                
+                position = self._next_position(playlist_id)
+                added_tracks = []
+                
+                for track in tracks:
+                    if not track.get('id'):
+                        continue
+                    
+                    self._store_track(track)
+                    
+                    # The unique (playlist, video) index rejects duplicates
+                    cursor = self.conn.execute(
+                        "INSERT OR IGNORE INTO playlist_tracks (playlist_id, video_id, position) VALUES (?, ?, ?)",
+                        (playlist_id, track['id'], position)
+                    )
+                    if cursor.rowcount:
+                        position += 1
+                        added_tracks.append(track)
+                
+                if added_tracks:
+                    self._bump_version(playlist_id)
+                self._update_library(added_tracks, [])
+            
+            return len(added_tracks)
+        
+        except Exception as e:
+            print(f"Error adding tracks to playlist: {str(e)}")
+            return None
+    
+    def remove_from_playlist(self, name: str, track_id: str) -> bool:
+        """
+        Remove a track from a playlist
+        
+        Args:
+            name: Name of the playlist
+            track_id: ID of the track to remove
+            
+        Returns:
+            True if track was removed successfully, False otherwise
+        """
+        try:
+            with self._lock, self.conn:
+                playlist_id = self._playlist_id(name)
+                
+                row = None
+                if playlist_id is not None:
+                    row = self.conn.execute(
+                        "SELECT position FROM playlist_tracks WHERE playlist_id = ? AND video_id = ?",
+                        (playlist_id, track_id)
+                    ).fetchone()
+                
+                if not row:
+                    print(f"Track not found in playlist '{name}'")
+                    return False
+                
+                # Positions are dense, so a track's position is its index
+                if self.current_playlist == name:
+                    self._track_removed(name, row['position'])
+                
+                self.conn.execute(
+                    "DELETE FROM playlist_tracks WHERE playlist_id = ? AND video_id = ?",
+                    (playlist_id, track_id)
+                )
+                
+                # Keeping positions dense rewrites every later track, O(n) in
+                # the playlist length, so lookups by index stay O(log n)
+                self.conn.execute(
+                    "UPDATE playlist_tracks SET position = position - 1 WHERE playlist_id = ? AND position > ?",
+                    (playlist_id, row['position'])
+                )
+                self._bump_version(playlist_id)
+                self._update_library([], [track_id])
+            
+            return True
+        
+        except Exception as e:
+            print(f"Error removing track from playlist: {str(e)}")
+            return False
+    
+    def get_playlist_version(self, name: str) -> Optional[str]:
+        """
+        Get an opaque version string that changes whenever a playlist changes
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Version string or None if the playlist does not exist
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT id, version FROM playlists WHERE name = ?", (name,)).fetchone()
+        
+        return f"{row['id']}-{row['version']}" if row else None
+    
+    def get_playlist_page(self, name: str, offset: int = 0,
+                          limit: Optional[int] = None) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Get a slice of a playlist without changing the current playlist
+        
+        Args:
+            name: Name of the playlist
+            offset: Index of the first track to return
+            limit: Maximum number of tracks to return, None for all remaining tracks
+            
+        Returns:
+            Tuple of (tracks, total number of tracks) or None if the playlist does not exist
+        """
+        with self._lock:
+            playlist_id = self._playlist_id(name)
+            
+            if playlist_id is None:
+                return None
+            
+            total = self._next_position(playlist_id)
+            end = total if limit is None else offset + limit
+            
+            # Positions are dense, so the page is a range on the position index
+            rows = self.conn.execute(
+                "SELECT t.data FROM playlist_tracks pt "
+                "JOIN tracks t ON t.video_id = pt.video_id "
+                "WHERE pt.playlist_id = ? AND pt.position >= ? AND pt.position < ? "
+                "ORDER BY pt.position",
+                (playlist_id, max(offset, 0), end)
+            ).fetchall()
+        
+        return [json.loads(row['data']) for row in rows], total
+    
+    def find_track(self, track_id: str) -> Dict[str, int]:
+        """
+        Find the playlists that contain a track
+        
+        Args:
+            track_id: ID of the track
+            
+        Returns:
+            Dictionary mapping playlist names to the track's position in them
+        """
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT p.name, pt.position FROM playlist_tracks pt "
+                    "JOIN playlists p ON p.id = pt.playlist_id "
+                    "WHERE pt.video_id = ?",
+                    (track_id,)
+                ).fetchall()
+            return {row['name']: row['position'] for row in rows}
+        except Exception as e:
+            print(f"Error finding track: {str(e)}")
+            return {}
+    
+    def import_json_playlists(self, json_dir: Optional[str] = None) -> int:
+        """
+        Import JSON playlist files into the database
+        
+        Playlists that already exist in the database are left untouched.
+        
+        Args:
+            json_dir: Directory containing the JSON playlists (defaults to playlists_dir)
+            
+        Returns:
+            Number of playlists imported
+        """
+        json_dir = json_dir or self.playlists_dir
+        imported = 0
+        
+        try:
+            filenames = sorted(os.listdir(json_dir))
+        except Exception as e:
+            print(f"Error listing JSON playlists: {str(e)}")
+            return 0
+        
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            
+            name = filename[:-5]
+            
+            with self._lock:
+                if self._playlist_id(name) is not None:
+                    continue
+            
+            try:
+                with open(os.path.join(json_dir, filename), 'r') as f:
+                    tracks = json.load(f)
+            except Exception as e:
+                print(f"Error reading playlist '{name}': {str(e)}")
+                continue
+            
+            if self.save_playlist(name, tracks):
+                imported += 1
+        
+        return imported
+    
+    def close(self):
+        """Close the database connection"""
+        super().close()
+        
+        with self._lock:
+            self.conn.close()
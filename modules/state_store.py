@@ -0,0 +1,415 @@
+"""
+State Store module
+Mutable application state kept either in process memory or shared between
+worker processes
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+# Seconds events stay in a shared store for workers to pick up
+EVENT_RETENTION = 60
+
+# Seconds between purges of expired entries and old events
+PURGE_INTERVAL = 60
+
+# Tries at switching a database to WAL mode while other workers use it
+JOURNAL_MODE_ATTEMPTS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL,
+    PRIMARY KEY (namespace, key)
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+def enable_wal(conn: sqlite3.Connection):
+    """
+    Switch a database to WAL mode
+    
+    The switch doesn't wait for other connections the way statements do, so
+    workers opening the database at the same moment retry it.
+    
+    Args:
+        conn: Connection to the database
+        
+    Raises:
+        sqlite3.OperationalError: If the database stays locked
+    """
+    for attempt in range(JOURNAL_MODE_ATTEMPTS):
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            return
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or attempt == JOURNAL_MODE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+class StateStore:
+    """
+    Key-value store for state that has to be consistent across workers
+    
+    Values are grouped in namespaces and must be JSON-serializable. Entries
+    can expire. The store also carries events published by any worker, so
+    each worker can pass them on to its own listeners.
+    """
+    
+    # Whether other processes see the same state
+    shared = False
+    
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """
+        Get a value
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to look up
+            default: Returned if the key doesn't exist or has expired
+            
+        Returns:
+            Stored value or default
+        """
+        raise NotImplementedError
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to store under
+            value: JSON-serializable value
+            ttl: Seconds until the entry expires, None to keep it
+        """
+        raise NotImplementedError
+    
+    def delete(self, namespace: str, key: str):
+        """
+        Remove a value
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to remove
+        """
+        raise NotImplementedError
+    
+    def update(self, namespace: str, key: str, func: Callable[[Any], Any],
+               ttl: Optional[float] = None) -> Any:
+        """
+        Atomically replace a value with a function of it
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to update
+            func: Called with the current value, or None, and returns the new value
+            ttl: Seconds until the entry expires, None to keep it
+            
+        Returns:
+            The new value
+        """
+        raise NotImplementedError
+    
+    def append_event(self, event: Dict[str, Any]) -> int:
+        """
+        Record an event for all workers
+        
+        Args:
+            event: JSON-serializable event
+            
+        Returns:
+            Sequence number of the event
+        """
+        raise NotImplementedError
+    
+    def events_since(self, event_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the events recorded after a sequence number
+        
+        Args:
+            event_id: Last sequence number already seen
+            
+        Returns:
+            List of (sequence number, event) tuples in order
+        """
+        raise NotImplementedError
+    
+    def last_event_id(self) -> int:
+        """
+        Get the sequence number of the latest event
+        
+        Returns:
+            Sequence number, 0 if there are no events
+        """
+        raise NotImplementedError
+
+class MemoryStateStore(StateStore):
+    """
+    State store in process memory, for a single worker process
+    """
+    
+    def __init__(self):
+        """Initialize in-memory state store"""
+        # Values and their expiry time, keyed by (namespace, key)
+        self._values: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+        self._events: List[Tuple[int, float, Dict[str, Any]]] = []
+        self._next_event_id = 1
+        self._last_purge = time.time()
+        self._lock = threading.Lock()
+    
+    def _purge(self, now: float):
+        """
+        Drop expired entries and old events, at most every PURGE_INTERVAL seconds
+        
+        Args:
+            now: Current time
+        """
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        
+        self._last_purge = now
+        expired = [key for key, (_, expires) in self._values.items() if expires is not None and expires <= now]
+        for key in expired:
+            del self._values[key]
+        
+        self._events = [entry for entry in self._events if entry[1] > now - EVENT_RETENTION]
+    
+    def _get(self, namespace: str, key: str, now: float) -> Any:
+        """
+        Get a live value, with the lock held
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to look up
+            now: Current time
+            
+        Returns:
+            Stored value or None
+        """
+        entry = self._values.get((namespace, key))
+        if entry is None or (entry[1] is not None and entry[1] <= now):
+            return None
+        return entry[0]
+    
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get(namespace, key, time.time())
+        return default if value is None else value
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._values[(namespace, key)] = (value, None if ttl is None else now + ttl)
+    
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+    
+    def update(self, namespace: str, key: str, func: Callable[[Any], Any],
+               ttl: Optional[float] = None) -> Any:
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            value = func(self._get(namespace, key, now))
+            self._values[(namespace, key)] = (value, None if ttl is None else now + ttl)
+            return value
+    
+    def append_event(self, event: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            event_id = self._next_event_id
+            self._next_event_id += 1
+            self._events.append((event_id, now, event))
+            return event_id
+    
+    def events_since(self, event_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            return [(entry_id, event) for entry_id, _, event in self._events if entry_id > event_id]
+    
+    def last_event_id(self) -> int:
+        with self._lock:
+            return self._next_event_id - 1
+
+class SQLiteStateStore(StateStore):
+    """
+    State store in a SQLite database shared by the worker processes on a host
+    
+    The database runs in WAL mode so readers don't wait for writers, and
+    updates take the write lock up front so read-modify-write cycles from
+    different processes can't interleave.
+    """
+    
+    shared = True
+    
+    def __init__(self, db_path: str):
+        """
+        Initialize SQLite state store
+        
+        Args:
+            db_path: Path to the database file, created if missing
+        """
+        self.db_path = db_path
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = None
+        self._pid = None
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        
+        self.conn.executescript(SCHEMA)
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        Connection of the current process
+        
+        A connection can't be used across fork(), so a worker forked from
+        the process that opened the store opens its own.
+        """
+        if self._pid != os.getpid():
+            # Requests are served from several threads, access is serialized
+            # through self._lock; other processes are kept out by SQLite's locking
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+            enable_wal(self._conn)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        
+        return self._conn
+    
+    def _purge(self, now: float):
+        """
+        Drop expired entries and old events, at most every PURGE_INTERVAL seconds
+        
+        Args:
+            now: Current time
+        """
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        
+        self._last_purge = now
+        self.conn.execute("DELETE FROM state WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        self.conn.execute("DELETE FROM events WHERE created <= ?", (now - EVENT_RETENTION,))
+    
+    def _get(self, namespace: str, key: str, now: float) -> Any:
+        """
+        Get a live value, with the lock held
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to look up
+            now: Current time
+            
+        Returns:
+            Stored value or None
+        """
+        row = self.conn.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+            (namespace, key, now)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _set(self, namespace: str, key: str, value: Any, ttl: Optional[float], now: float):
+        """
+        Store a value, with the lock held
+        
+        Args:
+            namespace: Namespace of the key
+            key: Key to store under
+            value: JSON-serializable value
+            ttl: Seconds until the entry expires, None to keep it
+            now: Current time
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), None if ttl is None else now + ttl)
+        )
+    
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get(namespace, key, time.time())
+        return default if value is None else value
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            self._set(namespace, key, value, ttl, now)
+    
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+    
+    def update(self, namespace: str, key: str, func: Callable[[Any], Any],
+               ttl: Optional[float] = None) -> Any:
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = func(self._get(namespace, key, now))
+                self._set(namespace, key, value, ttl, now)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return value
+    
+    def append_event(self, event: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            cursor = self.conn.execute(
+                "INSERT INTO events (created, data) VALUES (?, ?)",
+                (now, json.dumps(event))
+            )
+            return cursor.lastrowid
+    
+    def events_since(self, event_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, data FROM events WHERE id > ? ORDER BY id", (event_id,)
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+    
+    def last_event_id(self) -> int:
+        with self._lock:
+            row = self.conn.execute("SELECT MAX(id) FROM events").fetchone()
+        return row[0] or 0
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+def create_state_store(kind: str = "memory", db_path: str = "state.db") -> StateStore:
+    """
+    Create a state store by name
+    
+    Args:
+        kind: "memory" for a single process, "sqlite" to share state between processes
+        db_path: Database file of the SQLite store
+        
+    Returns:
+        State store instance
+    """
+    if kind == 'sqlite':
+        return SQLiteStateStore(db_path)
+    if kind != 'memory':
+        raise ValueError(f"Unknown state store: {kind}")
+    return MemoryStateStore()
@@ -0,0 +1,287 @@
+"""
+Static Assets module
+Serves static files under content-hashed URLs, pre-compressed where possible,
+and compresses dynamic responses
+"""
+
+import os
+import gzip
+import hashlib
+import argparse
+import mimetypes
+from typing import Dict, Optional, Tuple
+from flask import Flask, Response, request, send_file, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = {
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+
+# Smaller bodies don't shrink enough to be worth compressing
+MIN_COMPRESS_SIZE = 500
+
+# Lifetime of static files requested under their current content hash
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# File suffixes of pre-compressed variants, by content encoding
+ENCODING_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+def available_encodings() -> Tuple[str, ...]:
+    """
+    Get the content encodings this server can produce, most preferred first
+    
+    Returns:
+        Tuple of encoding names
+    """
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def negotiate_encoding(encodings: Tuple[str, ...]) -> Optional[str]:
+    """
+    Pick the content encoding to use for the current request
+    
+    Args:
+        encodings: Candidate encodings, most preferred first
+        
+    Returns:
+        Encoding name or None to send the response uncompressed
+    """
+    for encoding in encodings:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data with a content encoding
+    
+    Args:
+        data: Bytes to compress
+        encoding: 'br' or 'gzip'
+        
+    Returns:
+        Compressed bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a response body if the client accepts it and it is worth it
+    
+    Args:
+        response: Outgoing response
+        
+    Returns:
+        The same response, possibly compressed
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    
+    encoding = negotiate_encoding(available_encodings())
+    if not encoding:
+        return response
+    
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    
+    # The compressed bytes differ, so the validator can only be weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    
+    return response
+
+def build_precompressed(static_dir: str) -> int:
+    """
+    Write compressed variants next to every compressible static file
+    
+    Variants that are already newer than their source file are skipped.
+    
+    Args:
+        static_dir: Directory containing the static files
+        
+    Returns:
+        Number of variants written
+    """
+    written = 0
+    
+    for root, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            if filename.endswith(tuple(ENCODING_SUFFIXES.values())):
+                continue
+            
+            mimetype = mimetypes.guess_type(filename)[0]
+            if mimetype not in COMPRESSIBLE_TYPES:
+                continue
+            
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as f:
+                data = f.read()
+            
+            for encoding in available_encodings():
+                variant_path = path + ENCODING_SUFFIXES[encoding]
+                
+                if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(path):
+                    continue
+                
+                # Build-time compression can afford the highest level
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9)
+                
+                with open(variant_path, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    
+    return written
+
+class StaticAssets:
+    """
+    Serves an app's static folder for long-lived browser caching
+    
+    url_for('static', ...) gets a 'v' parameter holding a hash of the file's
+    content. A file requested with its current hash can be cached forever,
+    since any change produces a new URL. If a pre-compressed variant built by
+    build_precompressed is at least as new as the file, it is sent instead of
+    the file when the client accepts its encoding.
+    """
+    
+    def __init__(self, app: Flask):
+        """
+        Install hashed static URLs and the static file view on an app
+        
+        Args:
+            app: Flask application
+        """
+        self.app = app
+        self.static_dir = app.static_folder
+        
+        # Content hashes keyed by filename, tagged with the file's mtime
+        self._hashes: Dict[str, Tuple[int, str]] = {}
+        
+        app.url_defaults(self._add_version)
+        app.view_functions['static'] = self.send_static
+    
+    def version(self, filename: str) -> Optional[str]:
+        """
+        Get the content hash of a static file
+        
+        Args:
+            filename: Path of the file relative to the static folder
+            
+        Returns:
+            Short hex digest or None if the file does not exist
+        """
+        path = safe_join(self.static_dir, filename)
+        
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except (TypeError, OSError):
+            return None
+        
+        cached = self._hashes.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        
+        self._hashes[filename] = (mtime, digest)
+        return digest
+    
+    def _add_version(self, endpoint: str, values: Dict[str, str]):
+        """
+        Add the content hash to URLs of static files
+        
+        Args:
+            endpoint: Endpoint a URL is built for
+            values: URL values, modified in place
+        """
+        if endpoint != 'static' or 'filename' not in values or 'v' in values:
+            return
+        
+        version = self.version(values['filename'])
+        if version:
+            values['v'] = version
+    
+    def send_static(self, filename: str) -> Response:
+        """
+        Send a static file, pre-compressed if possible
+        
+        Args:
+            filename: Path of the file relative to the static folder
+            
+        Returns:
+            File response
+        """
+        path = safe_join(self.static_dir, filename)
+        
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        
+        if mimetype in COMPRESSIBLE_TYPES:
+            candidates = tuple(
+                name for name in ENCODING_SUFFIXES
+                if os.path.isfile(path + ENCODING_SUFFIXES[name])
+                and os.path.getmtime(path + ENCODING_SUFFIXES[name]) >= os.path.getmtime(path)
+            )
+            encoding = negotiate_encoding(candidates)
+        
+        if encoding:
+            response = send_file(path + ENCODING_SUFFIXES[encoding], mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = send_file(path, mimetype=mimetype, conditional=True)
+        
+        if mimetype in COMPRESSIBLE_TYPES:
+            response.vary.add('Accept-Encoding')
+        
+        # Hashed URLs never change content, anything else is revalidated
+        if request.args.get('v') and request.args.get('v') == self.version(filename):
+            response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        
+        return response
+
+def main():
+    """Build pre-compressed static files from the command line"""
+    parser = argparse.ArgumentParser(description="Pre-compress static files for serving")
+    parser.add_argument('static_dir', nargs='?', default="static", help="Directory containing the static files")
+    args = parser.parse_args()
+    
+    written = build_precompressed(args.static_dir)
+    encodings = ', '.join(available_encodings())
+    print(f"Wrote {written} compressed files ({encodings})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Stream Prefetcher module
+Resolves the audio streams of likely clicks before they happen
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List, Iterable, Tuple
+
+from modules.metrics import CACHE_REQUESTS, SPECULATIVE_RESOLUTIONS, record_error
+
+# Seconds a speculatively resolved stream is kept waiting for a click
+PREFETCH_TTL = 120
+
+# Most resolutions kept or in flight at once; the oldest are dropped first
+PREFETCH_MAX_ENTRIES = 256
+
+class StreamPrefetcher:
+    """
+    Resolves streams of search results in the background, ahead of clicks
+    
+    Resolutions run on a small pool of their own, so speculation never takes
+    threads from requests for tracks actually being played, and a burst of
+    searches can't flood YouTube with calls. Each search supersedes the
+    previous one from the same session: its resolutions that haven't started
+    are cancelled. Finished resolutions are kept for a short while.
+    
+    A click on a result takes its resolution: finished or running ones are
+    used, one still queued is cancelled so the click resolves it right away
+    instead of waiting behind the rest of the speculation.
+    """
+    
+    def __init__(self, resolve: Callable[[str], Tuple[Optional[str], Optional[Dict[str, Any]]]],
+                 workers: int = 2, ttl: float = PREFETCH_TTL,
+                 max_entries: int = PREFETCH_MAX_ENTRIES):
+        """
+        Initialize stream prefetcher
+        
+        Args:
+            resolve: Resolves a video ID to a (stream_url, video_info) tuple
+            workers: Resolutions running at once
+            ttl: Seconds a resolution is kept for a click
+            max_entries: Most resolutions kept or in flight at once
+        """
+        self.resolve = resolve
+        self.ttl = ttl
+        self.max_entries = max_entries
+        
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        
+        # Resolutions by video ID, oldest first: their future, expiry time and
+        # the owners (sessions) whose latest search asked for them
+        self._entries: OrderedDict = OrderedDict()
+        
+        # Video IDs of each owner's latest search
+        self._owned: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+    
+    def _resolve(self, video_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Resolve a stream on the pool, counting failures
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Tuple of (stream_url, video_info), both None on failure
+        """
+        try:
+            result = self.resolve(video_id)
+        except Exception as e:
+            record_error('stream_prefetcher', e)
+            print(f"Error prefetching stream for {video_id}: {str(e)}")
+            result = (None, None)
+        
+        if not result[0]:
+            SPECULATIVE_RESOLUTIONS.labels('failed').inc()
+        
+        return result
+    
+    def _drop(self, entry: Dict[str, Any]):
+        """
+        Count a resolution nobody clicked, cancelling it if it hasn't started
+        
+        Args:
+            entry: Entry removed from the cache
+        """
+        future = entry['future']
+        
+        if future.cancel():
+            SPECULATIVE_RESOLUTIONS.labels('cancelled').inc()
+        elif not future.done() or future.result()[0]:
+            # Failures were already counted when they happened
+            SPECULATIVE_RESOLUTIONS.labels('wasted').inc()
+    
+    def _expire(self, now: float):
+        """
+        Drop resolutions that were kept too long, with the lock held
+        
+        Args:
+            now: Current monotonic time
+        """
+        expired = False
+        
+        while self._entries:
+            video_id, entry = next(iter(self._entries.items()))
+            if entry['expires'] > now:
+                break
+            
+            del self._entries[video_id]
+            self._drop(entry)
+            expired = True
+        
+        if expired:
+            self._owned = {
+                owner: video_ids for owner, video_ids in self._owned.items()
+                if any(video_id in self._entries for video_id in video_ids)
+            }
+    
+    def prefetch(self, owner: str, video_ids: Iterable[str]):
+        """
+        Start resolving the streams of a search's top results
+        
+        Args:
+            owner: Session the search was made for
+            video_ids: Video IDs of the results most likely to be clicked
+        """
+        video_ids = list(video_ids)
+        now = time.monotonic()
+        
+        with self._lock:
+            self._expire(now)
+            
+            # The owner's previous search is superseded; resolutions nobody
+            # else wants are cancelled unless they already started
+            for video_id in self._owned.pop(owner, []):
+                entry = self._entries.get(video_id)
+                if entry is None or video_id in video_ids:
+                    continue
+                
+                entry['owners'].discard(owner)
+                if not entry['owners'] and entry['future'].cancel():
+                    del self._entries[video_id]
+                    SPECULATIVE_RESOLUTIONS.labels('cancelled').inc()
+            
+            for video_id in video_ids:
+                entry = self._entries.get(video_id)
+                
+                if entry is None:
+                    entry = {
+                        'future': self._executor.submit(self._resolve, video_id),
+                        'owners': set()
+                    }
+                    self._entries[video_id] = entry
+                else:
+                    self._entries.move_to_end(video_id)
+                
+                entry['owners'].add(owner)
+                entry['expires'] = now + self.ttl
+            
+            self._owned[owner] = video_ids
+            
+            while len(self._entries) > self.max_entries:
+                _, entry = self._entries.popitem(last=False)
+                self._drop(entry)
+    
+    def take(self, video_id: str) -> Optional[Future]:
+        """
+        Take the speculative resolution of a clicked track
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            Future of the (stream_url, video_info) tuple, finished or running,
+            or None if the track has to be resolved as usual
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.pop(video_id, None)
+        
+        if entry is None:
+            CACHE_REQUESTS.labels('speculative', 'miss').inc()
+            return None
+        
+        future = entry['future']
+        
+        # Still queued behind other speculation: resolving it now is faster
+        if future.cancel():
+            SPECULATIVE_RESOLUTIONS.labels('cancelled').inc()
+            CACHE_REQUESTS.labels('speculative', 'miss').inc()
+            return None
+        
+        # A failed resolution gets another try
+        if future.done() and not future.result()[0]:
+            CACHE_REQUESTS.labels('speculative', 'miss').inc()
+            return None
+        
+        SPECULATIVE_RESOLUTIONS.labels('used').inc()
+        CACHE_REQUESTS.labels('speculative', 'hit').inc()
+        return future
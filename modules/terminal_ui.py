@@ -5,13 +5,11 @@ Provides a text-based user interface using the Rich library
 
 import os
 import time
-import threading
 from typing import List, Dict, Any, Optional, Callable
-from rich.console import Console
+from rich.console import Console, Group
 from rich.panel import Panel
-from rich.layout import Layout
 from rich.table import Table
-from rich.progress import Progress, BarColumn, TimeRemainingColumn
+from rich.progress_bar import ProgressBar
 from rich.text import Text
 from rich.prompt import Prompt, Confirm
 from rich.style import Style
@@ -20,6 +18,26 @@ from rich.live import Live
 from modules.youtube_client import YouTubeClient
 from modules.audio_player import AudioPlayer
 from modules.playlist_manager import PlaylistManager
+from modules.playlist_importer import PlaylistImporter
+from modules.search_worker import SearchWorker, SearchJob
+from modules.keyboard import KeyReader
+from modules.playlist_window import PlaylistWindow
+from modules.frame_budget import FrameBudget, DEFAULT_MAX_FPS, DEFAULT_RENDER_BUDGET
+
+# Seconds between checks for a keypress while a search runs
+SEARCH_POLL_INTERVAL = 0.05
+
+# Seconds between checks for a resized terminal while a playlist is shown
+PLAYLIST_POLL_INTERVAL = 0.5
+
+# Lines of a playlist window taken by borders, the header and the status line
+PLAYLIST_WINDOW_CHROME = 8
+
+# Columns of the Now Playing progress line taken by the status and the times
+NOW_PLAYING_TEXT_WIDTH = 24
+
+# Seconds between checks for the end of playback while paused
+NOW_PLAYING_IDLE_CHECK = 1.0
 
 class TerminalUI:
     """
@@ -29,7 +47,10 @@ class TerminalUI:
     def __init__(self, 
                  youtube_client: YouTubeClient, 
                  audio_player: AudioPlayer, 
-                 playlist_manager: PlaylistManager):
+                 playlist_manager: PlaylistManager,
+                 max_fps: float = DEFAULT_MAX_FPS,
+                 render_budget: float = DEFAULT_RENDER_BUDGET,
+                 show_render_stats: bool = False):
         """
         Initialize the terminal UI
         
@@ -37,10 +58,15 @@ class TerminalUI:
             youtube_client: YouTube client instance
             audio_player: Audio player instance
             playlist_manager: Playlist manager instance
+            max_fps: Most redraws per second of the Now Playing screen
+            render_budget: Share of a core the Now Playing screen may spend redrawing
+            show_render_stats: Show what redrawing the Now Playing screen costs
         """
         self.youtube_client = youtube_client
         self.audio_player = audio_player
         self.playlist_manager = playlist_manager
+        self.playlist_importer = PlaylistImporter(youtube_client, playlist_manager)
+        self.search_worker = SearchWorker(youtube_client.iter_search)
         
         self.console = Console()
         self.search_results = []
@@ -48,11 +74,11 @@ class TerminalUI:
         
         # UI state
         self.running = True
-        self.live = None
-        self.progress = None
-        self.current_position = 0
-        self.current_duration = 0
-        self.update_lock = threading.Lock()
+        
+        # The Now Playing screen redraws only on visible changes, within this budget
+        self.max_fps = max_fps
+        self.render_budget = render_budget
+        self.show_render_stats = show_render_stats
     
     def run(self):
         """Main UI loop"""
@@ -67,33 +93,15 @@ class TerminalUI:
             border_style="yellow"
         ))
         
-        # Start UI update thread
-        self.ui_thread = threading.Thread(target=self._ui_update_loop)
-        self.ui_thread.daemon = True
-        self.ui_thread.start()
-        
         # Main menu loop
         while self.running:
             self._show_main_menu()
     
-    def _ui_update_loop(self):
-        """
-        Background thread to update UI elements
-        """
-        while self.running:
-            with self.update_lock:
-                # Update current playback position
-                if self.audio_player.is_playing():
-                    self.current_position = self.audio_player.get_position()
-                    self.current_duration = self.audio_player.get_duration()
-            
-            # Sleep to avoid excessive CPU usage
-            time.sleep(0.1)
-    
     def _show_main_menu(self):
         """Display the main menu and handle user input"""
         options = [
             "Search YouTube",
+            "Search Library",
             "Manage Playlists",
             "Now Playing",
             "Exit"
@@ -125,53 +133,144 @@ class TerminalUI:
         if choice == "1":
             self._search_youtube()
         elif choice == "2":
-            self._manage_playlists()
+            self._search_library()
         elif choice == "3":
-            self._now_playing()
+            self._manage_playlists()
         elif choice == "4":
+            self._now_playing()
+        elif choice == "5":
             self._exit()
     
     def _search_youtube(self):
-        """Search YouTube and display results"""
+        """Search YouTube in the background and display results as they arrive"""
         query = Prompt.ask("[bold yellow]Enter search query[/bold yellow]")
         
-        if not query:
+        while query:
+            job = self.search_worker.start(query)
+            key = self._follow_search(job)
+            
+            if key != '/':
+                break
+            
+            # The search keeps running while the new query is typed, and is
+            # superseded once it is entered
+            query = Prompt.ask("[bold yellow]Enter new search query[/bold yellow]")
+        else:
+            self.search_worker.cancel()
             return
         
-        self.console.print("[bold yellow]Searching YouTube...[/bold yellow]")
+        self.search_results = job.results
         
-        # Search YouTube
-        self.search_results = self.youtube_client.search(query)
+        if job.error:
+            self.console.print(f"[bold red]Search failed: {job.error}[/bold red]")
         
         if not self.search_results:
-            self.console.print("[bold red]No results found.[/bold red]")
+            if job.cancelled:
+                self.console.print("[bold yellow]Search cancelled.[/bold yellow]")
+            else:
+                self.console.print("[bold red]No results found.[/bold red]")
             return
         
+        if job.cancelled:
+            self.console.print(f"[bold yellow]Search cancelled, showing the {len(self.search_results)} results found so far.[/bold yellow]")
+        
         # Display search results
         self._display_search_results()
     
-    def _display_search_results(self):
-        """Display search results in a table"""
+    def _follow_search(self, job: SearchJob) -> Optional[str]:
+        """
+        Show a search's results as they arrive, until it ends or a key is pressed
+        
+        Args:
+            job: Running search
+            
+        Returns:
+            The key pressed, or None if the search ended by itself; any key
+            but "/" (new search) cancels the search
+        """
+        seen = 0
+        
+        def searching_panel():
+            return Panel(
+                self._search_results_table(job.results),
+                title=f"Searching YouTube for '{job.query}'...",
+                subtitle="Any key to cancel, / for a new search",
+                border_style="yellow"
+            )
+        
+        # Redrawn only when a result arrives; removed when done, the final
+        # results are printed with their options
+        with KeyReader() as keys, Live(searching_panel(), console=self.console,
+                                       auto_refresh=False, transient=True) as live:
+            while not job.done:
+                key = keys.read()
+                if key is not None:
+                    if key != '/':
+                        job.cancel()
+                    return key
+                
+                count = job.wait(seen, SEARCH_POLL_INTERVAL)
+                if count != seen:
+                    seen = count
+                    live.update(searching_panel(), refresh=True)
+        
+        return None
+    
+    def _search_library(self):
+        """Search saved tracks and display results"""
+        query = Prompt.ask("[bold yellow]Enter library search query[/bold yellow]")
+        
+        if not query:
+            return
+        
+        # Search the local library index, no YouTube request needed
+        self.search_results = self.playlist_manager.search_library(query)
+        
+        if not self.search_results:
+            self.console.print("[bold red]No saved tracks match.[/bold red]")
+            return
+        
+        # Display search results
+        self._display_search_results()
+    
+    def _search_results_table(self, results: List[Dict[str, Any]]) -> Table:
+        """
+        Build the table of search results
+        
+        Args:
+            results: Search results
+            
+        Returns:
+            Table with a row per result
+        """
         table = Table(show_header=True, header_style="bold magenta")
         table.add_column("#", style="dim", width=4)
         table.add_column("Title", min_width=30)
         table.add_column("Channel", min_width=20)
         table.add_column("Duration", width=10)
+        table.add_column("Saved In", style="green")
         
-        for i, result in enumerate(self.search_results, 1):
+        for i, result in enumerate(results, 1):
             table.add_row(
                 str(i),
                 result['title'],
                 result['channel'],
-                result['duration']
+                result['duration'],
+                ", ".join(sorted(self.playlist_manager.find_track(result['id'])))
             )
         
+        return table
+    
+    def _display_search_results(self):
+        """Display search results in a table"""
+        table = self._search_results_table(self.search_results)
+        
         self.console.print(Panel(table, title="Search Results", border_style="green"))
         
         # Show options
         self.console.print("\n[bold cyan]Options:[/bold cyan]")
         self.console.print("  [bold cyan]1-{0}.[/bold cyan] Play track".format(len(self.search_results)))
-        self.console.print("  [bold cyan]a.[/bold cyan] Add to playlist")
+        self.console.print("  [bold cyan]a.[/bold cyan] Add to playlist (one or all results)")
         self.console.print("  [bold cyan]b.[/bold cyan] Back to main menu")
         
         # Get user input
@@ -240,87 +339,148 @@ class TerminalUI:
         if not track_info:
             return
         
-        # Create a live display
-        layout = Layout()
+        frames = FrameBudget(self.max_fps, self.render_budget)
+        urgent = True
         
-        # Track info panel
-        track_panel = Panel(
-            f"[bold]{track_info['title']}[/bold]\n"
-            f"Channel: {track_info['channel']}\n"
-            f"Duration: {track_info['duration']}",
-            title="Now Playing",
-            border_style="green"
-        )
+        # Nothing is redrawn unless the status, the elapsed seconds or the
+        # filled part of the progress bar changed; between frames the loop
+        # sleeps until the next such change or a keypress
+        with KeyReader() as keys, Live(console=self.console, auto_refresh=False) as live:
+            while (self.audio_player.is_playing() or self.audio_player.is_paused()) and self.running:
+                bar_width = max(10, self.console.size.width - NOW_PLAYING_TEXT_WIDTH)
+                state = self._now_playing_state(bar_width)
+                
+                if frames.due(state, urgent):
+                    with frames.frame(state):
+                        live.update(self._now_playing_view(state, bar_width, frames), refresh=True)
+                
+                key = keys.read(frames.wait(self._until_visible_change(bar_width)))
+                
+                # Keys get feedback straight away, whatever the frame rate
+                urgent = key is not None
+                
+                if key == 'p':
+                    self.audio_player.toggle_pause()
+                elif key == 's':
+                    self.audio_player.stop()
+                    break
+                elif key == 'n':
+                    if self.playlist_manager.get_current_playlist():
+                        next_track = self.playlist_manager.next_track()
+                        if next_track:
+                            self.audio_player.stop()
+                            live.stop()
+                            self._play_track(next_track)
+                            break
+                elif key == 'b':
+                    if self.playlist_manager.get_current_playlist():
+                        prev_track = self.playlist_manager.previous_track()
+                        if prev_track:
+                            self.audio_player.stop()
+                            live.stop()
+                            self._play_track(prev_track)
+                            break
+                elif key == 'm':
+                    break
+        
+        if self.show_render_stats:
+            self.console.print(f"[dim]Now Playing: {frames.summary()}[/dim]")
+    
+    def _now_playing_state(self, bar_width: int) -> tuple:
+        """
+        Sample what the Now Playing screen shows
         
-        # Progress bar
-        progress = Progress(
-            "[progress.description]{task.description}",
-            BarColumn(),
-            "[progress.percentage]{task.percentage:>3.0f}%",
-            TimeRemainingColumn(),
-        )
-        progress_task = progress.add_task("Playing", total=100)
+        Args:
+            bar_width: Width of the progress bar in cells
+            
+        Returns:
+            Hashable tuple of everything visible: track, status, terminal
+            width, elapsed and total seconds and filled bar cells
+        """
+        track_info = self.audio_player.get_current_info() or {}
+        position = self.audio_player.get_position()
+        duration = self.audio_player.get_duration()
         
-        # Controls panel
-        controls_panel = Panel(
-            "[bold cyan]Controls:[/bold cyan]\n"
-            "[p] Play/Pause  [s] Stop  [n] Next  [b] Previous  [m] Main Menu",
-            title="Playback Controls",
-            border_style="blue"
-        )
+        filled = int(bar_width * min(1, position / duration)) if duration > 0 else 0
+        status = "Playing" if self.audio_player.is_playing() else "Paused"
+        
+        return (track_info.get('id'), status, bar_width, int(position), int(duration), filled)
+    
+    def _until_visible_change(self, bar_width: int) -> float:
+        """
+        Get the seconds until playback changes what the Now Playing screen shows
+        
+        Args:
+            bar_width: Width of the progress bar in cells
+            
+        Returns:
+            Seconds until the elapsed time or the progress bar moves on
+        """
+        if not self.audio_player.is_playing():
+            return NOW_PLAYING_IDLE_CHECK
+        
+        position = self.audio_player.get_position()
+        duration = self.audio_player.get_duration()
+        
+        # The next whole second, or the next bar cell if cells are shorter
+        step = min(1.0, duration / bar_width) if duration > 0 else 1.0
+        
+        # The player updates the position every 0.1 seconds
+        return step - position % step + 0.05
+    
+    def _now_playing_view(self, state: tuple, bar_width: int, frames: FrameBudget) -> Group:
+        """
+        Build the Now Playing screen
+        
+        Args:
+            state: Sample from _now_playing_state()
+            bar_width: Width of the progress bar in cells
+            frames: Frame budget of the screen, for its statistics
+            
+        Returns:
+            Renderable with the track, its progress and the controls
+        """
+        track_info = self.audio_player.get_current_info() or {}
+        _, status, _, position, duration, _ = state
         
-        # Combine panels
-        layout.split(
-            Layout(track_panel, name="track", size=3),
-            Layout(progress, name="progress", size=1),
-            Layout(controls_panel, name="controls", size=2)
+        def clock(seconds: int) -> str:
+            return f"{seconds // 60}:{seconds % 60:02d}"
+        
+        progress = Table.grid(padding=(0, 1))
+        progress.add_row(
+            Text(status, style="bold green" if status == "Playing" else "bold yellow"),
+            ProgressBar(total=duration or None, completed=position, width=bar_width),
+            Text(f"{clock(position)} / {clock(duration) if duration else '--:--'}")
         )
         
-        # Create live display
-        with Live(layout, refresh_per_second=4) as live:
-            while (self.audio_player.is_playing() or self.audio_player.is_paused()) and self.running:
-                # Update progress
-                if self.current_duration > 0:
-                    percent_complete = min(100, (self.current_position / self.current_duration) * 100)
-                    progress.update(progress_task, completed=percent_complete)
-                
-                # Update status
-                status = "Playing" if self.audio_player.is_playing() else "Paused"
-                progress.update(progress_task, description=status)
-                
-                # Check for user input
-                if self.console.input_ready():
-                    key = self.console.getch()
-                    
-                    if key == 'p':
-                        self.audio_player.toggle_pause()
-                    elif key == 's':
-                        self.audio_player.stop()
-                        break
-                    elif key == 'n':
-                        if self.playlist_manager.get_current_playlist():
-                            next_track = self.playlist_manager.next_track()
-                            if next_track:
-                                self.audio_player.stop()
-                                self._play_track(next_track)
-                                break
-                    elif key == 'b':
-                        if self.playlist_manager.get_current_playlist():
-                            prev_track = self.playlist_manager.previous_track()
-                            if prev_track:
-                                self.audio_player.stop()
-                                self._play_track(prev_track)
-                                break
-                    elif key == 'm':
-                        break
-                
-                time.sleep(0.1)
+        parts = [
+            Panel(
+                f"[bold]{track_info.get('title', '')}[/bold]\n"
+                f"Channel: {track_info.get('channel', '')}\n"
+                f"Duration: {track_info.get('duration', '')}",
+                title="Now Playing",
+                border_style="green"
+            ),
+            progress,
+            Panel(
+                "[bold cyan]Controls:[/bold cyan]\n"
+                "[p] Play/Pause  [s] Stop  [n] Next  [b] Previous  [m] Main Menu",
+                title="Playback Controls",
+                border_style="blue"
+            )
+        ]
+        
+        if self.show_render_stats:
+            parts.append(Text(frames.summary(), style="dim"))
+        
+        return Group(*parts)
     
     def _manage_playlists(self):
         """Display playlist management menu"""
         options = [
             "View Playlists",
             "Create Playlist",
+            "Import YouTube Playlist",
             "Delete Playlist",
             "Back to Main Menu"
         ]
@@ -343,13 +503,16 @@ class TerminalUI:
         elif choice == "2":
             self._create_playlist()
         elif choice == "3":
-            self._delete_playlist()
+            self._import_playlist()
         elif choice == "4":
+            self._delete_playlist()
+        elif choice == "5":
             return
     
     def _view_playlists(self):
         """Display available playlists"""
-        playlists = self.playlist_manager.get_playlists()
+        counts = self.playlist_manager.get_playlist_counts()
+        playlists = list(counts)
         
         if not playlists:
             self.console.print("[bold yellow]No playlists found.[/bold yellow]")
@@ -359,9 +522,11 @@ class TerminalUI:
         table = Table(show_header=True, header_style="bold magenta")
         table.add_column("#", style="dim", width=4)
         table.add_column("Playlist", min_width=30)
+        table.add_column("Tracks", justify="right", width=8)
         
         for i, playlist in enumerate(playlists, 1):
-            table.add_row(str(i), playlist)
+            count = counts[playlist]
+            table.add_row(str(i), playlist, "" if count is None else str(count))
         
         self.console.print(Panel(table, title="Available Playlists", border_style="green"))
         
@@ -384,69 +549,159 @@ class TerminalUI:
     
     def _view_playlist_tracks(self, playlist_name: str):
         """
-        Display tracks in a playlist
+        Display tracks in a playlist, a window at a time
         
         Args:
             playlist_name: Name of the playlist
         """
-        tracks = self.playlist_manager.load_playlist(playlist_name)
+        window = PlaylistWindow(self.playlist_manager, playlist_name, self._playlist_window_height())
         
-        if not tracks:
+        if window.total == 0:
             self.console.print(f"[bold yellow]Playlist '{playlist_name}' is empty.[/bold yellow]")
             return
         
-        # Display tracks
-        table = Table(show_header=True, header_style="bold magenta")
-        table.add_column("#", style="dim", width=4)
-        table.add_column("Title", min_width=30)
-        table.add_column("Channel", min_width=20)
-        table.add_column("Duration", width=10)
-        
-        for i, track in enumerate(tracks, 1):
-            table.add_row(
-                str(i),
-                track['title'],
-                track['channel'],
-                track['duration']
-            )
+        # Typing a filter or a track number to jump to, and what was typed
+        mode = None
+        entry = ''
+        message = ''
+        action = None
         
-        self.console.print(Panel(table, title=f"Playlist: {playlist_name}", border_style="green"))
+        def render():
+            return self._playlist_window_panel(window, mode, entry, message)
         
-        # Show options
-        self.console.print("\n[bold cyan]Options:[/bold cyan]")
-        self.console.print("  [bold cyan]1-{0}.[/bold cyan] Play track".format(len(tracks)))
-        self.console.print("  [bold cyan]p.[/bold cyan] Play entire playlist")
-        self.console.print("  [bold cyan]r.[/bold cyan] Remove track")
-        self.console.print("  [bold cyan]b.[/bold cyan] Back to playlists")
-        
-        # Get user input
-        choices = [str(i) for i in range(1, len(tracks) + 1)] + ["p", "r", "b"]
-        choice = Prompt.ask("Enter your choice", choices=choices)
+        # Redrawn after each key, only the rows in view
+        with KeyReader() as keys, Live(render(), console=self.console,
+                                       auto_refresh=False, transient=True) as live:
+            while action is None:
+                key = keys.read(PLAYLIST_POLL_INTERVAL)
+                
+                if key is None:
+                    # Follow the terminal's size
+                    height = self._playlist_window_height()
+                    if height != window.height:
+                        window.resize(height)
+                        live.update(render(), refresh=True)
+                    continue
+                
+                message = ''
+                
+                if mode == 'filter':
+                    if key in ('enter', 'escape'):
+                        mode = None
+                        if key == 'escape':
+                            window.set_filter('')
+                    elif key == 'backspace':
+                        window.set_filter(window.filter[:-1])
+                    elif len(key) == 1 and key.isprintable():
+                        window.set_filter(window.filter + key)
+                elif mode == 'jump':
+                    if key == 'enter' and entry:
+                        window.jump_to(int(entry) - 1)
+                        mode = None
+                    elif key in ('enter', 'escape'):
+                        mode = None
+                    elif key == 'backspace':
+                        entry = entry[:-1]
+                    elif key.isdigit():
+                        entry += key
+                elif key in ('up', 'k'):
+                    window.move(-1)
+                elif key in ('down', 'j'):
+                    window.move(1)
+                elif key == 'page_up':
+                    window.page(-1)
+                elif key in ('page_down', ' '):
+                    window.page(1)
+                elif key in ('home', 'g'):
+                    window.jump(0)
+                elif key in ('end', 'G'):
+                    window.jump(window.rows - 1)
+                elif key == '/':
+                    mode = 'filter'
+                elif key == ':':
+                    mode = 'jump'
+                    entry = ''
+                elif key == 'r':
+                    selected = window.selected()
+                    if selected and self.playlist_manager.remove_from_playlist(playlist_name, selected[1]['id']):
+                        message = f"Removed '{selected[1]['title']}'"
+                        window.refresh()
+                elif key in ('enter', 'p', 'b', 'escape'):
+                    action = key
+                
+                live.update(render(), refresh=True)
         
-        if choice == "b":
+        if action in ('b', 'escape'):
             self._view_playlists()
             return
-        elif choice == "p":
+        
+        if action == 'p':
             # Play entire playlist
             self.playlist_manager.load_playlist(playlist_name)
             first_track = self.playlist_manager.get_current_track()
             if first_track:
                 self._play_track(first_track)
-        elif choice == "r":
-            # Remove track from playlist
-            track_index = Prompt.ask(
-                "Enter track number to remove",
-                choices=[str(i) for i in range(1, len(tracks) + 1)]
-            )
-            track_index = int(track_index) - 1
-            self.playlist_manager.remove_from_playlist(playlist_name, tracks[track_index]['id'])
-            self._view_playlist_tracks(playlist_name)
-        else:
-            # Play selected track
-            track_index = int(choice) - 1
+            return
+        
+        # Play selected track
+        selected = window.selected()
+        if selected:
+            track_index, track = selected
             self.playlist_manager.load_playlist(playlist_name)
             self.playlist_manager.current_index = track_index
-            self._play_track(tracks[track_index])
+            self._play_track(track)
+    
+    def _playlist_window_height(self) -> int:
+        """Number of track rows that fit on the terminal"""
+        return max(1, self.console.size.height - PLAYLIST_WINDOW_CHROME)
+    
+    def _playlist_window_panel(self, window: PlaylistWindow, mode: Optional[str],
+                               entry: str, message: str) -> Panel:
+        """
+        Build the panel showing the tracks in a playlist window
+        
+        Args:
+            window: Playlist window
+            mode: "filter" or "jump" while one is being typed, None otherwise
+            entry: Track number typed so far in "jump" mode
+            message: Result of the last action, if any
+            
+        Returns:
+            Panel with a table of the tracks in view and the keys to use
+        """
+        table = Table(show_header=True, header_style="bold magenta", expand=True)
+        table.add_column("#", style="dim", width=len(str(window.total)) + 1, no_wrap=True)
+        table.add_column("Title", min_width=30, no_wrap=True, overflow="ellipsis")
+        table.add_column("Channel", min_width=20, no_wrap=True, overflow="ellipsis")
+        table.add_column("Duration", width=10, no_wrap=True)
+        
+        selected = window.position(window.cursor) if window.rows else None
+        
+        for position, track in window.visible():
+            table.add_row(
+                str(position + 1),
+                track['title'],
+                track['channel'],
+                track['duration'],
+                style="reverse" if position == selected else None
+            )
+        
+        if mode == 'filter':
+            status = f"Filter: {window.filter}_"
+        elif mode == 'jump':
+            status = f"Jump to track: {entry}_"
+        elif message:
+            status = message
+        else:
+            shown = f"{window.top + 1}-{min(window.top + window.height, window.rows)} of {window.rows}" if window.rows else "0"
+            status = f"Tracks {shown}" + (f" matching '{window.filter}'" if window.filter else "")
+        
+        return Panel(
+            Group(table, Text(status, style="bold cyan")),
+            title=f"Playlist: {window.name} ({window.total} tracks)",
+            subtitle="↑↓ move  PgUp/PgDn page  / filter  : jump  Enter play  p play all  r remove  b back",
+            border_style="green"
+        )
     
     def _add_to_playlist(self, tracks: List[Dict[str, Any]]):
         """
@@ -516,13 +771,18 @@ class TerminalUI:
             if choice == "c":
                 return
             elif choice == "a":
-                # Add all tracks
-                added_count = 0
-                for track in tracks:
-                    if self.playlist_manager.add_to_playlist(selected_playlist, track):
-                        added_count += 1
+                # Add all tracks with a single write
+                added_count = self.playlist_manager.add_many(selected_playlist, tracks)
+                
+                if added_count is None:
+                    self.console.print("[bold red]Failed to add tracks to playlist.[/bold red]")
+                    return
+                
+                skipped_count = len(tracks) - added_count
                 
                 self.console.print(f"[bold green]Added {added_count} tracks to playlist '{selected_playlist}'.[/bold green]")
+                if skipped_count:
+                    self.console.print(f"[bold yellow]Skipped {skipped_count} tracks already in the playlist.[/bold yellow]")
             else:
                 # Add individual track
                 track_index = int(choice) - 1
@@ -550,6 +810,42 @@ class TerminalUI:
             self.console.print("[bold red]Failed to create playlist.[/bold red]")
             return None
     
+    def _import_playlist(self):
+        """Import a YouTube playlist or channel into a local playlist"""
+        source = Prompt.ask("[bold yellow]Enter YouTube playlist or channel URL[/bold yellow]")
+        
+        if not source:
+            return
+        
+        if not self.youtube_client.parse_playlist_source(source):
+            self.console.print("[bold red]Not a YouTube playlist or channel.[/bold red]")
+            return
+        
+        playlist_name = Prompt.ask("[bold yellow]Enter playlist name to import into[/bold yellow]")
+        
+        if not playlist_name:
+            return
+        
+        resume = True
+        state = self.playlist_importer.load_state(playlist_name)
+        if state:
+            resume = Confirm.ask(
+                f"[bold yellow]An earlier import stopped after {state.get('fetched', 0)} tracks. Resume it?[/bold yellow]"
+            )
+        
+        with self.console.status("[bold green]Importing playlist...[/bold green]") as status:
+            def on_progress(added, fetched):
+                status.update(f"[bold green]Importing playlist... {added} added, {fetched} fetched[/bold green]")
+            
+            result = self.playlist_importer.import_playlist(source, playlist_name, on_progress=on_progress, resume=resume)
+        
+        if result['complete']:
+            self.console.print(f"[bold green]Imported {result['added']} tracks into '{playlist_name}'.[/bold green]")
+        else:
+            self.console.print(
+                f"[bold red]Import stopped after {result['fetched']} tracks. Import again to resume.[/bold red]"
+            )
+    
     def _delete_playlist(self):
         """Delete a playlist"""
         playlists = self.playlist_manager.get_playlists()
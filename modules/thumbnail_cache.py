@@ -0,0 +1,343 @@
+"""
+Thumbnail Cache module
+Serves video thumbnails in the smallest adequate size from a disk cache
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, List
+import requests
+
+from modules.youtube_client import YouTubeClient
+from modules.request_coalescer import RequestCoalescer
+from modules.metrics import CACHE_REQUESTS, UPSTREAM_DURATION, record_error
+
+# Bytes of thumbnails kept on disk; the least recently used are evicted first
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds browsers may reuse a thumbnail without asking again
+THUMBNAIL_MAX_AGE = 30 * 24 * 3600
+
+# Seconds to wait for YouTube's image servers
+UPSTREAM_TIMEOUT = 10
+
+# Widest variant every video has; larger ones that fail fall back to smaller
+# ones down to this width
+FALLBACK_WIDTH = 480
+
+# Variants found missing that are remembered, so they aren't asked for again
+MAX_MISSING = 4096
+
+# Variants every video has, used when its renderer data hasn't been seen
+STANDARD_THUMBNAILS = (
+    ('default', 120, 90),
+    ('mqdefault', 320, 180),
+    ('hqdefault', 480, 360),
+    ('sddefault', 640, 480),
+)
+
+# Image types that are cached, with the extension of their files
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/webp': '.webp',
+    'image/png': '.png',
+}
+
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+class ThumbnailCache:
+    """
+    Fetches thumbnails from YouTube and keeps them on disk
+    
+    YouTube lists several sizes of each thumbnail. A request names the width
+    it will be displayed at and gets the smallest variant at least that
+    wide, so list tiles don't download full-size images. Fetched variants
+    are kept as <video_id>-<width> files until the cache outgrows its size
+    limit, then the least recently used are deleted.
+    """
+    
+    def __init__(self, youtube_client: YouTubeClient, cache_dir: str = "thumbnail_cache",
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize thumbnail cache
+        
+        Args:
+            youtube_client: YouTube client that knows the thumbnail variants of seen videos
+            cache_dir: Directory to store thumbnails in
+            max_bytes: Bytes of thumbnails to keep
+        """
+        self.youtube_client = youtube_client
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        
+        # File name and size of each cached variant, least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        
+        # Concurrent requests for the same variant share one download
+        self._fetches = RequestCoalescer('thumbnail')
+        
+        # Keys of variants YouTube answered 404 for, oldest first
+        self._missing: OrderedDict = OrderedDict()
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+    
+    def _scan(self):
+        """Index the thumbnails already on disk, oldest first"""
+        files = []
+        
+        for entry in os.scandir(self.cache_dir):
+            key, extension = os.path.splitext(entry.name)
+            if extension not in CONTENT_TYPES or not entry.is_file():
+                continue
+            
+            stat = entry.stat()
+            files.append((stat.st_atime, key, entry.name, stat.st_size))
+        
+        for _, key, filename, size in sorted(files):
+            self._entries[key] = (filename, size)
+            self._total += size
+        
+        with self._lock:
+            self._evict()
+    
+    def _evict(self):
+        """Delete the least recently used thumbnails until the cache fits, with the lock held"""
+        # The most recent one stays even if it alone is over the limit
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            _, (filename, size) = self._entries.popitem(last=False)
+            self._total -= size
+            
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+    
+    def variants(self, video_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the thumbnail variants of a video
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            List of variants with 'url', 'width' and 'height', smallest first
+        """
+        variants = self.youtube_client.get_thumbnails(video_id)
+        if variants:
+            return variants
+        
+        return [
+            {'url': f"https://i.ytimg.com/vi/{video_id}/{name}.jpg", 'width': width, 'height': height}
+            for name, width, height in STANDARD_THUMBNAILS
+        ]
+    
+    def choose(self, video_id: str, width: int) -> Dict[str, Any]:
+        """
+        Pick the smallest variant at least as wide as requested
+        
+        Args:
+            video_id: YouTube video ID
+            width: Width in pixels the thumbnail is displayed at
+            
+        Returns:
+            The chosen variant, or the largest one if none is wide enough
+        """
+        variants = self.variants(video_id)
+        
+        for variant in variants:
+            if variant['width'] >= width:
+                return variant
+        
+        return variants[-1]
+    
+    def _candidates(self, video_id: str, width: int) -> List[Dict[str, Any]]:
+        """
+        List the variants to try for display at a given width, in order
+        
+        Args:
+            video_id: YouTube video ID
+            width: Width in pixels the thumbnail is displayed at
+            
+        Returns:
+            The chosen variant, then the smaller ones down to FALLBACK_WIDTH
+        """
+        chosen = self.choose(video_id, width)
+        
+        # Not every video has the larger variants, a failed one falls back to
+        # the next smaller one
+        return [chosen] + [
+            variant for variant in reversed(self.variants(video_id))
+            if FALLBACK_WIDTH <= variant['width'] < chosen['width']
+        ]
+    
+    def _known_missing(self, key: str) -> bool:
+        """
+        Check whether YouTube has no file for a variant
+        
+        Args:
+            key: Cache key of the variant
+            
+        Returns:
+            True if fetching the variant failed with 404
+        """
+        with self._lock:
+            return key in self._missing
+    
+    def _lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Find a cached variant, marking it as recently used
+        
+        Args:
+            key: Cache key of the variant
+            
+        Returns:
+            Tuple of (absolute file path, content type) or None if it isn't cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        
+        path = os.path.abspath(os.path.join(self.cache_dir, entry[0]))
+        
+        try:
+            # The access time keeps the recency order across restarts; the
+            # modification time stays, it is part of the file's ETag
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except FileNotFoundError:
+            # Evicted by another worker process sharing the directory
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self._total -= entry[1]
+            return None
+        
+        return path, CONTENT_TYPES[os.path.splitext(entry[0])[1]]
+    
+    def _fetch(self, key: str, url: str) -> Optional[Tuple[str, str]]:
+        """
+        Download a variant into the cache
+        
+        Args:
+            key: Cache key of the variant
+            url: URL of the variant
+            
+        Returns:
+            Tuple of (absolute file path, content type) or None if it couldn't be fetched
+        """
+        try:
+            with UPSTREAM_DURATION.labels('thumbnail').time():
+                response = requests.get(url, timeout=UPSTREAM_TIMEOUT)
+        except requests.RequestException as e:
+            record_error('thumbnail_cache', e)
+            print(f"Error fetching thumbnail {url}: {str(e)}")
+            return None
+        
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+        extension = EXTENSIONS.get(content_type)
+        
+        if response.status_code != 200 or extension is None:
+            print(f"Error fetching thumbnail {url}: HTTP {response.status_code} {content_type}")
+            
+            # Videos without a large upload lack the larger variants for good
+            if response.status_code == 404:
+                with self._lock:
+                    self._missing[key] = True
+                    if len(self._missing) > MAX_MISSING:
+                        self._missing.popitem(last=False)
+            return None
+        
+        filename = f"{key}{extension}"
+        path = os.path.abspath(os.path.join(self.cache_dir, filename))
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(temp_path, path)
+        except OSError as e:
+            record_error('thumbnail_cache', e)
+            print(f"Error caching thumbnail {key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[1]
+            
+            self._entries[key] = (filename, len(response.content))
+            self._total += len(response.content)
+            self._evict()
+        
+        return path, content_type
+    
+    def lookup(self, video_id: str, width: int) -> Optional[Tuple[str, str]]:
+        """
+        Get a cached thumbnail for display at a given width, without fetching it
+        
+        Args:
+            video_id: YouTube video ID
+            width: Width in pixels the thumbnail is displayed at
+            
+        Returns:
+            Tuple of (absolute file path, content type) or None if it isn't cached
+        """
+        cached = None
+        
+        # Variants known to be missing are skipped for the next smaller one
+        for variant in self._candidates(video_id, width):
+            key = f"{video_id}-{variant['width']}"
+            cached = self._lookup(key)
+            if cached or not self._known_missing(key):
+                break
+        
+        CACHE_REQUESTS.labels('thumbnail', 'hit' if cached else 'miss').inc()
+        return cached
+    
+    def fetch(self, video_id: str, width: int) -> Optional[Tuple[str, str]]:
+        """
+        Fetch a thumbnail for display at a given width into the cache
+        
+        Args:
+            video_id: YouTube video ID
+            width: Width in pixels the thumbnail is displayed at
+            
+        Returns:
+            Tuple of (absolute file path, content type) or None if it couldn't be fetched
+        """
+        for variant in self._candidates(video_id, width):
+            key = f"{video_id}-{variant['width']}"
+            
+            # Another request may have fetched it meanwhile
+            cached = self._lookup(key)
+            if cached:
+                return cached
+            
+            if self._known_missing(key):
+                continue
+            
+            fetched = self._fetches.run(key, self._fetch, key, variant['url'])
+            if fetched:
+                return fetched
+        
+        return None
+    
+    def get(self, video_id: str, width: int) -> Optional[Tuple[str, str]]:
+        """
+        Get a thumbnail file for display at a given width, fetching it if needed
+        
+        Args:
+            video_id: YouTube video ID
+            width: Width in pixels the thumbnail is displayed at
+            
+        Returns:
+            Tuple of (absolute file path, content type) or None if it couldn't be fetched
+        """
+        return self.lookup(video_id, width) or self.fetch(video_id, width)
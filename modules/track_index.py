@@ -0,0 +1,260 @@
+"""
+Track Index module
+Keeps a global index of which playlists contain which tracks
+"""
+
+import os
+import json
+import stat
+import tempfile
+import threading
+from typing import List, Dict, Optional, Tuple
+
+# Permissions masked off new files; read once, since reading the umask means
+# changing it, which isn't safe while other threads create files
+_umask = os.umask(0)
+os.umask(_umask)
+
+def copy_mode(fd: int, path: str):
+    """
+    Give a temporary file the permissions of the file it is about to replace
+    
+    mkstemp creates files readable by their owner only. Files replaced by
+    one keep their permissions, new ones get what open() would give them.
+    
+    Args:
+        fd: Descriptor of the temporary file
+        path: Path of the file it replaces
+    """
+    # Windows has no permission bits to copy
+    if not hasattr(os, 'fchmod'):
+        return
+    
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask
+    
+    os.fchmod(fd, mode)
+
+class TrackIndex:
+    """
+    Inverted index from video ID to the playlists (and positions) containing it
+    
+    Alongside the inverted index the ordered video IDs of every playlist are
+    kept, which is what gets persisted. Each playlist also remembers the
+    (mtime, size) signature of the file it was indexed from so a stale entry
+    can be detected and rebuilt on the next start.
+    """
+    
+    def __init__(self):
+        """Initialize an empty track index"""
+        self._playlists: Dict[str, List[str]] = {}
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._tracks: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.RLock()
+    
+    def load(self, path: str) -> bool:
+        """
+        Load a persisted index from disk
+        
+        Args:
+            path: Path to the index file
+            
+        Returns:
+            True if the index was loaded, False if it was missing or unreadable
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Error loading track index: {str(e)}")
+            return False
+        
+        with self._lock:
+            self._playlists.clear()
+            self._signatures.clear()
+            self._tracks.clear()
+            
+            for name, entry in data.get('playlists', {}).items():
+                signature = entry.get('signature')
+                self.index_playlist(name, entry.get('ids', []), tuple(signature) if signature else None)
+        
+        return True
+    
+    def save(self, path: str) -> bool:
+        """
+        Atomically write the index to disk
+        
+        Args:
+            path: Path to the index file
+            
+        Returns:
+            True if the index was saved, False otherwise
+        """
+        with self._lock:
+            data = {
+                'version': 1,
+                'playlists': {
+                    name: {'signature': self._signatures.get(name), 'ids': ids}
+                    for name, ids in self._playlists.items()
+                }
+            }
+        
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".track_index.", suffix=".tmp")
+        
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                copy_mode(f.fileno(), path)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error saving track index: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+    
+    def playlists(self) -> List[str]:
+        """
+        Get the names of all indexed playlists
+        
+        Returns:
+            List of playlist names
+        """
+        with self._lock:
+            return list(self._playlists)
+    
+    def playlist_ids(self, name: str) -> List[str]:
+        """
+        Get the indexed video IDs of a playlist
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            Ordered list of video IDs
+        """
+        with self._lock:
+            return list(self._playlists.get(name, []))
+    
+    def signature(self, name: str) -> Optional[Tuple[int, int]]:
+        """
+        Get the file signature a playlist was indexed from
+        
+        Args:
+            name: Name of the playlist
+            
+        Returns:
+            (mtime, size) signature or None if unknown
+        """
+        with self._lock:
+            return self._signatures.get(name)
+    
+    def set_signature(self, name: str, signature: Optional[Tuple[int, int]]):
+        """
+        Record the file signature matching the indexed contents of a playlist
+        
+        Args:
+            name: Name of the playlist
+            signature: (mtime, size) signature of the playlist file
+        """
+        with self._lock:
+            if name in self._playlists:
+                self._signatures[name] = signature
+    
+    def index_playlist(self, name: str, ids: List[str], signature: Optional[Tuple[int, int]] = None):
+        """
+        Replace the indexed contents of a playlist
+        
+        Args:
+            name: Name of the playlist
+            ids: Ordered video IDs of the playlist
+            signature: (mtime, size) signature of the playlist file, if known
+        """
+        with self._lock:
+            self.drop_playlist(name)
+            
+            self._playlists[name] = list(ids)
+            self._signatures[name] = signature
+            
+            for position, video_id in enumerate(ids):
+                # Only the first occurrence counts if a playlist has duplicates
+                self._tracks.setdefault(video_id, {}).setdefault(name, position)
+    
+    def add(self, name: str, video_id: str):
+        """
+        Record a track appended to the end of a playlist
+        
+        Args:
+            name: Name of the playlist
+            video_id: Video ID of the track
+        """
+        with self._lock:
+            ids = self._playlists.setdefault(name, [])
+            self._tracks.setdefault(video_id, {}).setdefault(name, len(ids))
+            ids.append(video_id)
+    
+    def remove(self, name: str, video_id: str):
+        """
+        Record a track removed from a playlist
+        
+        Args:
+            name: Name of the playlist
+            video_id: Video ID of the track
+        """
+        with self._lock:
+            ids = self._playlists.get(name)
+            playlists = self._tracks.get(video_id)
+            
+            if ids is None or not playlists or name not in playlists:
+                return
+            
+            position = playlists.pop(name)
+            if not playlists:
+                del self._tracks[video_id]
+            
+            del ids[position]
+            
+            # Every track after the removed one moves up by one
+            for new_position in range(position, len(ids)):
+                entry = self._tracks.get(ids[new_position])
+                if entry and entry.get(name) == new_position + 1:
+                    entry[name] = new_position
+            
+            # A later duplicate of the removed track becomes its first occurrence
+            if video_id in ids[position:]:
+                self._tracks.setdefault(video_id, {})[name] = ids.index(video_id, position)
+    
+    def drop_playlist(self, name: str):
+        """
+        Remove a playlist from the index
+        
+        Args:
+            name: Name of the playlist
+        """
+        with self._lock:
+            for video_id in self._playlists.pop(name, []):
+                playlists = self._tracks.get(video_id)
+                if playlists:
+                    playlists.pop(name, None)
+                    if not playlists:
+                        del self._tracks[video_id]
+            
+            self._signatures.pop(name, None)
+    
+    def lookup(self, video_id: str) -> Dict[str, int]:
+        """
+        Get the playlists containing a track
+        
+        Args:
+            video_id: Video ID of the track
+            
+        Returns:
+            Dictionary mapping playlist names to the track's position in them
+        """
+        with self._lock:
+            return dict(self._tracks.get(video_id, {}))
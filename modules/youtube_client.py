@@ -6,11 +6,21 @@ Handles interaction with YouTube using the innertube package
 import os
 import re
 import time
+import threading
 import requests
-from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import innertube
 import pytube
 
+from modules.metrics import UPSTREAM_DURATION, record_error
+
+# Videos whose thumbnail variants are remembered; the least recently seen are forgotten
+MAX_THUMBNAIL_VIDEOS = 4096
+
+# Prefixes of bare playlist IDs: playlists, uploads, favorites, likes, albums and mixes
+PLAYLIST_ID_PATTERN = re.compile(r'(?:PL|UU|FL|LL|OL|RD|UL)[\w-]{10,}')
+
 class YouTubeClient:
     """
     Client for interacting with YouTube using innertube and pytube
@@ -37,6 +47,10 @@ class YouTubeClient:
         else:
             self.client = innertube.InnerTube("ANDROID")
             
+        # Thumbnail variants of recently seen videos, as listed in their renderer data
+        self._thumbnails: OrderedDict = OrderedDict()
+        self._thumbnails_lock = threading.Lock()
+    
     def _parse_cookies_file(self, cookies_file: str) -> dict:
         """
         Parse cookies.txt file (Netscape format) into a dictionary
@@ -67,6 +81,24 @@ class YouTubeClient:
                     
         return cookies
     
+    def warm_up(self) -> bool:
+        """
+        Open the connection to YouTube before the first real call needs it
+        
+        Returns:
+            True if YouTube answered, False otherwise
+        """
+        try:
+            # The innertube client keeps its connection open, so the first
+            # search or play doesn't wait for DNS and the TLS handshake
+            with UPSTREAM_DURATION.labels('innertube_config').time():
+                self.client.config()
+            return True
+        except Exception as e:
+            record_error('youtube_client', e)
+            print(f"Error warming up YouTube client: {str(e)}")
+            return False
+    
     def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
         """
         Search YouTube for videos matching the query
@@ -78,11 +110,24 @@ class YouTubeClient:
         Returns:
             List of dictionaries containing video information
         """
+        return list(self.iter_search(query, max_results))
+    
+    def iter_search(self, query: str, max_results: int = 10) -> Iterator[Dict[str, Any]]:
+        """
+        Search YouTube for videos matching the query, yielding each result as it is parsed
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to yield
+            
+        Yields:
+            Dictionaries containing video information
+        """
         try:
             # Use innertube to search YouTube
-            search_results = self.client.search(query)
+            with UPSTREAM_DURATION.labels('innertube_search').time():
+                search_results = self.client.search(query)
             
-            videos = []
             count = 0
             
             # For ANDROID client, the structure is different
@@ -99,13 +144,13 @@ class YouTubeClient:
                                 video_data = content['videoRenderer']
                                 video = self._extract_video_info(video_data)
                                 if video:
-                                    videos.append(video)
+                                    yield video
                                     count += 1
                                     if count >= max_results:
-                                        break
+                                        return
             
             # Try other possible structures if no videos found yet
-            if not videos and 'contents' in search_results:
+            if not count and 'contents' in search_results:
                 # Try sectionListRenderer structure
                 if 'sectionListRenderer' in search_results.get('contents', {}):
                     sections = search_results['contents']['sectionListRenderer'].get('contents', [])
@@ -117,25 +162,23 @@ class YouTubeClient:
                                     video_data = item['videoRenderer']
                                     video = self._extract_video_info(video_data)
                                     if video:
-                                        videos.append(video)
+                                        yield video
                                         count += 1
                                         if count >= max_results:
-                                            break
+                                            return
             
             # If still no videos, use a more generic approach - search all nested dictionaries
-            if not videos:
+            if not count:
                 print("Using fallback search method to find video renderers")
                 video_renderers = self._find_all_video_renderers(search_results)
                 for video_data in video_renderers[:max_results]:
                     video = self._extract_video_info(video_data)
                     if video:
-                        videos.append(video)
-            
-            return videos
+                        yield video
             
         except Exception as e:
+            record_error('youtube_client', e)
             print(f"Error searching YouTube: {str(e)}")
-            return []
     
     def _find_all_video_renderers(self, data, max_depth=10) -> List[Dict[str, Any]]:
         """
@@ -199,6 +242,9 @@ class YouTubeClient:
                 channel = video_data['ownerText']['runs'][0].get('text', 'Unknown Channel')
             elif 'longBylineText' in video_data and 'runs' in video_data['longBylineText']:
                 channel = video_data['longBylineText']['runs'][0].get('text', 'Unknown Channel')
+            elif 'shortBylineText' in video_data and 'runs' in video_data['shortBylineText']:
+                # Playlist entries only carry the short byline
+                channel = video_data['shortBylineText']['runs'][0].get('text', 'Unknown Channel')
             
             # Extract duration
             duration_text = 'Unknown'
@@ -224,6 +270,7 @@ class YouTubeClient:
                 thumbnails = video_data['thumbnail']['thumbnails']
                 if thumbnails:
                     thumbnail = thumbnails[-1].get('url', '')
+                    self._remember_thumbnails(video_id, thumbnails)
             
             # Add video information to the results
             return {
@@ -240,6 +287,165 @@ class YouTubeClient:
             print(f"Error extracting video info: {str(e)}")
             return None
     
+    def _remember_thumbnails(self, video_id: str, thumbnails: List[Dict[str, Any]]):
+        """
+        Keep the thumbnail variants listed for a video
+        
+        Args:
+            video_id: YouTube video ID
+            thumbnails: Thumbnail entries with 'url', 'width' and 'height'
+        """
+        variants = []
+        for thumbnail in thumbnails:
+            url = thumbnail.get('url', '')
+            if not url or not thumbnail.get('width'):
+                continue
+            
+            # Some renderers give protocol-relative URLs
+            if url.startswith('//'):
+                url = f"https:{url}"
+            
+            variants.append({'url': url, 'width': int(thumbnail['width']), 'height': int(thumbnail.get('height', 0))})
+        
+        if not variants:
+            return
+        
+        variants.sort(key=lambda variant: variant['width'])
+        
+        with self._thumbnails_lock:
+            self._thumbnails[video_id] = variants
+            self._thumbnails.move_to_end(video_id)
+            
+            while len(self._thumbnails) > MAX_THUMBNAIL_VIDEOS:
+                self._thumbnails.popitem(last=False)
+    
+    def get_thumbnails(self, video_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the thumbnail variants seen for a video in search results, playlists or playback
+        
+        Args:
+            video_id: YouTube video ID
+            
+        Returns:
+            List of variants with 'url', 'width' and 'height', smallest first;
+            empty if the video hasn't been seen recently
+        """
+        with self._thumbnails_lock:
+            return list(self._thumbnails.get(video_id, []))
+    
+    def parse_playlist_source(self, source: str) -> Optional[str]:
+        """
+        Get a playlist ID from a playlist URL, playlist ID, channel URL or channel ID
+        
+        Channels resolve to their uploads playlist.
+        
+        Args:
+            source: Playlist or channel reference
+            
+        Returns:
+            Playlist ID or None if the source isn't recognized
+        """
+        source = source.strip()
+        
+        # Playlist URL, e.g. https://www.youtube.com/playlist?list=PL...
+        match = re.search(r'[?&]list=([\w-]+)', source)
+        if match:
+            return match.group(1)
+        
+        # Channel ID or channel URL, the uploads playlist shares the ID after the prefix
+        match = re.search(r'(?:^|/)UC([\w-]{22})(?:$|[/?])', source)
+        if match:
+            return 'UU' + match.group(1)
+        
+        # Bare playlist ID; any other word is not a playlist
+        if PLAYLIST_ID_PATTERN.fullmatch(source):
+            return source
+        
+        return None
+    
+    def _find_continuation_token(self, data, max_depth=40) -> Optional[str]:
+        """
+        Recursively search a browse response for the token of the next page
+        
+        Args:
+            data: Dictionary or list to search through
+            max_depth: Maximum recursion depth
+            
+        Returns:
+            Continuation token or None if this is the last page
+        """
+        if max_depth <= 0:
+            return None
+        
+        if isinstance(data, dict):
+            if 'continuationCommand' in data:
+                return data['continuationCommand'].get('token')
+            if 'nextContinuationData' in data:
+                return data['nextContinuationData'].get('continuation')
+            values = data.values()
+        elif isinstance(data, list):
+            values = data
+        else:
+            return None
+        
+        for value in values:
+            token = self._find_continuation_token(value, max_depth - 1)
+            if token:
+                return token
+        
+        return None
+    
+    def iter_playlist_pages(self, playlist_id: str,
+                            continuation: Optional[str] = None) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Fetch a YouTube playlist one page at a time
+        
+        Only the current page is held in memory. Iteration stops early if a
+        page fails to load; the last continuation token yielded can be passed
+        back in to resume from there.
+        
+        Args:
+            playlist_id: YouTube playlist ID
+            continuation: Continuation token to resume from instead of the first page
+            
+        Yields:
+            Tuples of (tracks on the page, continuation token of the next page or None)
+        """
+        try:
+            with UPSTREAM_DURATION.labels('innertube_browse').time():
+                if continuation:
+                    data = self.client.browse(continuation=continuation)
+                else:
+                    data = self.client.browse(browse_id=f"VL{playlist_id}")
+        except Exception as e:
+            record_error('youtube_client', e)
+            print(f"Error fetching playlist: {str(e)}")
+            return
+        
+        while True:
+            tracks = []
+            seen = set()
+            for video_data in self._find_all_video_renderers(data, max_depth=40):
+                video = self._extract_video_info(video_data)
+                if video and video['id'] not in seen:
+                    seen.add(video['id'])
+                    tracks.append(video)
+            
+            next_continuation = self._find_continuation_token(data)
+            
+            yield tracks, next_continuation
+            
+            if not next_continuation:
+                return
+            
+            try:
+                with UPSTREAM_DURATION.labels('innertube_browse').time():
+                    data = self.client.browse(continuation=next_continuation)
+            except Exception as e:
+                record_error('youtube_client', e)
+                print(f"Error fetching playlist page: {str(e)}")
+                return
+    
     def get_video_info(self, video_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information about a specific video
@@ -262,16 +468,19 @@ class YouTubeClient:
             else:
                 youtube = pytube.YouTube(url)
             
-            return {
-                'id': video_id,
-                'title': youtube.title,
-                'channel': youtube.author,
-                'duration': self._format_duration(youtube.length),
-                'views': youtube.views,
-                'thumbnail': youtube.thumbnail_url,
-                'url': url
-            }
+            # PyTube fetches the page when the first attribute is read
+            with UPSTREAM_DURATION.labels('pytube').time():
+                return {
+                    'id': video_id,
+                    'title': youtube.title,
+                    'channel': youtube.author,
+                    'duration': self._format_duration(youtube.length),
+                    'views': youtube.views,
+                    'thumbnail': youtube.thumbnail_url,
+                    'url': url
+                }
         except Exception as e:
+            record_error('youtube_client', e)
             print(f"Error getting video info: {str(e)}")
             return None
             
@@ -334,7 +543,8 @@ class YouTubeClient:
                 if hasattr(self.client, '_session') and hasattr(self.client._session, 'cookies'):
                     self.client._session.cookies.update(cookies)
                 
-            data = self.client.player(video_id)
+            with UPSTREAM_DURATION.labels('innertube_player').time():
+                data = self.client.player(video_id)
             
             # Extract video details
             video_details = data.get('videoDetails', {})
@@ -342,7 +552,9 @@ class YouTubeClient:
             channel = video_details.get('author', 'Unknown Channel')
             length_seconds = int(video_details.get('lengthSeconds', 0))
             view_count = video_details.get('viewCount', 'Unknown')
-            thumbnail_url = video_details.get('thumbnail', {}).get('thumbnails', [{}])[-1].get('url', '')
+            thumbnails = video_details.get('thumbnail', {}).get('thumbnails', [{}])
+            thumbnail_url = thumbnails[-1].get('url', '')
+            self._remember_thumbnails(video_id, thumbnails)
             
             # Create video info
             video_info = {
@@ -379,7 +591,8 @@ class YouTubeClient:
                     try:
                         url = f"https://www.youtube.com/watch?v={video_id}"
                         yt = self._create_pytube_with_cookies(url, cookies_file)
-                        audio_streams = yt.streams.filter(only_audio=True).order_by('abr').desc()
+                        with UPSTREAM_DURATION.labels('pytube').time():
+                            audio_streams = yt.streams.filter(only_audio=True).order_by('abr').desc()
                         if audio_streams:
                             best_stream = audio_streams.first()
                             # Get the direct URL
@@ -391,6 +604,7 @@ class YouTubeClient:
                             if audio_url:
                                 return audio_url, video_info
                     except Exception as e:
+                        record_error('youtube_client', e)
                         print(f"Error getting URL from PyTube: {str(e)}")
                 
                 return None, None
@@ -408,6 +622,7 @@ class YouTubeClient:
             return audio_url, video_info
             
         except Exception as e:
+            record_error('youtube_client', e)
             print(f"Error getting audio stream: {str(e)}")
             return None, None
     
@@ -21,6 +21,16 @@ setup(
         "pytube>=15.0.0",
         "requests>=2.32.3",
     ],
+    extras_require={
+        "async": [
+            "starlette>=0.37.0",
+            "uvicorn>=0.29.0",
+            "a2wsgi>=1.10.0",
+        ],
+        "brotli": [
+            "brotli>=1.1.0",
+        ],
+    },
     entry_points={
         "console_scripts": [
             "youtube-web=web_app:app.run",
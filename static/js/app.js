@@ -3,8 +3,12 @@
 // DOM Elements
 const searchInput = document.getElementById('search-input');
 const searchButton = document.getElementById('search-button');
+const searchMode = document.getElementById('search-mode');
 const searchResults = document.getElementById('search-results');
-const audioPlayer = document.getElementById('audio-player');
+// The two players swap roles: the active one plays, the standby one
+// preloads the next playlist track
+let audioPlayer = document.getElementById('audio-player');
+let standbyPlayer = document.getElementById('standby-player');
 const currentTrack = document.getElementById('current-track');
 const trackInfo = currentTrack.querySelector('.track-info');
 const trackEmpty = currentTrack.querySelector('.track-empty');
@@ -14,6 +18,8 @@ const trackChannel = document.getElementById('track-channel');
 const trackDuration = document.getElementById('track-duration');
 const playlistName = document.getElementById('playlist-name');
 const createPlaylistButton = document.getElementById('create-playlist-button');
+const importPlaylistButton = document.getElementById('import-playlist-button');
+const importStatus = document.getElementById('import-status');
 const playlistsList = document.getElementById('playlists');
 const playlistTracks = document.getElementById('playlist-tracks');
 const currentPlaylistName = document.getElementById('current-playlist-name');
@@ -30,8 +36,26 @@ const playlistTrackTemplate = document.getElementById('playlist-track-template')
 // State
 let searchResultsData = [];
 let playlists = [];
+let playlistCounts = {};
 let currentPlaylist = null;
 let playlistTracksData = [];
+let playlistNextOffset = null;
+
+// Playlist tracks are fetched a page at a time, without thumbnails
+const PLAYLIST_PAGE_SIZE = 100;
+const PLAYLIST_TRACK_FIELDS = 'id,title,channel,duration';
+
+// Playlist playback: the playlist and position of the playing track, and the
+// next track once it is preloaded into the standby player
+let playbackQueue = null;
+let preloadedTrack = null;
+let preloadPromise = null;
+
+// Bumped by every reset, so preloads started before it are dropped
+let preloadGeneration = 0;
+
+// Seconds before the end of a track at which the next one starts loading
+const PRELOAD_SECONDS = 15;
 let selectedTrackForPlaylist = null;
 
 // Event Listeners
@@ -39,6 +63,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // Load playlists when the page loads
     loadPlaylists();
     
+    // Follow playback, playlist and import changes pushed by the server
+    connectEvents();
+    
     // Search functionality
     searchInput.addEventListener('keypress', (e) => {
         if (e.key === 'Enter') {
@@ -48,15 +75,27 @@ document.addEventListener('DOMContentLoaded', () => {
     
     searchButton.addEventListener('click', performSearch);
     
-    // Audio player events
-    audioPlayer.addEventListener('ended', () => {
-        // Could implement auto-play next track in playlist here
-        showNotification('Playback ended', 'success');
+    // Audio player events, only the active player's count
+    [audioPlayer, standbyPlayer].forEach(player => {
+        player.addEventListener('timeupdate', () => {
+            if (player === audioPlayer) {
+                maybePreloadNextTrack();
+            }
+        });
+        
+        player.addEventListener('ended', () => {
+            if (player === audioPlayer) {
+                playNextTrack();
+            }
+        });
     });
     
     // Create playlist
     createPlaylistButton.addEventListener('click', createPlaylist);
     
+    // Import playlist
+    importPlaylistButton.addEventListener('click', importPlaylist);
+    
     // Close modal
     closeModal.addEventListener('click', () => {
         playlistSelectionModal.style.display = 'none';
@@ -71,6 +110,98 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 
 // Functions
+function connectEvents() {
+    // EventSource reconnects by itself; each connection starts with a "state" event
+    const events = new EventSource('/api/events');
+    
+    events.addEventListener('state', (e) => {
+        updateNowPlaying(JSON.parse(e.data).current_track);
+    });
+    
+    events.addEventListener('now_playing', (e) => {
+        updateNowPlaying(JSON.parse(e.data).current_track);
+    });
+    
+    events.addEventListener('playlist', (e) => {
+        const change = JSON.parse(e.data);
+        
+        // The preloaded track may no longer be the next one
+        if (playbackQueue && playbackQueue.playlist === change.name) {
+            if (change.action === 'deleted') {
+                playbackQueue = null;
+            }
+            resetPreload();
+        }
+        
+        if (currentPlaylist === change.name) {
+            if (change.action === 'deleted') {
+                currentPlaylist = null;
+                playlistTracks.style.display = 'none';
+            } else {
+                refreshPlaylists(change.name);
+                return;
+            }
+        }
+        
+        loadPlaylists();
+    });
+    
+    events.addEventListener('import', (e) => {
+        showImportProgress(JSON.parse(e.data));
+    });
+    
+    // Events were dropped while this page fell behind, so refetch everything
+    events.addEventListener('resync', () => {
+        if (currentPlaylist) {
+            refreshPlaylists(currentPlaylist);
+        } else {
+            loadPlaylists();
+        }
+    });
+}
+
+// Runs several API calls in one round trip. Each operation is
+// { method, path, body, after }: operations without "after" run concurrently
+// on the server, the others once the operation at index "after" succeeded.
+// Resolves to one { status, body } per operation, in order.
+async function batchRequest(operations) {
+    const response = await fetch('/api/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ operations }),
+    });
+    
+    const data = await response.json();
+    
+    if (!response.ok) {
+        throw new Error(data.error || 'Batch request failed');
+    }
+    
+    return data.responses;
+}
+
+function batchOk(result) {
+    return result.status >= 200 && result.status < 300;
+}
+
+// Reloads the playlist list and a playlist's first page together
+async function refreshPlaylists(name) {
+    try {
+        const [list, page] = await batchRequest([
+            { method: 'GET', path: '/api/playlists' },
+            { method: 'GET', path: playlistPagePath(name, 0) },
+        ]);
+        
+        showPlaylists(list.status, list.body);
+        showPlaylistPage(name, page.status, page.body);
+    } catch (error) {
+        console.error('Refresh playlists error:', error);
+        showNotification('An error occurred while loading playlists', 'error');
+    }
+}
+
 async function performSearch() {
     const query = searchInput.value.trim();
     
@@ -87,7 +218,7 @@ async function performSearch() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ query }),
+            body: JSON.stringify({ query, mode: searchMode.value }),
         });
         
         const data = await response.json();
@@ -122,15 +253,24 @@ function displaySearchResults(results) {
         const title = resultItem.querySelector('.result-title');
         const channel = resultItem.querySelector('.result-channel');
         const duration = resultItem.querySelector('.result-duration');
+        const saved = resultItem.querySelector('.result-saved');
         const playButton = resultItem.querySelector('.play-button');
         const addToPlaylistButton = resultItem.querySelector('.add-to-playlist-button');
         
-        thumbnail.src = result.thumbnail || 'https://via.placeholder.com/120x70';
+        thumbnail.src = thumbnailUrl(result, 120);
         thumbnail.alt = result.title;
+        thumbnail.loading = 'lazy';
         title.textContent = result.title;
         channel.textContent = result.channel;
         duration.textContent = result.duration;
         
+        // Show which playlists already contain this track
+        if (result.saved_in && result.saved_in.length > 0) {
+            saved.textContent = `Saved in: ${result.saved_in.join(', ')}`;
+        } else {
+            saved.style.display = 'none';
+        }
+        
         // Add event listeners
         playButton.addEventListener('click', () => {
             playTrack(result);
@@ -145,7 +285,12 @@ function displaySearchResults(results) {
     });
 }
 
-async function playTrack(track) {
+async function playTrack(track, queue = null) {
+    // A track picked by hand starts over: from a playlist, playback continues
+    // with the tracks after it, otherwise it stops at the end
+    playbackQueue = queue;
+    resetPreload();
+    
     try {
         showNotification(`Loading: ${track.title}`, 'success');
         
@@ -154,7 +299,8 @@ async function playTrack(track) {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ video_id: track.id }),
+            // The playlist position is remembered for warming up after a restart
+            body: JSON.stringify({ video_id: track.id, ...(queue || {}) }),
         });
         
         const data = await response.json();
@@ -163,8 +309,9 @@ async function playTrack(track) {
             // Update UI
             updateNowPlaying(data.track_info);
             
-            // Use the direct streaming URL from YouTube
-            audioPlayer.src = data.track_info.streaming_url;
+            // Stream through the server, which keeps working after the
+            // direct YouTube URL expires and caches the audio for replays
+            audioPlayer.src = data.track_info.stream_url || data.track_info.streaming_url;
             audioPlayer.play().catch(e => {
                 console.error('Error playing audio:', e);
                 showNotification('Error playing audio. Please try again.', 'error');
@@ -178,6 +325,118 @@ async function playTrack(track) {
     }
 }
 
+function maybePreloadNextTrack() {
+    if (!playbackQueue || preloadPromise || !isFinite(audioPlayer.duration)) return;
+    
+    if (audioPlayer.duration - audioPlayer.currentTime <= PRELOAD_SECONDS) {
+        preloadPromise = preloadNextTrack(playbackQueue);
+    }
+}
+
+async function preloadNextTrack(queue) {
+    const generation = preloadGeneration;
+    
+    try {
+        const params = new URLSearchParams({ position: queue.position, count: 1 });
+        const response = await fetch(`/api/playlists/${encodeURIComponent(queue.playlist)}/next?${params}`);
+        const data = await response.json();
+        
+        // Another track was picked, or the playlist changed, meanwhile
+        if (generation !== preloadGeneration) return;
+        
+        if (!response.ok || data.tracks.length === 0) {
+            preloadedTrack = null;
+            return;
+        }
+        
+        // The standby player buffers the track while the current one finishes
+        preloadedTrack = data.tracks[0];
+        standbyPlayer.src = preloadedTrack.stream_url || preloadedTrack.streaming_url;
+        standbyPlayer.load();
+    } catch (error) {
+        console.error('Preload error:', error);
+    }
+}
+
+function resetPreload() {
+    preloadGeneration++;
+    preloadedTrack = null;
+    preloadPromise = null;
+    
+    // Stop buffering a track that won't be played next
+    if (standbyPlayer.hasAttribute('src')) {
+        standbyPlayer.removeAttribute('src');
+        standbyPlayer.load();
+    }
+}
+
+async function playNextTrack() {
+    if (!playbackQueue) {
+        showNotification('Playback ended', 'success');
+        return;
+    }
+    
+    // Tracks shorter than the preload window are only fetched now. A reset
+    // while waiting drops the result, so the next track is fetched again
+    const queue = playbackQueue;
+    let generation;
+    do {
+        generation = preloadGeneration;
+        await (preloadPromise || (preloadPromise = preloadNextTrack(queue)));
+        
+        if (queue !== playbackQueue) return;
+    } while (generation !== preloadGeneration);
+    
+    if (!preloadedTrack) {
+        playbackQueue = null;
+        showNotification('Playlist ended', 'success');
+        return;
+    }
+    
+    const track = preloadedTrack;
+    swapPlayers();
+    
+    playbackQueue = { playlist: queue.playlist, position: track.position };
+    resetPreload();
+    
+    updateNowPlaying(track);
+    reportNowPlaying(track, playbackQueue);
+}
+
+function swapPlayers() {
+    const previous = audioPlayer;
+    audioPlayer = standbyPlayer;
+    standbyPlayer = previous;
+    
+    // The buffered track starts right away, keeping the listener's volume
+    audioPlayer.volume = previous.volume;
+    audioPlayer.muted = previous.muted;
+    audioPlayer.play().catch(e => {
+        console.error('Error playing audio:', e);
+        showNotification('Error playing audio. Please try again.', 'error');
+    });
+    
+    audioPlayer.controls = true;
+    audioPlayer.hidden = false;
+    standbyPlayer.controls = false;
+    standbyPlayer.hidden = true;
+}
+
+async function reportNowPlaying(track, queue) {
+    // The session's other tabs follow along, as they do for /api/play
+    try {
+        await fetch('/api/status', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ track_info: track, ...queue }),
+        });
+    } catch (error) {
+        console.error('Report now playing error:', error);
+    }
+}
+
 function updateNowPlaying(track) {
     if (!track) {
         trackEmpty.style.display = 'flex';
@@ -188,7 +447,7 @@ function updateNowPlaying(track) {
     trackEmpty.style.display = 'none';
     trackInfo.style.display = 'flex';
     
-    trackThumbnail.src = track.thumbnail || 'https://via.placeholder.com/160x90';
+    trackThumbnail.src = thumbnailUrl(track, 160);
     trackTitle.textContent = track.title;
     trackChannel.textContent = track.channel;
     trackDuration.textContent = track.duration;
@@ -199,18 +458,23 @@ async function loadPlaylists() {
         const response = await fetch('/api/playlists');
         const data = await response.json();
         
-        if (response.ok) {
-            playlists = data.playlists;
-            displayPlaylists();
-        } else {
-            showNotification(data.error || 'Failed to load playlists', 'error');
-        }
+        showPlaylists(response.status, data);
     } catch (error) {
         console.error('Load playlists error:', error);
         showNotification('An error occurred while loading playlists', 'error');
     }
 }
 
+function showPlaylists(status, data) {
+    if (status >= 200 && status < 300) {
+        playlists = data.playlists;
+        playlistCounts = data.counts || {};
+        displayPlaylists();
+    } else {
+        showNotification(data.error || 'Failed to load playlists', 'error');
+    }
+}
+
 function displayPlaylists() {
     playlistsList.innerHTML = '';
     
@@ -227,7 +491,9 @@ function displayPlaylists() {
         const loadButton = playlistItem.querySelector('.load-playlist-button');
         const deleteButton = playlistItem.querySelector('.delete-playlist-button');
         
-        playlistNameElement.textContent = playlist;
+        playlistNameElement.textContent = playlist in playlistCounts
+            ? `${playlist} (${playlistCounts[playlist]})`
+            : playlist;
         
         // Add event listeners
         loadButton.addEventListener('click', () => {
@@ -251,26 +517,80 @@ async function createPlaylist() {
     }
     
     try {
-        const response = await fetch('/api/playlists', {
+        // Create the playlist and fetch the updated list in one round trip
+        const [created, list] = await batchRequest([
+            { method: 'POST', path: '/api/playlists', body: { name } },
+            { method: 'GET', path: '/api/playlists', after: 0 },
+        ]);
+        
+        if (batchOk(created)) {
+            showNotification(created.body.message || 'Playlist created', 'success');
+            playlistName.value = '';
+            showPlaylists(list.status, list.body);
+        } else {
+            showNotification(created.body.error || 'Failed to create playlist', 'error');
+        }
+    } catch (error) {
+        console.error('Create playlist error:', error);
+        showNotification('An error occurred while creating playlist', 'error');
+    }
+}
+
+async function importPlaylist() {
+    const name = playlistName.value.trim();
+    
+    if (!name) {
+        showNotification('Please enter a playlist name to import into', 'error');
+        return;
+    }
+    
+    const source = prompt('YouTube playlist or channel URL:');
+    if (!source) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/playlists/${name}/import`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ name }),
+            body: JSON.stringify({ source }),
         });
         
         const data = await response.json();
         
         if (response.ok) {
-            showNotification(data.message || 'Playlist created', 'success');
+            showNotification(data.message || 'Import started', 'success');
             playlistName.value = '';
-            loadPlaylists();
+            
+            // Progress arrives as "import" events
+            importStatus.textContent = `Importing into ${name}...`;
+            importStatus.style.display = 'block';
         } else {
-            showNotification(data.error || 'Failed to create playlist', 'error');
+            showNotification(data.error || 'Failed to start import', 'error');
         }
     } catch (error) {
-        console.error('Create playlist error:', error);
-        showNotification('An error occurred while creating playlist', 'error');
+        console.error('Import playlist error:', error);
+        showNotification('An error occurred while importing playlist', 'error');
+    }
+}
+
+function showImportProgress(job) {
+    const name = job.name;
+    
+    if (job.running) {
+        importStatus.textContent = `Importing into ${name}: ${job.added} added, ${job.fetched} fetched`;
+        importStatus.style.display = 'block';
+        return;
+    }
+    
+    importStatus.style.display = 'none';
+    
+    if (job.complete) {
+        showNotification(`Imported ${job.added} tracks into ${name}`, 'success');
+    } else {
+        showNotification(`Import into ${name} stopped after ${job.fetched} tracks, try again to resume`, 'error');
     }
 }
 
@@ -280,12 +600,13 @@ async function deletePlaylist(name) {
     }
     
     try {
-        // This would need a corresponding API endpoint
-        const response = await fetch(`/api/playlists/${name}`, {
-            method: 'DELETE',
-        });
+        // Delete the playlist and fetch the updated list in one round trip
+        const [deleted, list] = await batchRequest([
+            { method: 'DELETE', path: `/api/playlists/${encodeURIComponent(name)}` },
+            { method: 'GET', path: '/api/playlists', after: 0 },
+        ]);
         
-        if (response.ok) {
+        if (batchOk(deleted)) {
             showNotification(`Playlist "${name}" deleted`, 'success');
             
             // If the current playlist is deleted, hide playlist tracks
@@ -294,10 +615,9 @@ async function deletePlaylist(name) {
                 playlistTracks.style.display = 'none';
             }
             
-            loadPlaylists();
+            showPlaylists(list.status, list.body);
         } else {
-            const data = await response.json();
-            showNotification(data.error || 'Failed to delete playlist', 'error');
+            showNotification((deleted.body && deleted.body.error) || 'Failed to delete playlist', 'error');
         }
     } catch (error) {
         console.error('Delete playlist error:', error);
@@ -305,24 +625,67 @@ async function deletePlaylist(name) {
     }
 }
 
+function playlistPagePath(name, offset) {
+    const params = new URLSearchParams({
+        offset,
+        limit: PLAYLIST_PAGE_SIZE,
+        fields: PLAYLIST_TRACK_FIELDS,
+    });
+    
+    return `/api/playlists/${encodeURIComponent(name)}?${params}`;
+}
+
+async function fetchPlaylistPage(name, offset) {
+    // The browser revalidates with the playlist's ETag and reuses its cached copy on 304
+    const response = await fetch(playlistPagePath(name, offset));
+    const data = await response.json();
+    
+    return { response, data };
+}
+
+function showPlaylistPage(name, status, data) {
+    if (status >= 200 && status < 300) {
+        currentPlaylist = name;
+        playlistTracksData = data.tracks;
+        playlistNextOffset = data.next_offset;
+        
+        // Update UI
+        currentPlaylistName.textContent = name;
+        displayPlaylistTracks();
+        playlistTracks.style.display = 'block';
+    } else {
+        showNotification(data.error || 'Failed to load playlist tracks', 'error');
+    }
+}
+
 async function loadPlaylistTracks(name) {
     try {
-        const response = await fetch(`/api/playlists/${name}`);
-        const data = await response.json();
+        const { response, data } = await fetchPlaylistPage(name, 0);
+        
+        showPlaylistPage(name, response.status, data);
+    } catch (error) {
+        console.error('Load playlist tracks error:', error);
+        showNotification('An error occurred while loading playlist tracks', 'error');
+    }
+}
+
+async function loadMorePlaylistTracks() {
+    if (!currentPlaylist || playlistNextOffset === null) return;
+    
+    try {
+        const { response, data } = await fetchPlaylistPage(currentPlaylist, playlistNextOffset);
         
         if (response.ok) {
-            currentPlaylist = name;
-            playlistTracksData = data.tracks;
+            playlistTracksData = playlistTracksData.concat(data.tracks);
+            playlistNextOffset = data.next_offset;
             
-            // Update UI
-            currentPlaylistName.textContent = name;
-            displayPlaylistTracks();
-            playlistTracks.style.display = 'block';
+            // Only render the new page
+            appendPlaylistTracks(data.tracks);
         } else {
             showNotification(data.error || 'Failed to load playlist tracks', 'error');
         }
     } catch (error) {
-        console.error('Load playlist tracks error:', error);
+        console.error('Load more tracks error:', error);
         showNotification('An error occurred while loading playlist tracks', 'error');
     }
 }
@@ -335,7 +698,20 @@ function displayPlaylistTracks() {
         return;
     }
     
-    playlistTracksData.forEach(track => {
+    appendPlaylistTracks(playlistTracksData);
+}
+
+function appendPlaylistTracks(tracks) {
+    // Drop the previous "load more" button, it is re-added below if needed
+    const loadMoreButton = playlistTracksList.querySelector('.load-more-button');
+    if (loadMoreButton) {
+        loadMoreButton.remove();
+    }
+    
+    // Position in the playlist of the first track added
+    const firstPosition = playlistTracksData.length - tracks.length;
+    
+    tracks.forEach((track, index) => {
         const trackItem = playlistTrackTemplate.content.cloneNode(true);
         
         // Set data
@@ -349,7 +725,7 @@ function displayPlaylistTracks() {
         
         // Add event listeners
         playButton.addEventListener('click', () => {
-            playTrack(track);
+            playTrack(track, { playlist: currentPlaylist, position: firstPosition + index });
         });
         
         removeButton.addEventListener('click', () => {
@@ -358,6 +734,14 @@ function displayPlaylistTracks() {
         
         playlistTracksList.appendChild(trackItem);
     });
+    
+    if (playlistNextOffset !== null) {
+        const button = document.createElement('button');
+        button.className = 'load-more-button';
+        button.textContent = 'Load more';
+        button.addEventListener('click', loadMorePlaylistTracks);
+        playlistTracksList.appendChild(button);
+    }
 }
 
 async function removeTrackFromPlaylist(trackId) {
@@ -414,26 +798,30 @@ function showPlaylistSelectionModal() {
 async function addSelectedTrackToPlaylist(playlistName) {
     if (!selectedTrackForPlaylist) return;
     
-    try {
-        const response = await fetch(`/api/playlists/${playlistName}/add`, {
+    const operations = [
+        {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ track: selectedTrackForPlaylist }),
-        });
-        
-        const data = await response.json();
+            path: `/api/playlists/${encodeURIComponent(playlistName)}/add`,
+            body: { track: selectedTrackForPlaylist },
+        },
+    ];
+    
+    // If the current playlist is the one we added to, refresh it in the same round trip
+    if (currentPlaylist === playlistName) {
+        operations.push({ method: 'GET', path: playlistPagePath(playlistName, 0), after: 0 });
+    }
+    
+    try {
+        const [added, page] = await batchRequest(operations);
         
-        if (response.ok) {
-            showNotification(data.message || `Track added to ${playlistName}`, 'success');
+        if (batchOk(added)) {
+            showNotification(added.body.message || `Track added to ${playlistName}`, 'success');
             
-            // If the current playlist is the one we added to, refresh it
-            if (currentPlaylist === playlistName) {
-                loadPlaylistTracks(playlistName);
+            if (page) {
+                showPlaylistPage(playlistName, page.status, page.body);
             }
         } else {
-            showNotification(data.error || 'Failed to add track to playlist', 'error');
+            showNotification(added.body.error || 'Failed to add track to playlist', 'error');
         }
     } catch (error) {
         console.error('Add to playlist error:', error);
@@ -445,6 +833,13 @@ async function addSelectedTrackToPlaylist(playlistName) {
 }
 
 // Utility functions
+function thumbnailUrl(track, width) {
+    // The server picks the smallest variant covering the displayed width on
+    // this screen and caches it, instead of the full-size image from YouTube
+    const size = Math.ceil(width * (window.devicePixelRatio || 1));
+    return `/api/thumb/${track.id}?size=${size}`;
+}
+
 function showNotification(message, type = 'info') {
     // Create notification element
     const notification = document.createElement('div');
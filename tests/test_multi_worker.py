@@ -0,0 +1,192 @@
+"""
+Multi-worker tests
+Two web app processes sharing a SQLite state store and playlist database
+must agree on everything a user can see through either of them
+"""
+
+import os
+import sys
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+# Everything the web app imports has to be installed for the workers to start
+for module in ('flask', 'flask_cors', 'innertube', 'pytube', 'requests', 'pyaudio'):
+    pytest.importorskip(module)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a worker may take to answer a command
+COMMAND_TIMEOUT = 30
+
+# Playlist ID of an import that never reaches YouTube
+IMPORT_SOURCE = "PLabcdefghijklmnop"
+
+TRACKS = [
+    {'id': 'dQw4w9WgXcQ', 'title': 'Never Gonna Give You Up', 'channel': 'Rick Astley'},
+    {'id': 'kJQP7kiw5Fk', 'title': 'Despacito', 'channel': 'Luis Fonsi'},
+]
+
+def create_playlist(web_app, client, name, tracks):
+    """Create a playlist holding some tracks"""
+    client.post('/api/playlists', json={'name': name})
+    return client.post(f'/api/playlists/{name}/add_many', json={'tracks': tracks}).status_code
+
+def remove_track(web_app, client, name, track_id):
+    """Remove a track from a playlist"""
+    return client.post(f'/api/playlists/{name}/remove', json={'track_id': track_id}).status_code
+
+def search_library(web_app, client, query):
+    """Get the IDs of the saved tracks matching a query, and where the first is saved"""
+    results = client.post('/api/search', json={'query': query, 'mode': 'library'}).get_json()['results']
+    return [result['id'] for result in results], results[0]['saved_in'] if results else []
+
+def report_track(web_app, client, track, playlist, position):
+    """Report the track a browser plays, returning the browser's session ID"""
+    client.post('/api/status', json={'track_info': track, 'playlist': playlist, 'position': position})
+    return client.get_cookie(web_app.SESSION_COOKIE).value
+
+def playback(web_app, client, session_id):
+    """Get a session's status and the playback position"""
+    client.set_cookie(web_app.SESSION_COOKIE, session_id)
+    status = client.get('/api/status').get_json()
+    manager = web_app.playlist_manager
+    return status, manager.current_playlist, manager.current_index
+
+def start_import(web_app, client, name):
+    """Start an import that runs until the worker stops"""
+    web_app.playlist_importer.import_playlist = lambda *args, **kwargs: threading.Event().wait() or {}
+    return client.post(f'/api/playlists/{name}/import', json={'source': IMPORT_SOURCE}).status_code
+
+def listen(web_app, client):
+    """Collect the events broadcast to a listener in this worker"""
+    heard = web_app.heard = []
+    stream = web_app.event_hub.stream(web_app.event_hub.get_session(None))
+    
+    thread = threading.Thread(target=lambda: heard.extend(stream))
+    thread.daemon = True
+    thread.start()
+    
+    # The relay starts with the first listener and only hears later events
+    while not heard:
+        time.sleep(0.05)
+
+def wait_for_event(web_app, client, text):
+    """Wait until an event containing some text was heard"""
+    deadline = time.monotonic() + COMMAND_TIMEOUT / 2
+    while time.monotonic() < deadline:
+        if any(text in message for message in web_app.heard):
+            return True
+        time.sleep(0.05)
+    return False
+
+COMMANDS = {
+    command.__name__: command
+    for command in (create_playlist, remove_track, search_library, report_track,
+                    playback, start_import, listen, wait_for_event)
+}
+
+def serve(workdir, commands, results):
+    """
+    Run the web app in a worker process and answer commands from the test
+    
+    Args:
+        workdir: Directory holding the shared playlists and state
+        commands: Queue of (command name, arguments), None to stop
+        results: Queue the outcome of each command is put on
+    """
+    os.chdir(workdir)
+    os.environ['STATE_STORE'] = 'sqlite'
+    os.environ['PLAYLIST_BACKEND'] = 'sqlite'
+    sys.path.insert(0, REPO_ROOT)
+    
+    import web_app
+    client = web_app.app.test_client()
+    
+    while True:
+        command = commands.get()
+        if command is None:
+            return
+        
+        name, args = command
+        try:
+            results.put(('ok', COMMANDS[name](web_app, client, *args)))
+        except Exception as e:
+            results.put(('error', repr(e)))
+
+class Worker:
+    """A web app process driven by the test"""
+    
+    def __init__(self, context, workdir):
+        self.commands = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=serve, args=(workdir, self.commands, self.results))
+        self.process.daemon = True
+        self.process.start()
+    
+    def call(self, name, *args):
+        """Run a command in the worker and return its result"""
+        self.commands.put((name, args))
+        status, value = self.results.get(timeout=COMMAND_TIMEOUT)
+        assert status == 'ok', value
+        return value
+    
+    def stop(self):
+        """Stop the worker process"""
+        self.commands.put(None)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two workers sharing one playlists directory"""
+    os.makedirs(tmp_path / 'playlists')
+    
+    # Fresh interpreters, as a pre-fork server's workers share nothing in memory
+    context = multiprocessing.get_context('spawn')
+    started = [Worker(context, str(tmp_path)) for _ in range(2)]
+    
+    yield started
+    
+    for worker in started:
+        worker.stop()
+
+def test_workers_share_library_search(workers):
+    first, second = workers
+    
+    # The second worker builds its library index before the first adds tracks
+    assert second.call('search_library', 'despacito') == ([], [])
+    
+    assert first.call('create_playlist', 'party', TRACKS) == 200
+    assert second.call('search_library', 'despacito') == (['kJQP7kiw5Fk'], ['party'])
+    
+    assert first.call('remove_track', 'party', 'kJQP7kiw5Fk') == 200
+    assert second.call('search_library', 'despacito') == ([], [])
+    assert second.call('search_library', 'astley') == (['dQw4w9WgXcQ'], ['party'])
+
+def test_workers_share_playback(workers):
+    first, second = workers
+    first.call('create_playlist', 'party', TRACKS)
+    
+    session_id = first.call('report_track', TRACKS[1], 'party', 1)
+    status, playlist, index = second.call('playback', session_id)
+    
+    assert status == {'playing': True, 'track': TRACKS[1]}
+    assert (playlist, index) == ('party', 1)
+
+def test_workers_share_import_jobs(workers):
+    first, second = workers
+    
+    assert first.call('start_import', 'party') == 202
+    assert second.call('start_import', 'party') == 409
+
+def test_workers_relay_events(workers):
+    first, second = workers
+    second.call('listen')
+    
+    first.call('create_playlist', 'party', TRACKS)
+    
+    assert second.call('wait_for_event', '"party"')
@@ -7,22 +7,348 @@ A web application that allows users to search, extract, and play audio from YouT
 
 import os
 import json
-from flask import Flask, request, jsonify, render_template
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, render_template, send_file, Response, g
 from flask_cors import CORS
+from werkzeug.test import EnvironBuilder
+from werkzeug.middleware.proxy_fix import ProxyFix
 from modules.youtube_client import YouTubeClient
 from modules.audio_player import AudioPlayer
 from modules.playlist_manager import PlaylistManager
+from modules.sqlite_playlist_manager import SQLitePlaylistManager
+from modules.jsonl_playlist_manager import JSONLinesPlaylistManager
+from modules.playlist_importer import PlaylistImporter
+from modules.audio_cache import AudioCache, VIDEO_ID_PATTERN
+from modules.thumbnail_cache import ThumbnailCache, THUMBNAIL_MAX_AGE
+from modules.static_assets import StaticAssets, compress_response
+from modules.request_coalescer import RequestCoalescer
+from modules.events import EventHub, Session
+from modules.state_store import create_state_store
+from modules.stream_prefetcher import StreamPrefetcher
+from modules.admission import AdmissionController, RateLimiter, Overloaded
+from modules.batch import parse_operations, plan_stages, skipped_result
+from modules.metrics import (
+    REGISTRY, HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, record_error
+)
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
 
+# Reverse proxies in front of the app; their X-Forwarded-For headers give the
+# client address that rate limits are kept for, instead of the proxy's own
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Content-hashed, pre-compressed static files
+static_assets = StaticAssets(app)
+
 # Initialize components
 youtube_client = YouTubeClient()
 audio_player = AudioPlayer()
-playlist_manager = PlaylistManager()
 
-# Store current track info
-current_track = None
+# Mutable state: "memory" (default) for a single process, or "sqlite" to
+# share it between the worker processes of a pre-fork server
+state_store = create_state_store(
+    os.environ.get('STATE_STORE', 'memory'),
+    os.environ.get('STATE_STORE_PATH', os.path.join('playlists', '.state.db'))
+)
+
+# Playlist storage backend: "json" (default), "jsonl" or "sqlite"
+playlist_backend = os.environ.get('PLAYLIST_BACKEND', 'json')
+if playlist_backend == 'sqlite':
+    playlist_manager = SQLitePlaylistManager(state_store=state_store)
+else:
+    if state_store.shared:
+        print("Warning: playlist files are rewritten whole, concurrent edits from "
+              "several workers can be lost; use PLAYLIST_BACKEND=sqlite")
+    
+    # Coalesce bursts of playlist edits from the web UI into one write, unless
+    # other workers need to see them straight away
+    manager_class = JSONLinesPlaylistManager if playlist_backend == 'jsonl' else PlaylistManager
+    playlist_manager = manager_class(write_behind=not state_store.shared, state_store=state_store)
+
+# Megabytes of audio the stream proxy keeps on disk before deleting the least
+# recently played tracks
+AUDIO_CACHE_MAX_MB = int(os.environ.get('AUDIO_CACHE_MAX_MB', 2048))
+
+playlist_importer = PlaylistImporter(youtube_client, playlist_manager)
+audio_cache = AudioCache(youtube_client, state_store=state_store, max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024)
+thumbnail_cache = ThumbnailCache(youtube_client)
+
+# Concurrent plays of the same video and identical searches share one upstream call
+play_calls = RequestCoalescer('play')
+search_calls = RequestCoalescer('search')
+
+# Upstream-bound requests of each route class handled at once, how many more
+# may queue for a slot, and for how many seconds, before they get a quick 503;
+# the rest of the server threads stay free for the local routes
+ADMISSION_LIMIT = int(os.environ.get('ADMISSION_LIMIT', 4))
+ADMISSION_QUEUE = int(os.environ.get('ADMISSION_QUEUE', 8))
+ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 2))
+
+# Audio streams proxied from YouTube at once; each holds a server thread for
+# the whole download, fully cached tracks don't count
+STREAM_ADMISSION_LIMIT = int(os.environ.get('STREAM_ADMISSION_LIMIT', 16))
+
+# Upstream-bound requests each client may make per second, and in a burst,
+# across all workers sharing the state store
+CLIENT_RATE = float(os.environ.get('CLIENT_RATE', 2))
+CLIENT_BURST = int(os.environ.get('CLIENT_BURST', 10))
+
+admission = {
+    route_class: AdmissionController(route_class, ADMISSION_LIMIT, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
+    for route_class in ('search', 'play', 'thumbnail')
+}
+admission['stream'] = AdmissionController('stream', STREAM_ADMISSION_LIMIT, ADMISSION_QUEUE, ADMISSION_TIMEOUT)
+rate_limiter = RateLimiter(CLIENT_RATE, CLIENT_BURST, state_store)
+
+# Number of top search results whose streams are resolved in the background
+# before they are clicked; 0 (default) turns speculative resolution off
+PREFETCH_TOP_RESULTS = int(os.environ.get('PREFETCH_TOP_RESULTS', 0))
+
+# Tracks from the playback position on whose streams are resolved during
+# warm-up, so resuming playback after a restart doesn't wait for YouTube;
+# 0 (default) resolves none
+WARMUP_TRACKS = int(os.environ.get('WARMUP_TRACKS', 0))
+
+# Set once warm-up is done; /ready reports 503 until then
+ready = threading.Event()
+warm_up_lock = threading.Lock()
+
+# Per-session playback state and the event streams that report changes to it
+event_hub = EventHub(state_store)
+
+# Cookie identifying the browser's session
+SESSION_COOKIE = 'player_session'
+
+# Seconds a running playlist import may go without progress before it is
+# assumed to have died with its worker, so it can be started again
+IMPORT_STALE_AFTER = 300
+
+# Largest page of playlist tracks returned by one request
+MAX_PAGE_SIZE = 1000
+
+# Most upcoming playlist tracks resolved by one request
+MAX_NEXT_TRACKS = 5
+
+# Width in pixels of thumbnails requested without a size, and the widest a request may ask for
+DEFAULT_THUMBNAIL_WIDTH = 320
+MAX_THUMBNAIL_WIDTH = 1280
+
+# Operations of /api/batch requests running at once, across all batches
+BATCH_WORKERS = 16
+
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+def resolve_stream(video_id: str) -> tuple:
+    """
+    Resolve a video's audio stream and keep the URL for the stream proxy
+    
+    Args:
+        video_id: YouTube video ID
+        
+    Returns:
+        Tuple containing (stream_url, video_info) or (None, None) if it failed
+    """
+    streaming_url, video_info = youtube_client.get_audio_stream(video_id)
+    
+    # The player fetches /api/stream next, which then doesn't resolve it again
+    if streaming_url and video_info:
+        audio_cache.remember_stream_url(video_id, streaming_url, video_info)
+    
+    return streaming_url, video_info
+
+stream_prefetcher = StreamPrefetcher(resolve_stream) if PREFETCH_TOP_RESULTS > 0 else None
+
+def playable_track(video_id: str, streaming_url: str, video_info: dict) -> dict:
+    """
+    Build the track info a browser plays from
+    
+    Args:
+        video_id: YouTube video ID
+        streaming_url: Direct streaming URL
+        video_info: Video info from the resolution, shared with other requests
+        
+    Returns:
+        Copy of the video info with the direct and the proxied stream URL
+    """
+    # Every request gets its own copy of the shared result
+    track = dict(video_info)
+    
+    # Include the direct streaming URL, and the proxied one that survives the
+    # direct URL expiring
+    track['streaming_url'] = streaming_url
+    track['stream_url'] = f"/api/stream/{video_id}"
+    return track
+
+def warm_up_track(video_id: str) -> bool:
+    """
+    Resolve a track's stream and learn the size of its audio
+    
+    Args:
+        video_id: YouTube video ID
+        
+    Returns:
+        True if the track can be streamed
+    """
+    streaming_url, _ = resolve_stream(video_id)
+    return bool(streaming_url) and audio_cache.get_info(video_id) is not None
+
+def warm_up():
+    """
+    Do the work the first requests would otherwise pay for, then report ready
+    
+    Opens the connection to YouTube, reads the playlists and the audio cache
+    index from disk, compiles the page template and, with WARMUP_TRACKS set,
+    resolves the tracks at the playback position. Only the first call does
+    anything; a failed step is reported and skipped, so a worker without
+    YouTube access still becomes ready.
+    """
+    with warm_up_lock:
+        if ready.is_set():
+            return
+        
+        start = time.perf_counter()
+        
+        connected = youtube_client.warm_up()
+        playlists = playlist_manager.get_playlist_counts()
+        cached = audio_cache.load_info()
+        app.jinja_env.get_template('index.html')
+        
+        resolved = 0
+        name = playlist_manager.current_playlist
+        if WARMUP_TRACKS > 0 and name:
+            tracks, _ = playlist_manager.get_playlist_page(
+                name, max(0, playlist_manager.current_index), WARMUP_TRACKS
+            ) or ([], 0)
+            resolved = sum(batch_executor.map(warm_up_track, [track['id'] for track in tracks]))
+        
+        ready.set()
+        
+        print(f"Warm-up finished in {time.perf_counter() - start:.1f}s: "
+              f"YouTube {'connected' if connected else 'unreachable'}, {len(playlists)} playlists, "
+              f"{cached} cached tracks, {resolved} tracks resolved")
+
+def ready_app() -> Flask:
+    """
+    Warm up and return the app, for servers that load it through a factory
+    
+    Gunicorn loads the app in each worker before the worker accepts
+    connections: gunicorn 'web_app:ready_app()'
+    
+    Returns:
+        The Flask app
+    """
+    warm_up()
+    return app
+
+def record_playback_position(data: dict):
+    """
+    Remember the playlist position a browser plays from, where the next warm-up starts
+    
+    Args:
+        data: Request body, with the optional 'playlist' and 'position' of the track
+    """
+    name = data.get('playlist')
+    position = data.get('position')
+    
+    # Positions outside the playlist, or of a playlist that doesn't exist, are ignored
+    if isinstance(name, str) and name and isinstance(position, int) and not isinstance(position, bool):
+        playlist_manager.set_position(name, position)
+
+def search_key(query: str, max_results: int) -> tuple:
+    """
+    Get the key identical YouTube searches are coalesced under
+    
+    Args:
+        query: Search query as entered
+        max_results: Maximum number of results requested
+        
+    Returns:
+        Key ignoring case and extra whitespace in the query
+    """
+    return (' '.join(query.lower().split()), max_results)
+
+def upstream_slot(route_class: str):
+    """
+    Admit an upstream-bound request of the current client
+    
+    Args:
+        route_class: "search" or "play"
+        
+    Returns:
+        Context manager holding the route class's slot
+        
+    Raises:
+        Overloaded: If the client is over its rate limit or no slot is free in time
+    """
+    rate_limiter.check(request.remote_addr, route_class)
+    return admission[route_class].slot()
+
+def current_session() -> Session:
+    """
+    Get the session of the current request, starting one if needed
+    
+    Returns:
+        Session of the requesting browser
+    """
+    if 'player_session' not in g:
+        g.player_session = event_hub.get_session(request.cookies.get(SESSION_COOKIE))
+    return g.player_session
+
+def publish_playlist_change(name: str, action: str):
+    """
+    Tell every listener that a playlist changed
+    
+    Args:
+        name: Name of the playlist
+        action: "created", "changed" or "deleted"
+    """
+    event_hub.publish('playlist', {'name': name, 'action': action})
+
+def batch_environ(operation: dict, session: Session) -> dict:
+    """
+    Build the WSGI environment of a batched operation
+    
+    Args:
+        operation: Operation from parse_operations()
+        session: Session the batch is made for
+        
+    Returns:
+        WSGI environment dictionary
+    """
+    builder = EnvironBuilder(
+        path=operation['path'],
+        base_url=request.host_url,
+        query_string=operation['query'],
+        method=operation['method'],
+        json=operation['body'],
+        # Every operation acts for the batch's session, even one started just now
+        headers={'Cookie': f"{SESSION_COOKIE}={session.id}"},
+        # and counts against the client's rate limit
+        environ_overrides={'REMOTE_ADDR': request.remote_addr}
+    )
+    
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+def run_batch_operation(environ: dict) -> dict:
+    """
+    Run a batched operation through the app like a request of its own
+    
+    Args:
+        environ: WSGI environment from batch_environ()
+        
+    Returns:
+        Dictionary with the response 'status' and JSON 'body'
+    """
+    response = app.response_class.from_app(app.wsgi_app, environ, buffered=True)
+    return {'status': response.status_code, 'body': response.get_json(silent=True)}
 
 @app.route('/')
 def index():
@@ -31,51 +357,181 @@ def index():
 
 @app.route('/api/search', methods=['POST'])
 def search():
-    """Search YouTube for videos"""
+    """Search YouTube, or the saved library with mode "library", for videos"""
     data = request.json
     query = data.get('query', '')
     max_results = data.get('max_results', 10)
+    mode = data.get('mode', 'youtube')
     
     if not query:
         return jsonify({'error': 'No search query provided'}), 400
     
-    # Search YouTube
-    results = youtube_client.search(query, max_results)
+    if mode == 'library':
+        # Search saved tracks locally, no upstream call
+        results = playlist_manager.search_library(query, max_results)
+    else:
+        # Search YouTube, sharing the call with identical searches in flight
+        with upstream_slot('search'):
+            results = search_calls.run(search_key(query, max_results), youtube_client.search, query, max_results)
+        results = [dict(result) for result in results]
+    
+    # Mark results that are already saved, straight from the track index
+    for result in results:
+        result['saved_in'] = sorted(playlist_manager.find_track(result['id']))
+    
+    # The top results are the likely clicks, resolve them ahead of time
+    if stream_prefetcher is not None:
+        stream_prefetcher.prefetch(current_session().id, [result['id'] for result in results[:PREFETCH_TOP_RESULTS]])
     
     return jsonify({'results': results})
 
 @app.route('/api/play', methods=['POST'])
 def play():
     """Play a YouTube video's audio"""
-    global current_track
-    
     data = request.json
     video_id = data.get('video_id', '')
     
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
     
-    # Get direct streaming URL from YouTube
-    streaming_url, video_info = youtube_client.get_audio_stream(video_id)
+    # A click on a search result may find its stream resolved, or being
+    # resolved, in the background already
+    speculative = stream_prefetcher.take(video_id) if stream_prefetcher is not None else None
+    
+    if speculative is not None and speculative.done():
+        # Nothing left to ask YouTube, so no slot or rate limit token is used
+        streaming_url, video_info = speculative.result()
+    else:
+        with upstream_slot('play'):
+            if speculative is not None:
+                streaming_url, video_info = speculative.result()
+            else:
+                # Get direct streaming URL from YouTube, sharing the call with
+                # concurrent plays of the same video
+                streaming_url, video_info = play_calls.run(video_id, resolve_stream, video_id)
     
     if not streaming_url or not video_info:
         return jsonify({'error': 'Failed to get audio stream'}), 500
     
-    # Store current track info
-    current_track = video_info
+    video_info = playable_track(video_id, streaming_url, video_info)
+    record_playback_position(data)
     
-    # Include the direct streaming URL in the response
-    video_info['streaming_url'] = streaming_url
+    # Store current track info and tell the session's other tabs
+    event_hub.update_state(current_session(), 'now_playing', current_track=video_info)
     
     return jsonify({
         'track_info': video_info
     })
 
+def proxy_audio(video_id: str):
+    """
+    Answer a stream request for a track that isn't completely cached
+    
+    Args:
+        video_id: YouTube video ID
+        
+    Returns:
+        Response streaming the requested bytes, from the cache and from upstream,
+        or an error response
+    """
+    info = audio_cache.get_info(video_id)
+    
+    if not info:
+        return jsonify({'error': 'Failed to get audio stream'}), 502
+    
+    etag = audio_cache.etag(video_id)
+    size = info['size']
+    byte_range = request.range
+    
+    # A stale If-Range validator asks for the whole file instead of the range
+    if byte_range and 'If-Range' in request.headers and request.if_range.etag != etag:
+        byte_range = None
+    
+    if byte_range:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        start, stop = bounds
+    else:
+        start, stop = 0, size
+    
+    chunks = audio_cache.open(video_id, start, stop - 1)
+    
+    if chunks is None:
+        return jsonify({'error': 'Failed to get audio stream'}), 502
+    
+    response = Response(chunks, status=206 if byte_range else 200,
+                        mimetype=info['content_type'], direct_passthrough=True)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+    response.set_etag(etag)
+    
+    if byte_range:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+    
+    return response
+
+@app.route('/api/stream/<video_id>', methods=['GET'])
+def stream_audio(video_id):
+    """Stream a video's audio through the server, with Range support and disk caching"""
+    if not VIDEO_ID_PATTERN.fullmatch(video_id):
+        return jsonify({'error': 'Invalid video ID'}), 400
+    
+    # Fully cached tracks are plain files, send_file handles Range and If-Range
+    cached_path = audio_cache.cached_path(video_id)
+    info = audio_cache.get_info(video_id) if cached_path else None
+    if info:
+        return send_file(cached_path, mimetype=info['content_type'], conditional=True,
+                         etag=audio_cache.etag(video_id))
+    
+    # Resolving, sizing and downloading the track all wait on YouTube
+    streams = admission['stream']
+    streams.acquire()
+    
+    try:
+        response = app.make_response(proxy_audio(video_id))
+    except BaseException:
+        streams.release()
+        raise
+    
+    # The slot is held until the audio has been sent or the client went away
+    response.call_on_close(streams.release)
+    return response
+
+@app.route('/api/thumb/<video_id>', methods=['GET'])
+def thumbnail(video_id):
+    """Serve a video's thumbnail in the smallest variant at least `size` pixels wide"""
+    if not VIDEO_ID_PATTERN.fullmatch(video_id):
+        return jsonify({'error': 'Invalid video ID'}), 400
+    
+    size = max(1, min(request.args.get('size', DEFAULT_THUMBNAIL_WIDTH, type=int), MAX_THUMBNAIL_WIDTH))
+    cached = thumbnail_cache.lookup(video_id, size)
+    
+    if cached is None:
+        # Fetching waits on YouTube's image servers
+        with admission['thumbnail'].slot():
+            cached = thumbnail_cache.fetch(video_id, size)
+    
+    if cached is None:
+        return jsonify({'error': 'Thumbnail not available'}), 404
+    
+    path, content_type = cached
+    
+    # A video's thumbnail hardly ever changes, browsers keep it for a month
+    return send_file(path, mimetype=content_type, max_age=THUMBNAIL_MAX_AGE, conditional=True)
+
 @app.route('/api/playlists', methods=['GET'])
 def get_playlists():
     """Get all available playlists"""
-    playlists = playlist_manager.get_playlists()
-    return jsonify({'playlists': playlists})
+    counts = playlist_manager.get_playlist_counts()
+    
+    # Playlists whose count isn't known without parsing them are listed without one
+    return jsonify({
+        'playlists': list(counts),
+        'counts': {name: count for name, count in counts.items() if count is not None}
+    })
 
 @app.route('/api/playlists', methods=['POST'])
 def create_playlist():
@@ -91,17 +547,55 @@ def create_playlist():
     if not success:
         return jsonify({'error': f'Failed to create playlist {name}'}), 500
     
+    publish_playlist_change(name, 'created')
+    
     return jsonify({'success': True, 'message': f'Playlist {name} created'})
 
 @app.route('/api/playlists/<name>', methods=['GET', 'DELETE'])
 def playlist_operations(name):
     """Operations on a specific playlist (GET or DELETE)"""
     if request.method == 'GET':
-        tracks = playlist_manager.load_playlist(name)
-        return jsonify({'tracks': tracks})
+        version = playlist_manager.get_playlist_version(name)
+        
+        if version is None:
+            return jsonify({'error': f'Playlist {name} not found'}), 404
+        
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(0, min(limit, MAX_PAGE_SIZE))
+        
+        # Optional projection, e.g. fields=id,title,channel for list views
+        fields = request.args.get('fields')
+        keep = sorted(set(fields.split(','))) if fields else None
+        
+        # Every page and projection is a body of its own, so it gets a tag of its own
+        etag = f"{version}-{offset}-{'all' if limit is None else limit}-{'+'.join(keep) if keep else '*'}"
+        
+        # Unchanged playlists are answered without touching the tracks
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            tracks, total = playlist_manager.get_playlist_page(name, offset, limit) or ([], 0)
+            
+            if keep:
+                tracks = [{key: value for key, value in track.items() if key in keep} for track in tracks]
+            
+            response = jsonify({
+                'tracks': tracks,
+                'total': total,
+                'offset': offset,
+                'next_offset': offset + len(tracks) if offset + len(tracks) < total else None
+            })
+        
+        # Let clients cache the response but revalidate it every time
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     elif request.method == 'DELETE':
         success = playlist_manager.delete_playlist(name)
         if success:
+            publish_playlist_change(name, 'deleted')
             return jsonify({'success': True, 'message': f'Playlist {name} deleted'})
         else:
             return jsonify({'error': f'Failed to delete playlist {name}'}), 500
@@ -120,8 +614,96 @@ def add_to_playlist(name):
     if not success:
         return jsonify({'error': f'Failed to add track to playlist {name}'}), 500
     
+    publish_playlist_change(name, 'changed')
+    
     return jsonify({'success': True, 'message': f'Track added to playlist {name}'})
 
+@app.route('/api/playlists/<name>/add_many', methods=['POST'])
+def add_many_to_playlist(name):
+    """Add several tracks to a playlist in one request"""
+    data = request.json
+    tracks = data.get('tracks', [])
+    
+    if not tracks or not isinstance(tracks, list):
+        return jsonify({'error': 'No tracks provided'}), 400
+    
+    if not all(isinstance(track, dict) for track in tracks):
+        return jsonify({'error': 'Tracks must be objects'}), 400
+    
+    added = playlist_manager.add_many(name, tracks)
+    
+    if added is None:
+        return jsonify({'error': f'Failed to add tracks to playlist {name}'}), 500
+    
+    if added:
+        publish_playlist_change(name, 'changed')
+    
+    return jsonify({
+        'success': True,
+        'added': added,
+        'skipped': len(tracks) - added,
+        'message': f'{added} tracks added to playlist {name}'
+    })
+
+@app.route('/api/playlists/<name>/import', methods=['POST'])
+def start_playlist_import(name):
+    """Start importing a YouTube playlist or channel into a playlist in the background"""
+    data = request.json
+    source = data.get('source', '')
+    
+    if not source:
+        return jsonify({'error': 'No playlist source provided'}), 400
+    
+    if not youtube_client.parse_playlist_source(source):
+        return jsonify({'error': 'Not a YouTube playlist or channel'}), 400
+    
+    # Jobs live in the state store, so the check holds across workers
+    started = []
+    
+    def claim(job):
+        if job and job['running'] and time.time() - job['updated'] < IMPORT_STALE_AFTER:
+            return job
+        started.append(True)
+        return {'running': True, 'added': 0, 'fetched': 0, 'complete': False, 'updated': time.time()}
+    
+    state_store.update('imports', name, claim)
+    
+    if not started:
+        return jsonify({'error': f'An import into playlist {name} is already running'}), 409
+    
+    def update_job(**changes):
+        job = state_store.update('imports', name, lambda job: dict(job, updated=time.time(), **changes))
+        
+        # Listeners follow the import through events instead of polling its status
+        event_hub.publish('import', dict(job, name=name))
+    
+    def on_progress(added, fetched):
+        update_job(added=added, fetched=fetched)
+    
+    def run_import():
+        result = {}
+        try:
+            result = playlist_importer.import_playlist(source, name, on_progress=on_progress)
+        finally:
+            update_job(running=False, **result)
+            publish_playlist_change(name, 'changed')
+    
+    thread = threading.Thread(target=run_import)
+    thread.daemon = True
+    thread.start()
+    
+    return jsonify({'success': True, 'message': f'Importing into playlist {name}'}), 202
+
+@app.route('/api/playlists/<name>/import', methods=['GET'])
+def get_playlist_import(name):
+    """Get the progress of a playlist import"""
+    job = state_store.get('imports', name)
+    
+    if not job:
+        return jsonify({'error': f'No import for playlist {name}'}), 404
+    
+    return jsonify(job)
+
 @app.route('/api/playlists/<name>/remove', methods=['POST'])
 def remove_from_playlist(name):
     """Remove a track from a playlist"""
@@ -136,12 +718,46 @@ def remove_from_playlist(name):
     if not success:
         return jsonify({'error': f'Failed to remove track from playlist {name}'}), 500
     
+    publish_playlist_change(name, 'changed')
+    
     return jsonify({'success': True, 'message': f'Track removed from playlist {name}'})
 
+@app.route('/api/playlists/<name>/next', methods=['GET'])
+def next_playlist_tracks(name):
+    """Resolve the tracks following a playlist position, for the player to preload"""
+    position = request.args.get('position', -1, type=int)
+    count = max(1, min(request.args.get('count', 1, type=int), MAX_NEXT_TRACKS))
+    
+    page = playlist_manager.get_playlist_page(name, max(0, position + 1), count)
+    if page is None:
+        return jsonify({'error': f'Playlist {name} not found'}), 404
+    
+    tracks, total = page
+    resolved = []
+    
+    for offset, track in enumerate(tracks):
+        # Each resolution is charged like a play of its own; once the client
+        # runs out, the tracks resolved so far are returned
+        try:
+            with upstream_slot('play'):
+                # Shared with a play of the same video in flight
+                streaming_url, video_info = play_calls.run(track['id'], resolve_stream, track['id'])
+        except Overloaded:
+            if not resolved:
+                raise
+            break
+        
+        # Unplayable tracks are left out, the player skips to the one after
+        if streaming_url and video_info:
+            resolved.append(dict(playable_track(track['id'], streaming_url, video_info),
+                                 position=max(0, position + 1) + offset))
+    
+    return jsonify({'tracks': resolved, 'total': total})
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Get current playback status"""
-    global current_track
+    """Get the current session's playback status"""
+    current_track = event_hub.get_state(current_session())['current_track']
     
     if not current_track:
         return jsonify({'playing': False})
@@ -151,6 +767,138 @@ def get_status():
         'track': current_track
     })
 
+@app.route('/api/status', methods=['POST'])
+def set_status():
+    """Report a track the player moved on to by itself, such as a preloaded next track"""
+    data = request.get_json(silent=True) or {}
+    track_info = data.get('track_info')
+    
+    if not isinstance(track_info, dict) or not VIDEO_ID_PATTERN.fullmatch(str(track_info.get('id', ''))):
+        return jsonify({'error': 'No track info provided'}), 400
+    
+    # Tell the session's other tabs, as a play through /api/play would
+    event_hub.update_state(current_session(), 'now_playing', current_track=track_info)
+    record_playback_position(data)
+    
+    return jsonify({'success': True})
+
+@app.route('/api/events', methods=['GET'])
+def events():
+    """Stream now-playing, playlist and import updates as Server-Sent Events"""
+    # Holds a server thread per listener; the async server holds them cheaply
+    return Response(
+        event_hub.stream(current_session()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run several API operations in one round trip, independent ones concurrently"""
+    try:
+        operations = parse_operations(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    session = current_session()
+    environs = [batch_environ(operation, session) for operation in operations]
+    results = [None] * len(operations)
+    
+    # Each stage waits for the one before, whose results it may depend on
+    for stage in plan_stages(operations):
+        runnable = []
+        for index in stage:
+            results[index] = skipped_result(operations[index], results)
+            if results[index] is None:
+                runnable.append(index)
+        
+        stage_results = batch_executor.map(run_batch_operation, [environs[index] for index in runnable])
+        for index, result in zip(runnable, stage_results):
+            results[index] = result
+    
+    return jsonify({'responses': results})
+
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Report whether warm-up is done and the worker should be sent traffic"""
+    if not ready.is_set():
+        response = jsonify({'ready': False})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    return jsonify({'ready': True})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose request, upstream, error and cache metrics in the Prometheus text format"""
+    return Response(
+        REGISTRY.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+        headers={'Cache-Control': 'no-store'}
+    )
+
+@app.errorhandler(Overloaded)
+def shed_request(e):
+    """Turn an upstream-bound request away quickly, telling the client when to retry"""
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.before_request
+def start_request_timer():
+    """Note when the request started and count it as in flight"""
+    g.request_start = time.perf_counter()
+    g.in_flight = True
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency by route"""
+    start = g.pop('request_start', None)
+    
+    if start is not None:
+        # The route pattern, not the path, keeps the number of label sets bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, route).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+    
+    return response
+
+@app.teardown_request
+def finish_request(error=None):
+    """Take the request out of the in-flight count and count unhandled errors"""
+    if error is not None:
+        record_error('web_app', error)
+    
+    if g.pop('in_flight', False):
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+
+@app.after_request
+def finalize_response(response):
+    """Set the session cookie, add validators to API responses and compress them"""
+    session = g.get('player_session')
+    if session is not None and request.cookies.get(SESSION_COOKIE) != session.id:
+        response.set_cookie(SESSION_COOKIE, session.id, httponly=True, samesite='Lax')
+    
+    # GET responses without their own validator get one from their body, so
+    # unchanged data is answered with an empty 304
+    if (request.method == 'GET' and request.path.startswith('/api/')
+            and response.status_code == 200
+            and not response.direct_passthrough and not response.is_streamed
+            and 'ETag' not in response.headers):
+        response.add_etag()
+        response.headers.setdefault('Cache-Control', 'no-cache')
+        response.make_conditional(request)
+    
+    return compress_response(response)
+
 if __name__ == '__main__':
+    # The reloader's parent process only watches files, the child process it
+    # starts serves requests; connections wait in the listen queue meanwhile
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
+    
     # Run the Flask app
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
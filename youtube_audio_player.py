@@ -11,7 +11,10 @@ import signal
 from modules.youtube_client import YouTubeClient
 from modules.audio_player import AudioPlayer
 from modules.playlist_manager import PlaylistManager
+from modules.sqlite_playlist_manager import SQLitePlaylistManager
+from modules.jsonl_playlist_manager import JSONLinesPlaylistManager
 from modules.terminal_ui import TerminalUI
+from modules.frame_budget import DEFAULT_MAX_FPS, DEFAULT_RENDER_BUDGET
 
 def signal_handler(sig, frame):
     """Handle keyboard interrupts gracefully"""
@@ -21,6 +24,29 @@ def signal_handler(sig, frame):
         signal_handler.audio_player.stop()
     sys.exit(0)
 
+def positive_setting(name: str, default: float, maximum: float = float('inf')) -> float:
+    """
+    Read a positive number from the environment
+    
+    Args:
+        name: Name of the environment variable
+        default: Value used when the variable is unset or invalid
+        maximum: Largest value accepted; larger ones are lowered to it
+        
+    Returns:
+        The configured number, or the default
+    """
+    try:
+        value = float(os.environ.get(name, default))
+    except ValueError:
+        value = 0
+    
+    if not value > 0:
+        print(f"Ignoring {name}: must be a positive number, using {default}")
+        return default
+    
+    return min(value, maximum)
+
 def main():
     """Main entry point for the YouTube Audio Player"""
     # Register signal handler for CTRL+C
@@ -32,8 +58,22 @@ def main():
     # Store reference to allow cleanup on exit
     signal_handler.audio_player = audio_player
     
-    playlist_manager = PlaylistManager()
-    terminal_ui = TerminalUI(youtube_client, audio_player, playlist_manager)
+    # Playlist storage backend: "json" (default), "jsonl" or "sqlite"
+    playlist_backend = os.environ.get('PLAYLIST_BACKEND', 'json')
+    if playlist_backend == 'sqlite':
+        playlist_manager = SQLitePlaylistManager()
+    elif playlist_backend == 'jsonl':
+        playlist_manager = JSONLinesPlaylistManager()
+    else:
+        playlist_manager = PlaylistManager()
+    
+    # Redraw budget of the Now Playing screen; lower it on slow devices
+    terminal_ui = TerminalUI(
+        youtube_client, audio_player, playlist_manager,
+        max_fps=positive_setting('TUI_MAX_FPS', DEFAULT_MAX_FPS),
+        render_budget=positive_setting('TUI_RENDER_BUDGET', DEFAULT_RENDER_BUDGET, maximum=1),
+        show_render_stats=os.environ.get('TUI_RENDER_STATS') == '1'
+    )
     
     # Start the application
     terminal_ui.run()